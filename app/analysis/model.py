@@ -1,12 +1,18 @@
 from datetime import datetime
 
-from sqlalchemy import Numeric, Column, Integer, String, JSON, DateTime
+from sqlalchemy import Numeric, Column, Integer, String, JSON, DateTime, Index
 
 from app.core.database import Base
 
 
 class AnalyzedStock(Base):
     __tablename__ = "analyzed_stock"
+    __table_args__ = (
+        # 游标分页 ORDER BY updated_at DESC, id DESC 及按交易所、代码过滤后的分页
+        Index('ix_analyzed_stock_updated_at_id', 'updated_at', 'id'),
+        Index('ix_analyzed_stock_exchange_updated_at_id', 'exchange', 'updated_at', 'id'),
+        Index('ix_analyzed_stock_code_updated_at_id', 'code', 'updated_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True)
     code = Column(String(10), index=True, nullable=False)
@@ -16,6 +22,7 @@ class AnalyzedStock(Base):
     support = Column(Numeric(38, 3), nullable=True)
     resistance = Column(Numeric(38, 3), nullable=True)
     price = Column(Numeric(38, 3), nullable=True)
+    watermark = Column(String(64), nullable=True)  # 分析时的行情水位：最后一根K线日期及其内容与复权因子的摘要
     created_at = Column(DateTime, default=datetime.now())  # 记录创建时间
     updated_at = Column(DateTime, default=datetime.now(), onupdate=datetime.now())  # 更新时间
 
@@ -1,17 +1,22 @@
-import threading
+from datetime import date
 
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
-from app.analysis.service import save_analyzed_stocks, get_page_analyzed_stocks
+from app.analysis.service import save_analyzed_stocks, get_page_analyzed_stocks, iter_screen_stocks, \
+    stream_screening, analyze_codes
+from app.core.database import SessionLocal
 from app.core.dependencies import get_db
+from app.core.env import ANALYSIS_CONCURRENCY, ANALYSIS_TIMEOUT
+from app.core.job import register_job, start_job
 from app.core.logger import logger
-from app.fund.service import analyze_funds
-from app.index.service import analyze_index, analyze_index_stocks
+from app.fund.service import get_fund_candidates, analyze_fund
+from app.index.service import analyze_index, get_index_stocks, analyze_index_stock, get_indexes_stocks, \
+    group_index_stocks
 from app.stock.service import KType, get_stock
-from app.strategy.service import analyze_stock, generate_strategies
+from app.strategy.service import analyze_stock, generate_strategies, ScanStats
 
 analysis_router = APIRouter()
 
@@ -33,67 +38,93 @@ async def analysis_index_stocks():
     return {'code': 0, 'data': indexes, 'msg': 'success'}
 
 
+def index_pattern_matched(stock):
+    """
+    指数本身的形态是否允许扫描成分股：沪深指数需要有买入信号，其他指数不能有卖出信号。
+    """
+    strategy = analyze_stock(stock, k_type=KType.DAY)
+    if strategy is None:
+        return stock['exchange'] not in ('SZSE', 'SSE')
+    if stock['exchange'] in ('SZSE', 'SSE'):
+        return strategy.signal == 1
+    return strategy.signal != -1
+
+
 @analysis_router.get('/index/stock')
-async def analysis_index(db: Session = Depends(get_db),
-                         code: str = None):
+async def analysis_index(code: str = None):
     """
     分析指数中成分股。
 
-    该函数通过GET请求接收一个code参数，用于指定指数代码。
-    然后调用analyze_index_stocks函数来获取该指数的成分股信息，并以JSON格式返回。
+    该函数通过GET请求接收一个code参数，用于指定指数代码，多个指数用逗号分隔。
+    形态匹配的指数的成分股取并集后在一个任务中分析，多个指数共有的成分股只分析一次。
 
     Returns:
         如果请求中缺少code参数，则返回错误信息和400状态码。
-        否则，返回指数的成分股信息和200状态码。
+        否则，启动分析任务并返回200状态码。
     """
     # 从请求参数中获取股票指数代码
     # 检查是否提供了code参数
-    if code is None:
+    codes = list(dict.fromkeys(item.strip() for item in (code or '').split(',') if item.strip()))
+    if not codes:
         # 如果没有提供code参数，返回错误信息和400状态码
         return JSONResponse(
             status_code=400,
             content={"msg": "Param code is required"}
         )
 
-    stock = get_stock(code)
+    indexes = []
+    for index in codes:
+        stock = get_stock(index)
 
-    # 检查股票信息是否找到
-    if stock is None:
+        # 检查股票信息是否找到
+        if stock is None:
+            return JSONResponse(
+                status_code=404,
+                content={"msg": f"Stock {index} not found"}
+            )
+
+        if index_pattern_matched(stock):
+            indexes.append(index)
+
+    if not indexes:
         return JSONResponse(
-            status_code=404,
-            content={"msg": "Stock not found"}
+            status_code=200,
+            content={"msg": "Index pattern not match, analysis_index_task not run.", "code": 0}
         )
 
-    strategy = analyze_stock(stock, k_type=KType.DAY)
-    if strategy is None:
-        if stock['exchange'] == 'SZSE' or stock['exchange'] == 'SSE':
-            return JSONResponse(
-                status_code=200,
-                content={"msg": "Index pattern not match, analysis_index_task not run.", "code": 0}
-            )
-    else:
-        if (stock['exchange'] == 'SZSE' or stock['exchange'] == 'SSE') and strategy.signal != 1:
-            return JSONResponse(
-                status_code=200,
-                content={"msg": "Index pattern not match, analysis_index_task not run.", "code": 0}
-            )
-        elif strategy.signal == -1:
-            return JSONResponse(
-                status_code=200,
-                content={"msg": "Index pattern not match, analysis_index_task not run.", "code": 0}
-            )
+    start_job('analysis-index', f"analysis-index:{date.today()}:{','.join(indexes)}", *indexes)
+
+    return {'code': 0, 'data': indexes, 'msg': 'Job running'}
+
 
-    thread = threading.Thread(target=analysis_index_task, args=(code, db))
-    thread.start()
+def save_scan_results(stocks):
+    """
+    保存扫描结果并生成交易策略。
+    """
+    db = SessionLocal()
+    try:
+        save_analyzed_stocks(stocks, db)
+        generate_strategies(stocks, db)
+    finally:
+        db.close()
 
-    return {'code': 0, 'msg': 'Job running'}
 
+@register_job('analysis-index', daily=True)
+def analysis_index_task(checkpoint, *indexes):
+    """
+    分析指数成分股任务，按成分股写入检查点，服务重启后从检查点继续。
 
-def analysis_index_task(index, db: Session):
-    stocks = analyze_index_stocks(index)
-    save_analyzed_stocks(stocks, db)
-    logger.info("🚀 分析指数中股票完成!!!")
-    generate_strategies(stocks, db)
+    多个指数的成分股取并集，每只股票只分析一次，再按所属指数分组统计；
+    分析结果与交易策略按股票写入一次，不随所属指数的个数重复写入。
+    """
+    items, memberships = get_indexes_stocks(indexes)
+    stats = ScanStats()
+    stocks = checkpoint.run(items, lambda item: item['stock_code'], lambda item: analyze_index_stock(item, stats))
+    groups = {index: len(group) for index, group in group_index_stocks(stocks, memberships, indexes).items()}
+    logger.info(f"🚀 分析指数中股票完成!!! index = {list(indexes)}, "
+                f"成分股 {sum(len(v) for v in memberships.values())} 个, 去重后 {len(items)} 只, "
+                f"各指数买入信号 {groups}, {stats.to_dict()}")
+    save_scan_results(stocks)
 
 
 @analysis_router.get('/stock')
@@ -132,8 +163,7 @@ async def analysis_stock(code: str = None):
 
 
 @analysis_router.get('/funds')
-async def analysis_funds(db: Session = Depends(get_db),
-                         exchange: str = None):
+async def analysis_funds(exchange: str = None):
     # 从请求参数中获取股票指数代码
     # 检查是否提供了code参数
     if exchange is None:
@@ -168,8 +198,7 @@ async def analysis_funds(db: Session = Depends(get_db),
             content={'code': 0, 'msg': 'Index pattern not match, analysis_funds_task not run.'}
         )
 
-    thread = threading.Thread(target=analysis_funds_task, args=(exchange, db))
-    thread.start()
+    start_job('analysis-funds', f'analysis-funds:{date.today()}:{exchange}', exchange)
 
     # 返回任务id和200状态码
     return JSONResponse(
@@ -178,26 +207,29 @@ async def analysis_funds(db: Session = Depends(get_db),
     )
 
 
-def analysis_funds_task(exchange, db: Session):
+@register_job('analysis-funds', daily=True)
+def analysis_funds_task(checkpoint, exchange):
     """
     分析基金任务
 
-    该函数负责调用分析基金的函数，并将分析结果写入数据库
+    该函数负责逐只分析交易所中的基金，并将分析结果写入数据库；
+    每只基金完成后记入检查点，服务重启后从检查点继续。
 
     参数:
+    checkpoint (JobCheckpoint): 任务检查点
     exchange (str): 交易所名称，用于指定要分析的市场
 
     返回:
     stocks (list): 分析后的股票列表
     """
-    stocks = analyze_funds(exchange)
-
-    # 将分析后的股票列表写入数据库
-    save_analyzed_stocks(stocks, db)
+    stats = ScanStats()
+    stocks = checkpoint.run(get_fund_candidates(exchange), lambda stock: stock['code'],
+                            lambda stock: analyze_fund(stock, stats))
 
-    generate_strategies(stocks, db)
+    # 将分析后的股票列表写入数据库，并生成交易策略
+    save_scan_results(stocks)
 
-    logger.info("🚀 分析基金ETF完成!!!")
+    logger.info(f"🚀 分析基金ETF完成!!! exchange = {exchange}, {stats.to_dict()}")
 
     # 返回分析后的股票列表
     return stocks
@@ -209,17 +241,94 @@ class GetAnalyzedStocksReqBody(BaseModel):
 
 
 @analysis_router.post('/analyzed')
-async def get_analyzed_stocks(page: int | None = 1, page_size: int | None = 10,
+async def get_analyzed_stocks(page: int | None = 1, page_size: int | None = 10, cursor: str | None = None,
                               req_body: GetAnalyzedStocksReqBody | None = None,
                               db: Session = Depends(get_db)):
     try:
         exchange = req_body.exchange if req_body else None
         code = req_body.code if req_body else None
-        page = get_page_analyzed_stocks(db, exchange, code, page, page_size)
+        page = get_page_analyzed_stocks(db, exchange, code, page, page_size, cursor)
         return {"code": 0, 'data': page, "msg": "success"}
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"msg": str(e)}
+        )
     except Exception as e:
         logger.info(e, exc_info=True)
         return JSONResponse(
             status_code=500,
             content={"error": str(e)}
         )
+
+
+# 流式筛选支持的输出格式
+SCREEN_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream',
+}
+
+
+@analysis_router.get('/screen')
+def screen_stocks(exchange: str = None, index: str = None, signal: int | None = None, format: str = 'ndjson'):
+    """
+    流式筛选：逐只分析交易所基金或指数成分股，每分析完一只立即以 NDJSON 或 SSE 输出。
+
+    参数:
+        exchange (str): 交易所，分析其中的基金
+        index (str): 指数代码，分析其成分股，与 exchange 二选一
+        signal (int): 只输出该信号的股票，如 1 只输出有买入信号的股票
+        format (str): ndjson 或 sse
+    """
+    if exchange is None and index is None:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param exchange or index is required'}
+        )
+    if format not in SCREEN_MEDIA_TYPES:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param format must be ndjson or sse'}
+        )
+
+    stream = stream_screening(iter_screen_stocks(exchange, index), signal, format)
+    return StreamingResponse(stream, media_type=SCREEN_MEDIA_TYPES[format],
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+class AnalyzeStocksReqBody(BaseModel):
+    codes: list[str] | None = None
+    index: str | None = None
+    exchange: str | None = None
+    concurrency: int = ANALYSIS_CONCURRENCY
+    timeout: float = ANALYSIS_TIMEOUT
+
+
+@analysis_router.post('/stocks')
+def analysis_stocks(req_body: AnalyzeStocksReqBody):
+    """
+    批量分析股票：codes 为股票代码列表，也可以用 index（指数成分股）或 exchange（交易所基金）选择股票。
+
+    超时后返回已完成的部分结果，data.partial 为 true，data.pending 为未完成的代码。
+    """
+    stocks = None
+    if req_body.codes:
+        codes = req_body.codes
+    elif req_body.index is not None:
+        codes = [item['stock_code'] for item in get_index_stocks(req_body.index)]
+    elif req_body.exchange is not None:
+        stocks = {stock['code']: stock for stock in get_fund_candidates(req_body.exchange)}
+        codes = list(stocks)
+    else:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param codes, index or exchange is required'}
+        )
+    if req_body.concurrency < 1 or req_body.timeout <= 0:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param concurrency and timeout must be positive'}
+        )
+
+    data = analyze_codes(codes, stocks, req_body.concurrency, req_body.timeout)
+    return {'code': 0, 'data': data, 'msg': 'success'}
@@ -1,53 +1,230 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime
+
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 from app.analysis.model import AnalyzedStock
+from app.core.env import DB_BATCH_SIZE, ANALYSIS_WORKERS, ANALYSIS_CONCURRENCY, ANALYSIS_TIMEOUT
 from app.core.logger import logger
+from app.core.metrics import DB_WRITE_SECONDS
+from app.core.pagination import paginate, invalidate_count
+from app.fund.service import get_fund_candidates
+from app.index.service import get_index_stocks
+from app.stock.service import KType, get_stock, get_stocks, get_stocks_prices
+from app.strategy.service import analyze_stock
+
+# 流式筛选输出的股票字段
+SCREEN_FIELDS = ('code', 'name', 'exchange', 'signal', 'trending', 'direction', 'price', 'support', 'resistance',
+                 'patterns', 'candlestick_patterns', 'primary_patterns', 'secondary_patterns', 'strategy')
+
+# 批量分析共用的线程池，单个请求的并发数由 analyze_codes 的 concurrency 限制
+analysis_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='analysis')
 
 
-def save_analyzed_stocks(stocks, db: Session):
+def save_analyzed_stocks(stocks, db: Session, batch_size=DB_BATCH_SIZE):
     """
-    将分析过的股票数据插入数据库中。此函数首先根据股票代码删除已存在的股票数据，
-    然后将新的股票数据插入到AnalyzedStock表中。
+    将分析过的股票数据批量插入数据库中。
+
+    analyzed_stock 表只追加不删除，每个批次用一条多行 INSERT 写入并在同一个事务中提交，
+    避免逐条 db.add 带来的大量往返。
 
     参数:
     stocks (list): 包含股票数据的列表，每个股票数据是一个字典，包含股票的代码、名称
                    和其他分析数据如模式、支撑位和阻力位。
+    batch_size (int): 每个事务写入的行数。
     """
 
     if len(stocks) == 0:
         return
 
-    # 把分析过股票插入数据中，根据code删除原有的，再插入AnalyzedStock对应的表中
-    for stock in stocks:
-        analyzed_stock = AnalyzedStock(
-            code=stock["code"],
-            name=stock["name"],
-            exchange=stock["exchange"],
-            patterns=stock.get("patterns", []),
-            support=stock.get("support"),
-            resistance=stock.get("resistance"),
-            price=stock.get("price", None)
-        )
-        db.add(analyzed_stock)
-        logger.info(f"Add {analyzed_stock} to AnalyzedStock")
-
-
-
-def get_page_analyzed_stocks(db: Session, exchange=None, code=None, page=1, page_size=10):
-    query = db.query(AnalyzedStock).order_by(AnalyzedStock.updated_at.desc())
+    now = datetime.now()
+    rows = [
+        {
+            "code": stock["code"],
+            "name": stock["name"],
+            "exchange": stock["exchange"],
+            "patterns": stock.get("patterns", []),
+            "support": stock.get("support"),
+            "resistance": stock.get("resistance"),
+            "price": stock.get("price", None),
+            "watermark": stock.get("watermark"),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for stock in stocks
+    ]
+
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        try:
+            with DB_WRITE_SECONDS.time(AnalyzedStock.__tablename__):
+                db.execute(insert(AnalyzedStock), batch)
+                db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    invalidate_count(AnalyzedStock.__tablename__)
+    logger.info(f"Add {len(rows)} stocks to AnalyzedStock")
+
+
+def get_page_analyzed_stocks(db: Session, exchange=None, code=None, page=1, page_size=10, cursor=None):
+    query = db.query(AnalyzedStock)
     if exchange:
         query = query.filter_by(exchange=exchange)
     if code:
         query = query.filter_by(code=code)
-    total = query.count()
-    skip = (page - 1) * page_size
-    items = query.offset(skip).limit(page_size).all()
+    return paginate(query, AnalyzedStock, AnalyzedStock.__tablename__, (exchange, code), page, page_size, cursor)
+
+
+def iter_screen_stocks(exchange=None, index=None):
+    """
+    按需逐只产生待筛选的股票：指定 index 时为指数成分股，否则为交易所的基金。
+    """
+    if index is not None:
+        for item in get_index_stocks(index):
+            stock = get_stock(item['stock_code'])
+            if stock is not None:
+                yield stock
+        return
+    yield from get_fund_candidates(exchange)
+
+
+def screen_stock(stock, prices=None):
+    """
+    分析单只股票并返回筛选结果（信号、形态、支撑位与阻力位等）。
+
+    参数:
+        stock (dict): 股票信息
+        prices (list, optional): 已获取的日K数据，为 None 时按需拉取
+    """
+    analyze_stock(stock, k_type=KType.DAY, prices=prices)
+    return {field: stock.get(field) for field in SCREEN_FIELDS}
+
+
+def stream_screening(stocks, signal=None, media_type='ndjson'):
+    """
+    逐只分析股票，每得到一个结果就编码输出一条，不在内存中累积结果列表。
+
+    生成器由 StreamingResponse 按发送进度逐条拉取，客户端读取变慢时扫描随之暂停，
+    客户端断开后扫描停止。
+
+    参数:
+        stocks (iterable): 待分析的股票
+        signal (int, optional): 只输出该信号的股票，None 表示全部输出
+        media_type (str): ndjson 每行一个 JSON；sse 为 Server-Sent Events，结束时发送 end 事件
+
+    返回:
+        generator: 编码后的文本块
+    """
+    count = 0
+    matched = 0
+    for stock in stocks:
+        count += 1
+        try:
+            result = screen_stock(stock)
+        except Exception as e:
+            logger.info(f'Failed to screen stock {stock.get("code")}: {e}')
+            continue
+        if signal is not None and result['signal'] != signal:
+            continue
+        matched += 1
+        data = json.dumps(result, ensure_ascii=False, default=str)
+        if media_type == 'sse':
+            yield f'event: stock\ndata: {data}\n\n'
+        else:
+            yield data + '\n'
+
+    logger.info(f"🚀 流式筛选完成, 共分析 {count} 只, 输出 {matched} 只")
+    if media_type == 'sse':
+        yield f'event: end\ndata: {json.dumps({"count": count, "matched": matched})}\n\n'
+
+
+def analyze_code(code, stock=None, prices=None):
+    """
+    分析单只股票，股票信息或K线未预取时单独拉取。
+
+    返回:
+        dict | None: 筛选结果，股票信息不存在时返回 None
+    """
+    if stock is None:
+        stock = get_stock(code)
+    if stock is None:
+        return None
+    return screen_stock(stock, prices)
+
+
+def analyze_codes(codes, stocks=None, concurrency=ANALYSIS_CONCURRENCY, timeout=ANALYSIS_TIMEOUT):
+    """
+    批量分析股票：一次 MGET 预取缓存中的股票信息与日K，再在共用线程池中并行分析。
+
+    单个请求同时最多提交 concurrency 只股票；超过 timeout 秒时不再等待，返回已完成的部分结果，
+    未开始的股票不再分析，正在分析的股票结果丢弃。
+
+    参数:
+        codes (list[str]): 股票代码，重复的代码只分析一次
+        stocks (dict, optional): 已知的股票信息（代码 -> 股票信息），如交易所基金列表
+        concurrency (int): 单个请求的并发上限
+        timeout (float): 超时时间（秒）
+
+    返回:
+        dict: results 为按输入顺序排列的结果，missing 为没有股票信息的代码，failed 为分析出错的代码，
+              pending 为超时未完成的代码，partial 表示结果是否不完整
+    """
+    codes = list(dict.fromkeys(codes))
+    deadline = time.monotonic() + timeout
+    known = stocks or {}
+    cached_stocks = get_stocks([code for code in codes if code not in known])
+    cached_prices = get_stocks_prices(codes, KType.DAY)
+
+    results = {}
+    missing = []
+    failed = []
+    running = {}
+    queue = iter(codes)
+    exhausted = False
+    while True:
+        while not exhausted and len(running) < concurrency:
+            code = next(queue, None)
+            if code is None:
+                exhausted = True
+                break
+            stock = known.get(code) or cached_stocks.get(code)
+            future = analysis_executor.submit(analyze_code, code, stock, cached_prices.get(code))
+            running[future] = code
+        if not running:
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            code = running.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.info(f'Failed to analyze stock {code}: {e}')
+                failed.append(code)
+                continue
+            if result is None:
+                missing.append(code)
+            else:
+                results[code] = result
+
+    pending = []
+    for future, code in running.items():
+        future.cancel()
+        pending.append(code)
+    pending.extend(queue)
+    if pending:
+        logger.info(f'批量分析超时, 已完成 {len(results)} 只, 未完成 {len(pending)} 只')
+
     return {
-        "total": total,
-        "page_num": (total + page_size - 1) // page_size,
-        "page": page,
-        "page_size": page_size,
-        "has_next": page * page_size < total,
-        "has_prev": page > 1,
-        "items": [item.__dict__ for item in items]
+        'results': [results[code] for code in codes if code in results],
+        'missing': missing,
+        'failed': failed,
+        'pending': pending,
+        'partial': len(pending) > 0,
     }
@@ -1,80 +1,200 @@
-import numpy as np
-import pandas as pd
+import math
 
 from app.core.logger import logger
 
+# 依赖全仓、按平仓顺序复利这一资金曲线假设的指标，持仓相互重叠的组合交易不适用
+EQUITY_CURVE_FIELDS = ('total_return_pct', 'max_drawdown_pct', 'exposure_pct', 'turnover', 'score')
+
+# 综合评分中盈亏比的上限，没有亏损交易（盈亏比无穷大）时按上限计分
+PROFIT_LOSS_RATIO_CAP = 5.0
+
+
+def round_or_none(value, n_digits=2):
+    """
+    保留 n_digits 位小数，没有定义（None 或 NaN）的指标返回 None，便于直接序列化为 JSON。
+    """
+    if value is None or math.isnan(value):
+        return None
+    return round(value, n_digits)
+
+
+class StrategyMetrics:
+    """
+    策略评价指标的流式累加器。
+
+    每平仓一笔交易调用一次 add，只维护计数、收益率的累计量与资金曲线的当前值 / 峰值，
+    不保存交易记录，长周期或并行回测可以随时调用 result 得到当前的评价结果。
+
+    资金曲线假设每笔交易全仓、按平仓顺序复利：equity *= 1 + 收益率。
+    """
+
+    __slots__ = ('risk_free_rate', 'total_trades', 'win_trades', 'win_return_sum', 'loss_trades', 'loss_return_sum',
+                 'return_mean', 'return_m2', 'downside_sq_sum', 'max_return', 'min_return', 'holding_days_sum',
+                 'equity', 'peak_equity', 'max_drawdown', 'first_entry', 'last_exit')
+
+    def __init__(self, risk_free_rate=0.0):
+        self.risk_free_rate = risk_free_rate
+        self.total_trades = 0
+        self.win_trades = 0
+        self.win_return_sum = 0.0
+        self.loss_trades = 0
+        self.loss_return_sum = 0.0
+        # Welford 算法累计收益率的均值与离差平方和
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        self.downside_sq_sum = 0.0
+        self.max_return = -math.inf
+        self.min_return = math.inf
+        self.holding_days_sum = 0
+        self.equity = 1.0
+        self.peak_equity = 1.0
+        self.max_drawdown = 0.0
+        self.first_entry = None
+        self.last_exit = None
+
+    def add(self, entry_time, exit_time, entry_price, exit_price, reason=None):
+        """
+        累加一笔已平仓交易，参数与交易记录 (entry_time, exit_time, entry_price, exit_price, reason) 一致。
+        """
+        return_pct = (exit_price - entry_price) / entry_price * 100
+
+        self.total_trades += 1
+        if return_pct > 0:
+            self.win_trades += 1
+            self.win_return_sum += return_pct
+        else:
+            self.loss_trades += 1
+            self.loss_return_sum += return_pct
+
+        delta = return_pct - self.return_mean
+        self.return_mean += delta / self.total_trades
+        self.return_m2 += delta * (return_pct - self.return_mean)
+        if return_pct < 0:
+            self.downside_sq_sum += return_pct ** 2
+        self.max_return = max(self.max_return, return_pct)
+        self.min_return = min(self.min_return, return_pct)
+        self.holding_days_sum += (exit_time - entry_time).days
+
+        # 资金曲线与峰谷回撤
+        self.equity *= 1 + return_pct / 100
+        self.peak_equity = max(self.peak_equity, self.equity)
+        self.max_drawdown = min(self.max_drawdown, (self.equity / self.peak_equity - 1) * 100)
+
+        if self.first_entry is None or entry_time < self.first_entry:
+            self.first_entry = entry_time
+        if self.last_exit is None or exit_time > self.last_exit:
+            self.last_exit = exit_time
+        return self
+
+    def update(self, records):
+        """
+        依次累加多笔交易记录。
+        """
+        for record in records:
+            self.add(*record)
+        return self
+
+    @property
+    def average_return(self):
+        return self.return_mean
+
+    def result(self):
+        """
+        当前的评价指标与综合评分，没有交易时返回空字典。
+        """
+        total_trades = self.total_trades
+        if total_trades == 0:
+            return {}
+
+        avg_return = self.return_mean
+        win_rate = self.win_trades / total_trades * 100
+        avg_win = self.win_return_sum / self.win_trades if self.win_trades else 0
+        avg_loss = self.loss_return_sum / self.loss_trades if self.loss_trades else 0
+        # 没有亏损交易时盈亏比没有定义，报告为 None
+        profit_loss_ratio = -avg_win / avg_loss if avg_loss != 0 else None
+        avg_holding_days = self.holding_days_sum / total_trades
+
+        # 交易覆盖的自然日跨度，用于年化与持仓时间占比
+        span_days = max((self.last_exit - self.first_entry).days, 1)
+        trades_per_year = total_trades / span_days * 365
+
+        # 夏普 / 索提诺比率：按笔收益率，以每年交易笔数年化；只有一笔交易或没有亏损交易时没有定义，为 None
+        std = math.sqrt(self.return_m2 / (total_trades - 1)) if total_trades > 1 else 0.0
+        excess_return = avg_return - self.risk_free_rate / trades_per_year
+        sharpe_ratio = excess_return / std * math.sqrt(trades_per_year) if std > 0 else None
+        downside_std = math.sqrt(self.downside_sq_sum / total_trades)
+        sortino_ratio = excess_return / downside_std * math.sqrt(trades_per_year) if downside_std > 0 else None
+
+        exposure = min(self.holding_days_sum / span_days, 1) * 100
+        # 年换手率：每笔交易全仓买入、卖出各一次
+        turnover = 2 * trades_per_year
+
+        # 综合评分（可自定义权重）
+        score = 0
+        # 盈利能力权重
+        score += avg_return * 0.3
+        if profit_loss_ratio is not None:
+            capped_ratio = min(profit_loss_ratio, PROFIT_LOSS_RATIO_CAP)
+        else:
+            capped_ratio = PROFIT_LOSS_RATIO_CAP if avg_win > 0 else 0
+        score += capped_ratio * 10 * 0.3  # 放大盈亏比权重
+        score += win_rate * 0.1
+        # 风险控制权重
+        score += (0 if self.max_drawdown < 0 else 100) * 0.1  # 最大回撤越低越好
+        score += (sharpe_ratio or 0) * 0.2
+
+        return {
+            "total_trades": total_trades,  # 总交易次数
+            "win_trades": self.win_trades,
+            "win_rate": round(win_rate, 2),  # 胜率 %
+            "average_return_pct": round(avg_return, 2),  # 平均收益率 %
+            "avg_win_pct": round(avg_win, 2),  # 平均盈利 %
+            "avg_loss_pct": round(avg_loss, 2),  # 平均亏损 %
+            "profit_loss_ratio": round_or_none(profit_loss_ratio),  # 盈亏比
+            "max_return_pct": round(self.max_return, 2),  # 最大单笔收益 %
+            "min_return_pct": round(self.min_return, 2),  # 最大单笔亏损 %
+            "total_return_pct": round((self.equity - 1) * 100, 2),  # 资金曲线累计收益率 %
+            "max_drawdown_pct": round(self.max_drawdown, 2),  # 资金曲线峰谷最大回撤 %
+            "avg_holding_days": round(avg_holding_days, 2),  # 平均持仓天数
+            "exposure_pct": round(exposure, 2),  # 持仓时间占比 %
+            "turnover": round(turnover, 2),  # 年换手率（倍）
+            "sharpe_ratio": round_or_none(sharpe_ratio),  # 夏普比率
+            "sortino_ratio": round_or_none(sortino_ratio),  # 索提诺比率
+            "score": round(score, 2),  # 综合评分
+        }
+
+
+def json_safe(value):
+    """
+    将结果中的 NaN / 无穷大替换为 None（递归处理 dict / list / tuple），结果可以按标准 JSON 保存与返回。
+    """
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [json_safe(item) for item in value]
+    return value
+
 
 def evaluate_strategy(records, risk_free_rate=0.0):
     """
     根据回测交易记录评价策略优劣
 
     参数：
-        records: list of tuples
-            每笔交易记录，格式：(entry_time, exit_time, entry_price, exit_price, reason)
+        records: iterable of tuples
+            每笔交易记录，格式：(entry_time, exit_time, entry_price, exit_price, reason)，按平仓顺序排列
         risk_free_rate: float
             无风险收益率，默认0，可用于计算夏普比率
 
     返回：
         dict: 策略各指标和综合评分
     """
-    if not records:
+    result = StrategyMetrics(risk_free_rate).update(records).result()
+    if not result:
         logger.info("无交易记录，无法评价策略")
         return {}
 
-    df = pd.DataFrame(records, columns=['entry_time', 'exit_time', 'entry_price', 'exit_price', 'reason'])
-
-    # 计算收益率和持仓天数
-    df['return_pct'] = (df['exit_price'] - df['entry_price']) / df['entry_price'] * 100
-    df['holding_days'] = (df['exit_time'] - df['entry_time']).dt.days
-
-    total_trades = len(df)
-    wins = df[df['return_pct'] > 0]
-    losses = df[df['return_pct'] <= 0]
-
-    # 基本收益指标
-    avg_return = df['return_pct'].mean()  # 平均每笔收益
-    win_rate = len(wins) / total_trades * 100  # 胜率
-    avg_win = wins['return_pct'].mean() if not wins.empty else 0  # 平均盈利
-    avg_loss = losses['return_pct'].mean() if not losses.empty else 0  # 平均亏损
-    profit_loss_ratio = -avg_win / avg_loss if avg_loss != 0 else np.inf  # 盈亏比
-
-    # 风险指标
-    max_return = df['return_pct'].max()
-    max_drawdown = df['return_pct'].min()
-    avg_holding_days = df['holding_days'].mean()
-
-    # 夏普比率（年化假设252交易日）
-    daily_returns = df['return_pct'] / df['holding_days'].replace(0, 1)  # 避免除0
-    if len(daily_returns) > 1:
-        sharpe_ratio = (daily_returns.mean() - risk_free_rate / 252) / daily_returns.std() * np.sqrt(252)
-    else:
-        sharpe_ratio = np.nan
-
-    # 综合评分（可自定义权重）
-    score = 0
-    # 盈利能力权重
-    score += avg_return * 0.3
-    score += profit_loss_ratio * 10 * 0.3  # 放大盈亏比权重
-    score += win_rate * 0.1
-    # 风险控制权重
-    score += (0 if max_drawdown < 0 else 100) * 0.1  # 最大回撤越低越好
-    score += (sharpe_ratio if not np.isnan(sharpe_ratio) else 0) * 0.2
-
-    result = {
-        "total_trades": total_trades,  # 总交易次数
-        "win_trades": len(wins),
-        "win_rate": round(win_rate, 2),  # 胜率 %
-        "average_return_pct": round(avg_return, 2),  # 平均收益率 %
-        "avg_win_pct": round(avg_win, 2),  # 平均盈利 %
-        "avg_loss_pct": round(avg_loss, 2),  # 平均亏损 %
-        "profit_loss_ratio": round(profit_loss_ratio, 2),  # 盈亏比
-        "max_return_pct": round(max_return, 2),  # 最大单笔收益 %
-        "max_drawdown_pct": round(max_drawdown, 2),  # 最大回撤 %
-        "avg_holding_days": round(avg_holding_days, 2),  # 平均持仓天数
-        "sharpe_ratio": round(sharpe_ratio, 2),  # 夏普比率
-        "score": round(score, 2),  # 综合评分
-    }
-
     logger.info("==== 策略评价结果 ====")
     for k, v in result.items():
         logger.info(f"{k}: {v}")
@@ -0,0 +1,104 @@
+import numpy as np
+
+from app.backtest.runner import alpha_run_backtest
+
+# 分布统计输出的分位数
+PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def trade_returns(records):
+    """
+    交易记录的收益率数组（小数），记录格式为 (entry_time, exit_time, entry_price, exit_price, reason)。
+    """
+    return np.array([(float(exit_price) - float(entry_price)) / float(entry_price)
+                     for _, _, entry_price, exit_price, _ in records], dtype=np.float64)
+
+
+def sample_paths(returns, paths, method='bootstrap', seed=None):
+    """
+    生成 paths × 交易笔数 的收益率矩阵，每行是一条重排后的交易序列。
+
+    参数:
+        returns (ndarray): 原始交易收益率
+        paths (int): 路径数
+        method (str): bootstrap 有放回重采样；permute 对原始序列随机重排（不改变收益率集合，只改变顺序）
+        seed (int, optional): 随机种子
+    """
+    rng = np.random.default_rng(seed)
+    if method == 'bootstrap':
+        return returns[rng.integers(0, len(returns), size=(paths, len(returns)))]
+    if method == 'permute':
+        return rng.permuted(np.broadcast_to(returns, (paths, len(returns))), axis=1)
+    raise ValueError(f'unknown monte carlo method: {method}')
+
+
+def simulate_paths(sampled, ruin_drawdown=50.0):
+    """
+    对收益率矩阵逐行复利，一次性计算所有路径的最终收益率与峰谷最大回撤。
+
+    参数:
+        sampled (ndarray): paths × 交易笔数 的收益率矩阵
+        ruin_drawdown (float): 回撤达到该百分比视为破产
+
+    返回:
+        tuple: (最终收益率 %, 最大回撤 %, 是否破产)，均为长度为 paths 的数组
+    """
+    # 原地计算，整个过程只分配资金曲线与峰值两个矩阵
+    equity = sampled + 1
+    np.cumprod(equity, axis=1, out=equity)
+    peak = np.maximum.accumulate(equity, axis=1)
+    # 初始资金 1 也是峰值的候选
+    np.maximum(peak, 1.0, out=peak)
+    np.divide(equity, peak, out=peak)
+    max_drawdown = (peak.min(axis=1) - 1) * 100
+    final_return = (equity[:, -1] - 1) * 100
+    ruined = max_drawdown <= -ruin_drawdown
+    return final_return, max_drawdown, ruined
+
+
+def describe(values):
+    """
+    数组分布的均值、标准差与分位数。
+    """
+    result = {'mean': round(float(values.mean()), 2), 'std': round(float(values.std()), 2)}
+    for percentile, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        result[f'p{percentile}'] = round(float(value), 2)
+    return result
+
+
+def monte_carlo(records, paths=10000, method='bootstrap', seed=None, ruin_drawdown=50.0):
+    """
+    对回测交易记录做蒙特卡洛重采样，评估策略结果的分布。
+
+    参数:
+        records (list[tuple]): alpha_run_backtest 返回的交易记录
+        paths (int): 模拟路径数
+        method (str): bootstrap / permute
+        seed (int, optional): 随机种子
+        ruin_drawdown (float): 破产回撤阈值（%）
+
+    返回:
+        dict: 最终收益率与最大回撤的分布、破产概率，没有交易记录时返回空字典
+    """
+    returns = trade_returns(records)
+    if len(returns) == 0:
+        return {}
+
+    final_return, max_drawdown, ruined = simulate_paths(sample_paths(returns, paths, method, seed), ruin_drawdown)
+    return {
+        'trades': len(returns),
+        'paths': paths,
+        'method': method,
+        'final_return_pct': describe(final_return),
+        'max_drawdown_pct': describe(max_drawdown),
+        'ruin_drawdown_pct': ruin_drawdown,
+        'ruin_probability': round(float(ruined.mean()), 4),
+    }
+
+
+def run_monte_carlo(stock_code, strategy_name, paths=10000, method='bootstrap', seed=None, ruin_drawdown=50.0):
+    """
+    回测单只股票的交易模型，并对得到的交易记录做蒙特卡洛模拟。
+    """
+    records = alpha_run_backtest(stock_code, strategy_name)[0]
+    return monte_carlo(records, paths, method, seed, ruin_drawdown)
@@ -0,0 +1,259 @@
+import itertools
+import json
+import multiprocessing
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from app.backtest.analyzer import StrategyMetrics
+from app.backtest.runner import backtest_frame
+from app.core.env import OPTIMIZER_WORKERS, OPTIMIZER_MIN_TRADES
+from app.core.job import JobInterrupted, shutdown_requested
+from app.core.logger import logger
+from app.dataset.service import create_price_frame, add_features
+from app.stock.service import get_stock, get_stock_prices
+from app.strategy.plan import get_analysis_plan
+
+# 共享内存中每只股票的行情矩阵列：日期（距 1970-01-01 的天数）、开高低收、成交量
+PRICE_COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+
+# 回测风控参数，其余参数作为交易模型的构造参数
+BACKTEST_PARAMS = ('min_profit_rate', 'max_loss_ratio')
+
+# 子进程内已加载的特征数据，键为共享内存名称
+_frames = {}
+
+
+def configuration_key(config):
+    """
+    参数组合的唯一键，用于检查点。
+    """
+    return json.dumps(config, sort_keys=True)
+
+
+def ranking_score(metrics, min_trades=OPTIMIZER_MIN_TRADES):
+    """
+    用于排序的综合评分，交易次数少于 min_trades 的参数组合没有评分（返回 None），
+    避免只有一两笔盈利交易的组合排在前面。
+    """
+    if not metrics or metrics['total_trades'] < min_trades:
+        return None
+    return metrics['score']
+
+
+def sample_configurations(grid, samples=None, seed=None):
+    """
+    由参数网格生成参数组合。
+
+    参数:
+        grid (dict): 参数名 -> 候选取值列表
+        samples (int, optional): 随机抽取的组合数量，None 或不小于组合总数时返回全部组合
+        seed (int, optional): 随机种子
+
+    返回:
+        list[dict]: 参数组合列表
+    """
+    names = sorted(grid)
+    configurations = [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+    if samples is not None and samples < len(configurations):
+        configurations = random.Random(seed).sample(configurations, samples)
+    return configurations
+
+
+def share_prices(stock, prices):
+    """
+    将股票的复权行情写入共享内存，子进程按名称挂载，不需要随每个任务序列化行情。
+
+    返回:
+        tuple: (SharedMemory, 描述信息 dict)，行情为空时返回 (None, None)
+    """
+    frame = create_price_frame(stock, prices)
+    if frame.empty:
+        return None, None
+
+    matrix = np.empty((len(frame), len(PRICE_COLUMNS)), dtype=np.float64)
+    matrix[:, 0] = frame['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    for i, column in enumerate(PRICE_COLUMNS[1:], start=1):
+        matrix[:, i] = frame[column].to_numpy(dtype=np.float64)
+
+    shm = shared_memory.SharedMemory(create=True, size=matrix.nbytes)
+    np.ndarray(matrix.shape, dtype=np.float64, buffer=shm.buf)[:] = matrix
+    spec = {
+        'code': stock['code'],
+        'stock': stock,
+        'name': shm.name,
+        'shape': matrix.shape,
+    }
+    return shm, spec
+
+
+def share_stocks(codes):
+    """
+    拉取多只股票的行情并写入共享内存，无行情的股票跳过。
+
+    返回:
+        tuple: (SharedMemory 列表, 描述信息列表)，用完后需调用 release_stocks 释放
+    """
+    blocks = []
+    specs = []
+    try:
+        for code in codes:
+            stock = get_stock(code)
+            prices = get_stock_prices(code) if stock is not None else None
+            if not prices:
+                logger.info(f'No prices get for stock {code}, skip')
+                continue
+            shm, spec = share_prices(stock, prices)
+            if shm is None:
+                continue
+            blocks.append(shm)
+            specs.append(spec)
+    except Exception:
+        release_stocks(blocks)
+        raise
+    return blocks, specs
+
+
+def release_stocks(blocks):
+    """
+    释放 share_stocks 创建的共享内存。
+    """
+    for shm in blocks:
+        shm.close()
+        shm.unlink()
+
+
+def load_frame(spec):
+    """
+    从共享内存读取行情并计算特征，每个子进程对每只股票只计算一次，返回副本供单次回测使用。
+    """
+    df = _frames.get(spec['name'])
+    if df is None:
+        shm = shared_memory.SharedMemory(name=spec['name'])
+        try:
+            matrix = np.array(np.ndarray(spec['shape'], dtype=np.float64, buffer=shm.buf))
+        finally:
+            shm.close()
+        frame = pd.DataFrame(matrix[:, 1:], columns=list(PRICE_COLUMNS[1:]))
+        dates = np.datetime_as_string(matrix[:, 0].astype(np.int64).astype('datetime64[D]'))
+        frame.insert(0, 'date', pd.to_datetime(dates, format='%Y-%m-%d'))
+        df = add_features(frame)
+        _frames[spec['name']] = df
+    return df.copy()
+
+
+def backtest_configuration(spec, df, strategy_name, config, start=61):
+    """
+    用一组参数回测单只股票，config 中 min_profit_rate / max_loss_ratio 为风控参数，其余为交易模型构造参数。
+
+    返回:
+        list[tuple]: 交易记录
+    """
+    model_params = tuple(sorted((name, value) for name, value in config.items() if name not in BACKTEST_PARAMS))
+    stock = dict(spec['stock'])
+    plan = get_analysis_plan(stock['stock_type'], strategy_name, model_params=model_params)
+    return backtest_frame(stock, df, strategy_name, start, plan, config.get('min_profit_rate'),
+                          config.get('max_loss_ratio', 0.03))[0]
+
+
+def run_configuration(specs, strategy_name, config, start=61, early_stop_trades=10, early_stop_return=-1.0):
+    """
+    在子进程中用一组参数依次回测全部股票。
+
+    累计交易次数达到 early_stop_trades 后，平均收益率低于 early_stop_return 的参数组合提前停止，
+    不再回测剩余股票。提前停止只看按笔统计的平均收益率，与交易顺序无关；
+    资金曲线相关的指标在全部股票回测完后，按平仓时间重新累计。
+
+    返回:
+        dict: 参数组合、回测股票数、是否提前停止、评价指标
+    """
+    metrics = StrategyMetrics()
+    records = []
+    symbols = 0
+    stopped = False
+    for spec in specs:
+        symbol_records = backtest_configuration(spec, load_frame(spec), strategy_name, config, start)
+        metrics.update(symbol_records)
+        records.extend(symbol_records)
+        symbols += 1
+        if (early_stop_trades and metrics.total_trades >= early_stop_trades
+                and metrics.average_return < early_stop_return):
+            stopped = symbols < len(specs)
+            break
+
+    # 多只股票的交易按平仓时间排列，资金曲线（累计收益、最大回撤）不随 codes 的顺序变化
+    records.sort(key=lambda record: record[1])
+    return {
+        'config': config,
+        'symbols': symbols,
+        'stopped': stopped,
+        'metrics': StrategyMetrics().update(records).result(),
+    }
+
+
+def optimize(codes, strategy_name, grid, samples=None, seed=None, workers=OPTIMIZER_WORKERS, start=61,
+             early_stop_trades=10, early_stop_return=-1.0, top=10, min_trades=OPTIMIZER_MIN_TRADES, checkpoint=None):
+    """
+    交易模型参数寻优：在多只股票上并行回测参数组合，按综合评分排序，交易次数不足 min_trades 的组合排在最后。
+
+    每只股票的行情只拉取、复权一次并放入共享内存，参数组合按进程池并行回测。
+
+    参数:
+        codes (list[str]): 股票代码
+        strategy_name (str): 交易模型名称
+        grid (dict): 参数网格，min_profit_rate / max_loss_ratio 为回测风控参数，其余传给交易模型构造函数
+        samples (int, optional): 随机抽取的参数组合数量，None 为全部组合
+        seed (int, optional): 随机种子
+        workers (int): 进程数
+        start (int): 从第几根K线开始回测
+        early_stop_trades (int): 提前停止判定所需的最少交易次数，0 表示不提前停止
+        early_stop_return (float): 提前停止的平均收益率阈值（%）
+        top (int): 返回评分最高的组合数量
+        min_trades (int): 参与评分排序所需的最少交易次数
+        checkpoint (JobCheckpoint, optional): 任务检查点，已完成的参数组合不再回测；
+            服务关闭时取消未开始的组合并抛出 JobInterrupted
+
+    返回:
+        dict: 股票数、组合数、提前停止的组合数、排序后的结果
+    """
+    configurations = sample_configurations(grid, samples, seed)
+    results = list(checkpoint.results) if checkpoint is not None else []
+    pending = [config for config in configurations
+               if checkpoint is None or not checkpoint.is_done(configuration_key(config))]
+    blocks, specs = share_stocks(codes) if pending else ([], [])
+    try:
+        if specs:
+            context = multiprocessing.get_context('spawn')
+            executor = ProcessPoolExecutor(max_workers=max(1, min(workers, len(pending))), mp_context=context)
+            interrupted = False
+            try:
+                futures = [executor.submit(run_configuration, specs, strategy_name, config, start,
+                                           early_stop_trades, early_stop_return)
+                           for config in pending]
+                for future in as_completed(futures):
+                    result = future.result()
+                    results.append(result)
+                    if checkpoint is not None:
+                        checkpoint.add(configuration_key(result['config']), result)
+                        if shutdown_requested():
+                            interrupted = True
+                            checkpoint.save()
+                            raise JobInterrupted(checkpoint.job_id)
+            finally:
+                executor.shutdown(wait=not interrupted, cancel_futures=interrupted)
+    finally:
+        release_stocks(blocks)
+
+    for result in results:
+        result['score'] = ranking_score(result['metrics'], min_trades)
+    results.sort(key=lambda result: (result['score'] is not None, result['score'] or 0), reverse=True)
+    return {
+        'strategy_name': strategy_name,
+        'symbols': len(specs),
+        'configurations': len(configurations),
+        'stopped': sum(1 for result in results if result['stopped']),
+        'results': results[:top],
+    }
@@ -0,0 +1,166 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from app.backtest.analyzer import evaluate_strategy, EQUITY_CURVE_FIELDS
+from app.backtest.optimizer import share_stocks, release_stocks, load_frame
+from app.backtest.runner import backtest_frame
+from app.core.env import OPTIMIZER_WORKERS
+from app.index.service import get_index_stocks
+
+
+def get_portfolio_codes(index_code=None, codes=None):
+    """
+    组合回测的股票代码：指定指数时取指数成分股，否则使用传入的代码列表，去重并保持顺序。
+    """
+    if index_code is not None:
+        codes = [item['stock_code'] for item in get_index_stocks(index_code)]
+    return list(dict.fromkeys(codes or []))
+
+
+def backtest_symbol(spec, strategy_name, start=61):
+    """
+    在子进程中回测单只股票，返回交易记录与收盘价序列。
+    """
+    df = load_frame(spec)
+    records = backtest_frame(dict(spec['stock']), df, strategy_name, start)[0]
+    return spec['code'], records, df['close']
+
+
+def simulate_portfolio(closes, trades, initial_capital=1_000_000.0, max_positions=10):
+    """
+    按共同交易日历模拟组合资金曲线。
+
+    每个交易日先处理平仓再处理开仓；同时出现的开仓信号按代码顺序依次分配资金，
+    每笔开仓使用 可用资金 / 剩余仓位数，持仓数达到 max_positions 时放弃后续信号。
+    开仓金额与是否放弃取决于之前的成交（可用资金、持仓数依赖路径），因此开平仓仍按时间顺序逐个处理，
+    但只遍历有开仓信号或平仓的交易日；资金变动、持股矩阵与持仓市值按日期一次性累计计算。
+
+    参数:
+        closes (DataFrame): 收盘价矩阵，索引为交易日，列为股票代码，停牌日已向前填充
+        trades (list[tuple]): (code, entry_time, exit_time, entry_price, exit_price, reason)
+        initial_capital (float): 初始资金
+        max_positions (int): 最大同时持仓数
+
+    返回:
+        tuple: (资金曲线 Series, 实际成交的交易列表, 因仓位已满放弃的信号数)
+    """
+    dates = closes.index
+    columns = {code: i for i, code in enumerate(closes.columns)}
+    entries = {}
+    for trade in sorted(trades, key=lambda t: (t[1], t[0])):
+        entries.setdefault(dates.get_loc(trade[1]), []).append(trade)
+
+    # 可能发生资金变动的交易日：开仓信号日与所有信号的平仓日
+    event_days = sorted(set(entries) | {dates.get_loc(trade[2]) for trade in trades})
+    exits = {}
+    cash_delta = np.zeros(len(dates), dtype=np.float64)
+    delta = np.zeros(closes.shape, dtype=np.float64)
+    available = float(initial_capital)
+    holding = 0
+    skipped = 0
+    accepted = []
+    for i in event_days:
+        before = available
+        for shares, exit_price in exits.pop(i, ()):
+            available += shares * exit_price
+            holding -= 1
+        for trade in entries.get(i, ()):
+            code, entry_time, exit_time, entry_price, exit_price, _ = trade
+            if holding >= max_positions or available <= 0:
+                skipped += 1
+                continue
+            shares = available / (max_positions - holding) / entry_price
+            available -= shares * entry_price
+            holding += 1
+            exit_idx = dates.get_loc(exit_time)
+            delta[i, columns[code]] += shares
+            delta[exit_idx, columns[code]] -= shares
+            exits.setdefault(exit_idx, []).append((shares, exit_price))
+            accepted.append(trade)
+        cash_delta[i] += available - before
+
+    cash = initial_capital + np.cumsum(cash_delta)
+
+    positions = np.cumsum(delta, axis=0)
+    market_value = np.nansum(positions * closes.to_numpy(dtype=np.float64), axis=1)
+    return pd.Series(cash + market_value, index=dates), accepted, skipped
+
+
+def portfolio_stats(equity, initial_capital):
+    """
+    组合资金曲线的汇总指标：总收益、年化收益、峰谷最大回撤、日收益夏普比率（年化假设252交易日）。
+    """
+    values = equity.to_numpy(dtype=np.float64)
+    peak = np.maximum.accumulate(values)
+    drawdown = (values / peak - 1) * 100
+    daily_returns = np.diff(values) / values[:-1]
+    std = daily_returns.std(ddof=1) if len(daily_returns) > 1 else 0.0
+    sharpe_ratio = daily_returns.mean() / std * np.sqrt(252) if std > 0 else 0.0
+    total_return = values[-1] / initial_capital - 1
+    annual_return = (values[-1] / initial_capital) ** (252 / len(values)) - 1
+
+    return {
+        "initial_capital": round(initial_capital, 2),
+        "final_equity": round(float(values[-1]), 2),
+        "total_return_pct": round(float(total_return) * 100, 2),  # 总收益率 %
+        "annual_return_pct": round(float(annual_return) * 100, 2),  # 年化收益率 %
+        "max_drawdown_pct": round(float(drawdown.min()), 2),  # 资金曲线峰谷最大回撤 %
+        "sharpe_ratio": round(float(sharpe_ratio), 2),  # 夏普比率
+    }
+
+
+def portfolio_backtest(strategy_name, index_code=None, codes=None, initial_capital=1_000_000.0, max_positions=10,
+                       workers=OPTIMIZER_WORKERS, start=61):
+    """
+    组合回测：对指数成分股或股票列表同时回测一个交易模型，在共同的交易日历上分配资金。
+
+    每只股票的行情只拉取一次并放入共享内存，单只股票的信号与交易记录在进程池中并行生成，
+    之后按交易日模拟开平仓与资金分配，得到组合资金曲线与汇总指标。
+
+    参数:
+        strategy_name (str): 交易模型名称
+        index_code (str, optional): 指数代码，指定时回测其成分股
+        codes (list[str], optional): 股票代码列表，未指定指数时使用
+        initial_capital (float): 初始资金
+        max_positions (int): 最大同时持仓数
+        workers (int): 进程数
+        start (int): 每只股票从第几根K线开始回测
+
+    返回:
+        dict: 汇总指标、交易评价、放弃的信号数、资金曲线；
+            交易评价只包含按笔统计的指标，组合的收益与回撤见汇总指标
+    """
+    blocks, specs = share_stocks(get_portfolio_codes(index_code, codes))
+    try:
+        results = []
+        if specs:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(specs))), mp_context=context) as executor:
+                futures = [executor.submit(backtest_symbol, spec, strategy_name, start) for spec in specs]
+                results = [future.result() for future in futures]
+    finally:
+        release_stocks(blocks)
+
+    if not results:
+        return {'strategy_name': strategy_name, 'symbols': 0, 'stats': {}, 'trades': {}, 'skipped_signals': 0,
+                'equity_curve': []}
+
+    # 共同交易日历：各股票交易日的并集，停牌日沿用上一交易日收盘价
+    closes = pd.concat({code: close for code, _, close in results}, axis=1).sort_index().ffill()
+    trades = [(code,) + record for code, records, _ in results for record in records]
+    equity, accepted, skipped = simulate_portfolio(closes, trades, initial_capital, max_positions)
+    # 成交的交易按开仓排列且持仓相互重叠，全仓复利的资金曲线指标与组合资金曲线矛盾，只保留按笔统计的指标
+    metrics = evaluate_strategy(sorted((trade[1:] for trade in accepted), key=lambda record: record[1]))
+
+    return {
+        'strategy_name': strategy_name,
+        'symbols': len(results),
+        'stats': portfolio_stats(equity, initial_capital),
+        'trades': {name: value for name, value in metrics.items() if name not in EQUITY_CURVE_FIELDS},
+        'skipped_signals': skipped,
+        'equity_curve': [{'date': date.strftime('%Y-%m-%d'), 'equity': round(float(value), 2)}
+                         for date, value in equity.items()],
+    }
@@ -1,12 +1,39 @@
+import json
+import uuid
+
 from fastapi import APIRouter
+from pydantic import BaseModel
 from starlette.responses import JSONResponse
 
-from app.backtest.analyzer import evaluate_strategy
+from app.backtest.analyzer import evaluate_strategy, json_safe
+from app.backtest.montecarlo import run_monte_carlo
+from app.backtest.optimizer import optimize
+from app.backtest.portfolio import portfolio_backtest
 from app.backtest.runner import alpha_run_backtest
+from app.backtest.walkforward import walk_forward
+from app.core.env import OPTIMIZER_WORKERS, OPTIMIZER_MIN_TRADES
+from app.core.job import JobInterrupted, register_job, start_job
 from app.core.logger import logger
+from app.core.redis import get_cache, set_cache
 
 router = APIRouter()
 
+# 回测任务结果：参数寻优、组合回测、滚动前推优化、蒙特卡洛模拟
+OPTIMIZE_JOB_KEY = 'Trading-Plus:Backtest:Optimize:{job_id}'
+PORTFOLIO_JOB_KEY = 'Trading-Plus:Backtest:Portfolio:{job_id}'
+WALK_FORWARD_JOB_KEY = 'Trading-Plus:Backtest:WalkForward:{job_id}'
+MONTE_CARLO_JOB_KEY = 'Trading-Plus:Backtest:MonteCarlo:{job_id}'
+BACKTEST_JOB_TTL = 60 * 60 * 24
+
+# 回测任务类型 -> (任务名称, 结果键, 任务函数)，参数寻优按参数组合写入检查点，其余任务恢复时重新执行
+BACKTEST_JOBS = {
+    'optimize': ('参数寻优', OPTIMIZE_JOB_KEY,
+                 lambda checkpoint, **kwargs: optimize(checkpoint=checkpoint, **kwargs)),
+    'portfolio': ('组合回测', PORTFOLIO_JOB_KEY, lambda checkpoint, **kwargs: portfolio_backtest(**kwargs)),
+    'walk-forward': ('滚动前推优化', WALK_FORWARD_JOB_KEY, lambda checkpoint, **kwargs: walk_forward(**kwargs)),
+    'monte-carlo': ('蒙特卡洛模拟', MONTE_CARLO_JOB_KEY, lambda checkpoint, **kwargs: run_monte_carlo(**kwargs)),
+}
+
 
 @router.get('/strategy')
 def analysis_stock(stick_code: str = None, strategy_name: str = None):
@@ -39,3 +66,149 @@ def analysis_stock(stick_code: str = None, strategy_name: str = None):
 
     # 返回分析后的股票信息
     return {'code': 0, 'data': result, 'msg': 'success'}
+
+
+@register_job('backtest')
+def backtest_job_task(checkpoint, kind, job_id, kwargs):
+    name, key_template, func = BACKTEST_JOBS[kind]
+    key = key_template.format(job_id=job_id)
+    try:
+        result = func(checkpoint, **kwargs)
+        # NaN / 无穷大不是合法的 JSON，保存前替换为 None，否则查询结果时无法序列化
+        set_cache(key, json.dumps({'status': 'done', 'result': json_safe(result)}, default=str, allow_nan=False),
+                  BACKTEST_JOB_TTL)
+        logger.info(f"🚀 {name}完成, key = {key}")
+    except JobInterrupted:
+        raise
+    except Exception as e:
+        logger.info(f"{name}失败, key = {key}: {e}", exc_info=True)
+        set_cache(key, json.dumps({'status': 'failed', 'msg': str(e)}), BACKTEST_JOB_TTL)
+
+
+def start_backtest_job(kind, kwargs):
+    """
+    在后台线程中运行可恢复的回测任务，结果写入 Redis，返回任务 ID。
+    """
+    job_id = uuid.uuid4().hex
+    _, key_template, _ = BACKTEST_JOBS[kind]
+    set_cache(key_template.format(job_id=job_id), json.dumps({'status': 'running'}), BACKTEST_JOB_TTL)
+    start_job('backtest', f'backtest:{kind}:{job_id}', kind, job_id, kwargs)
+    return {'code': 0, 'data': {'job_id': job_id}, 'msg': 'Job running'}
+
+
+def get_backtest_job(key_template, job_id):
+    value = get_cache(key_template.format(job_id=job_id))
+    if value is None:
+        return JSONResponse(
+            status_code=404,
+            content={"msg": "job not found"}
+        )
+    return {'code': 0, 'data': json.loads(value), 'msg': 'success'}
+
+
+class OptimizeReqBody(BaseModel):
+    codes: list[str]
+    strategy_name: str
+    grid: dict[str, list]
+    samples: int | None = None
+    seed: int | None = None
+    workers: int = OPTIMIZER_WORKERS
+    early_stop_trades: int = 10
+    early_stop_return: float = -1.0
+    top: int = 10
+    min_trades: int = OPTIMIZER_MIN_TRADES
+
+
+@router.post('/optimize')
+def optimize_strategy(req_body: OptimizeReqBody):
+    if not req_body.codes or not req_body.grid:
+        return JSONResponse(
+            status_code=400,
+            content={"msg": "param codes and grid are required"}
+        )
+
+    return start_backtest_job('optimize', req_body.model_dump())
+
+
+@router.get('/optimize/{job_id}')
+def get_optimize_result(job_id: str):
+    return get_backtest_job(OPTIMIZE_JOB_KEY, job_id)
+
+
+class PortfolioReqBody(BaseModel):
+    index_code: str | None = None
+    codes: list[str] | None = None
+    strategy_name: str
+    initial_capital: float = 1_000_000.0
+    max_positions: int = 10
+    workers: int = OPTIMIZER_WORKERS
+
+
+@router.post('/portfolio')
+def backtest_portfolio(req_body: PortfolioReqBody):
+    if req_body.index_code is None and not req_body.codes:
+        return JSONResponse(
+            status_code=400,
+            content={"msg": "param index_code or codes is required"}
+        )
+
+    return start_backtest_job('portfolio', req_body.model_dump())
+
+
+@router.get('/portfolio/{job_id}')
+def get_portfolio_result(job_id: str):
+    return get_backtest_job(PORTFOLIO_JOB_KEY, job_id)
+
+
+class WalkForwardReqBody(BaseModel):
+    codes: list[str]
+    strategy_name: str
+    grid: dict[str, list]
+    train_size: int = 250
+    test_size: int = 60
+    step: int | None = None
+    samples: int | None = None
+    seed: int | None = None
+    workers: int = OPTIMIZER_WORKERS
+    min_trades: int = OPTIMIZER_MIN_TRADES
+
+
+@router.post('/walk-forward')
+def backtest_walk_forward(req_body: WalkForwardReqBody):
+    if not req_body.codes or not req_body.grid:
+        return JSONResponse(
+            status_code=400,
+            content={"msg": "param codes and grid are required"}
+        )
+
+    return start_backtest_job('walk-forward', req_body.model_dump())
+
+
+@router.get('/walk-forward/{job_id}')
+def get_walk_forward_result(job_id: str):
+    return get_backtest_job(WALK_FORWARD_JOB_KEY, job_id)
+
+
+class MonteCarloReqBody(BaseModel):
+    stock_code: str
+    strategy_name: str
+    paths: int = 10000
+    method: str = 'bootstrap'
+    seed: int | None = None
+    ruin_drawdown: float = 50.0
+
+
+@router.post('/monte-carlo')
+def backtest_monte_carlo(req_body: MonteCarloReqBody):
+    if req_body.method not in ('bootstrap', 'permute'):
+        return JSONResponse(
+            status_code=400,
+            content={"msg": "param method must be bootstrap or permute"}
+        )
+
+    return start_backtest_job('monte-carlo', req_body.model_dump())
+
+
+@router.get('/monte-carlo/{job_id}')
+def get_monte_carlo_result(job_id: str):
+    return get_backtest_job(MONTE_CARLO_JOB_KEY, job_id)
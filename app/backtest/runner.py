@@ -20,10 +20,11 @@ from app.indicator.secondary.mfi import MFI
 from app.indicator.secondary.obv import OBV
 from app.indicator.secondary.vol import VOL
 from app.indicator.secondary.vpt import VPT
-from app.indicator.service import get_exit_patterns
 from app.stock.service import get_stock_prices, get_stock, KType
 from app.strategy.model import TradingStrategy
+from app.strategy.plan import get_analysis_plan
 from app.strategy.service import analyze_stock, analyze_stock_prices
+from app.strategy.trading_model import TradingModel
 
 
 def build_pattern_objects(pattern_names, signal=1):
@@ -122,18 +123,41 @@ def run_backtest(strategy: TradingStrategy):
 def alpha_run_backtest(stock_code, strategy_name, start=61):
     stock = get_stock(stock_code)
     prices = get_stock_prices(stock_code)
+    if not prices:
+        return [], [], [], [], []
+
+    df = create_dataframe(stock, prices)
+    return backtest_frame(stock, df, strategy_name, start)
+
+
+def backtest_frame(stock, df, strategy_name, start=61, plan=None, min_profit_rate=None, max_loss_ratio=0.03):
+    """
+    在已计算好特征的 DataFrame 上逐根K线回测单个交易模型。
+
+    参数:
+        stock (dict): 股票信息
+        df (DataFrame): create_dataframe 返回的特征数据
+        strategy_name (str): 交易模型名称
+        start (int): 从第几根K线开始回测
+        plan (AnalysisPlan, optional): 指定分析计划（如带模型参数的计划），默认按 strategy_name 构建
+        min_profit_rate (float, optional): 不为 None 时，开仓前按该盈亏比阈值做风控校验
+        max_loss_ratio (float): 风控校验的最大止损比例
+
+    返回:
+        tuple: (交易记录, 盈利形态, 亏损形态, 趋势列表, 方向列表)，
+        交易记录格式为 (entry_time, exit_time, entry_price, exit_price, reason)
+    """
     records = []
     win_patterns = []
     loss_patterns = []
     trending_list = []
     direction_list = []
-    if not prices:
-        return records, win_patterns, loss_patterns, trending_list, direction_list
-
-    df = create_dataframe(stock, prices)
     if df is None or df.empty:
         return records, win_patterns, loss_patterns, trending_list, direction_list
 
+    if plan is None:
+        plan = get_analysis_plan(stock['stock_type'], strategy_name)
+
     strategy = None
     holding = False
     entry_price, entry_time = None, None
@@ -148,8 +172,10 @@ def alpha_run_backtest(stock_code, strategy_name, start=61):
 
         # 更新策略
         if strategy is None:
-            _strategy = analyze_stock_prices(stock, df.iloc[:i], strategy_name)
-            if _strategy and _strategy.signal == 1:
+            _strategy = analyze_stock_prices(stock, df.iloc[:i], strategy_name, plan=plan)
+            if _strategy and _strategy.signal == 1 and (
+                    min_profit_rate is None
+                    or TradingModel.check_trading_strategy(stock, _strategy, max_loss_ratio, min_profit_rate)):
                 strategy = _strategy
                 trending = stock['trending']
                 direction = stock['direction']
@@ -205,12 +231,10 @@ def alpha_run_backtest(stock_code, strategy_name, start=61):
             continue
 
         # 是否有提前退出信号
-        exit_patterns = get_exit_patterns()
-        matched_patterns = []
-        for pattern in exit_patterns:
-            if pattern.match(stock, df.iloc[:i + 1], None, None):
-                matched_patterns.append(pattern)
-            if len(matched_patterns) > 0:
+        sub_df = df.iloc[:i + 1]
+        for pattern in plan.exit_patterns:
+            if pattern.evaluate(stock, sub_df, None, None) is not None:
                 strategy.signal = -1
+                break
 
     return records, win_patterns, loss_patterns, trending_list, direction_list
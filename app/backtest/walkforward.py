@@ -0,0 +1,121 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from app.backtest.analyzer import StrategyMetrics, evaluate_strategy
+from app.backtest.optimizer import sample_configurations, share_stocks, release_stocks, load_frame, \
+    backtest_configuration, ranking_score
+from app.core.env import OPTIMIZER_WORKERS, OPTIMIZER_MIN_TRADES
+
+
+def split_windows(length, train_size, test_size, step=None, start=61):
+    """
+    将K线序列切分为滚动的 训练 / 测试 窗口。
+
+    参数:
+        length (int): K线数量
+        train_size (int): 训练窗口K线数
+        test_size (int): 测试窗口K线数
+        step (int, optional): 窗口每次前移的K线数，默认等于 test_size，测试窗口首尾相接
+        start (int): 第一个训练窗口的起点，之前的K线只作为指标的历史数据
+
+    返回:
+        list[tuple]: (训练起点, 训练终点 = 测试起点, 测试终点)，均为位置，终点不含
+    """
+    step = step or test_size
+    windows = []
+    train_start = start
+    while train_start + train_size + test_size <= length:
+        train_end = train_start + train_size
+        windows.append((train_start, train_end, train_end + test_size))
+        train_start += step
+    return windows
+
+
+def run_window(spec, strategy_name, configurations, window, min_trades=OPTIMIZER_MIN_TRADES):
+    """
+    在子进程中处理单只股票的一个窗口：训练窗口内选出评分最高的参数组合，再在测试窗口内回测。
+    训练窗口内交易少于 min_trades 笔的参数组合没有评分（见 ranking_score），不参与选择。
+
+    特征数据对每只股票只计算一次，窗口只按位置切片；
+    训练只使用训练终点之前的数据，测试从测试起点开始开仓，测试窗口结束时未平仓的交易不计入。
+
+    返回:
+        dict: 窗口日期、选出的参数组合、训练评分与测试交易记录
+    """
+    train_start, train_end, test_end = window
+    df = load_frame(spec)
+
+    best_config, best_score = None, None
+    train_df = df.iloc[:train_end]
+    for config in configurations:
+        records = backtest_configuration(spec, train_df, strategy_name, config, train_start)
+        score = ranking_score(StrategyMetrics().update(records).result(), min_trades)
+        if score is not None and (best_score is None or score > best_score):
+            best_config, best_score = config, score
+
+    records = []
+    if best_config is not None:
+        records = backtest_configuration(spec, df.iloc[:test_end], strategy_name, best_config, train_end)
+
+    return {
+        'code': spec['code'],
+        'train': [df.index[train_start].strftime('%Y-%m-%d'), df.index[train_end - 1].strftime('%Y-%m-%d')],
+        'test': [df.index[train_end].strftime('%Y-%m-%d'), df.index[test_end - 1].strftime('%Y-%m-%d')],
+        'config': best_config,
+        'train_score': best_score,
+        'records': records,
+    }
+
+
+def walk_forward(codes, strategy_name, grid, train_size=250, test_size=60, step=None, samples=None, seed=None,
+                 workers=OPTIMIZER_WORKERS, start=61, min_trades=OPTIMIZER_MIN_TRADES):
+    """
+    滚动前推（walk-forward）优化：每个训练窗口内寻优参数，在随后的测试窗口做样本外回测，
+    拼接全部测试窗口的交易记录并用 evaluate_strategy 评价。
+
+    所有窗口共用同一组候选参数，(股票, 窗口) 按进程池并行；训练窗口内没有交易的窗口不做测试。
+
+    参数:
+        codes (list[str]): 股票代码
+        strategy_name (str): 交易模型名称
+        grid (dict): 参数网格，格式同 optimize
+        train_size (int): 训练窗口K线数
+        test_size (int): 测试窗口K线数
+        step (int, optional): 窗口每次前移的K线数，默认等于 test_size
+        samples (int, optional): 随机抽取的参数组合数量，None 为全部组合
+        seed (int, optional): 随机种子
+        workers (int): 进程数
+        start (int): 第一个训练窗口的起点
+        min_trades (int): 训练窗口内参数组合参与评分所需的最少交易次数
+
+    返回:
+        dict: 窗口列表、拼接后的样本外交易记录与评价指标
+    """
+    configurations = sample_configurations(grid, samples, seed)
+    blocks, specs = share_stocks(codes)
+    try:
+        tasks = [(spec, window) for spec in specs
+                 for window in split_windows(spec['shape'][0], train_size, test_size, step, start)]
+        windows = []
+        if tasks and configurations:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tasks))), mp_context=context) as executor:
+                futures = [executor.submit(run_window, spec, strategy_name, configurations, window, min_trades)
+                           for spec, window in tasks]
+                windows = [future.result() for future in futures]
+    finally:
+        release_stocks(blocks)
+
+    records = sorted((record for window in windows for record in window['records']), key=lambda record: record[0])
+    # 资金曲线按平仓顺序累计
+    metrics = evaluate_strategy(sorted(records, key=lambda record: record[1]))
+    for window in windows:
+        window['trades'] = len(window.pop('records'))
+
+    return {
+        'strategy_name': strategy_name,
+        'symbols': len(specs),
+        'windows': windows,
+        'records': records,
+        'metrics': metrics,
+    }
@@ -0,0 +1,152 @@
+import contextvars
+import functools
+
+import numpy as np
+
+# 当前分析中的股票共用的访问器，按线程隔离，见 share_bars
+_shared_bars = contextvars.ContextVar('shared_bars', default=None)
+
+
+class Bars:
+    """
+    K线序列的轻量访问器。
+
+    直接读取 DataFrame 各列底层的 numpy 数组（按列懒加载，每列只取一次），
+    按位置或标签取出的单根K线 Bar 只记录位置，读取字段时返回 Python 原生 float/int，
+    避免 df.iloc[-1] / df.loc[idx] 为读取一个数值而构造整行的混合类型 Series。
+
+    Bars 只反映构建时 DataFrame 的列数据，DataFrame 的列被重新赋值后需重新构建。
+    """
+
+    __slots__ = ('df', 'index', '_columns')
+
+    def __init__(self, df):
+        self.df = df
+        self.index = df.index
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def column(self, name):
+        """
+        获取列的 numpy 数组。
+        """
+        array = self._columns.get(name)
+        if array is None:
+            array = self.df[name].to_numpy()
+            self._columns[name] = array
+        return array
+
+    def value(self, name, pos):
+        """
+        读取第 pos 根K线的字段值（支持负数位置），返回 Python 原生类型。
+        """
+        value = self.column(name)[pos]
+        return value.item() if isinstance(value, np.generic) else value
+
+    def __getitem__(self, pos):
+        """
+        按位置获取K线，支持负数位置。
+        """
+        size = len(self.index)
+        if pos < 0:
+            pos += size
+        if pos < 0 or pos >= size:
+            raise IndexError(f'bar position out of range: {pos}')
+        return Bar(self, pos)
+
+    def loc(self, label):
+        """
+        按索引标签获取K线。
+        """
+        pos = self.index.get_loc(label)
+        if isinstance(pos, slice):
+            pos = pos.start
+        return Bar(self, pos)
+
+    @property
+    def last(self):
+        return self[-1]
+
+
+class Bar:
+    """
+    单根K线的视图，支持 bar['close'] 与 bar.close 两种读取方式，
+    name 为该K线的索引标签，可直接传给 get_distance 等按 point.name 定位的函数。
+    """
+
+    __slots__ = ('bars', 'pos')
+
+    def __init__(self, bars, pos):
+        self.bars = bars
+        self.pos = pos
+
+    @property
+    def name(self):
+        return self.bars.index[self.pos]
+
+    def __getitem__(self, column):
+        return self.bars.value(column, self.pos)
+
+    def get(self, column, default=None):
+        if column not in self.bars.df.columns:
+            return default
+        return self.bars.value(column, self.pos)
+
+    @property
+    def open(self):
+        return self.bars.value('open', self.pos)
+
+    @property
+    def high(self):
+        return self.bars.value('high', self.pos)
+
+    @property
+    def low(self):
+        return self.bars.value('low', self.pos)
+
+    @property
+    def close(self):
+        return self.bars.value('close', self.pos)
+
+    @property
+    def volume(self):
+        return self.bars.value('volume', self.pos)
+
+    def __repr__(self):
+        return f'Bar(pos={self.pos}, name={self.name!r})'
+
+
+def get_bars(df):
+    """
+    获取 df 的访问器。
+
+    在 share_bars 包装的分析过程中，同一只股票的 DataFrame 共用一个 Bars，各指标、交易模型不再各自构建；
+    其他 DataFrame（如回测按位置切片得到的）新建一个。分析过程中只会新增列（如缺失的均线），
+    不会重新赋值已有的列；行被原地修改（如 dropna(inplace=True)）后索引对象随之改变，此时重新构建共用的 Bars。
+    """
+    bars = _shared_bars.get()
+    if bars is None or bars.df is not df:
+        return Bars(df)
+    if bars.index is not df.index:
+        bars = Bars(df)
+        _shared_bars.set(bars)
+    return bars
+
+
+def share_bars(func):
+    """
+    装饰 func(stock, df, ...)：调用期间为 df 构建一个 Bars，其中的 get_bars(df) 都返回这一个，返回后释放。
+    嵌套调用（外层已为同一个 df 构建）时沿用外层的 Bars。
+    """
+
+    @functools.wraps(func)
+    def wrapper(stock, df, *args, **kwargs):
+        token = _shared_bars.set(get_bars(df))
+        try:
+            return func(stock, df, *args, **kwargs)
+        finally:
+            _shared_bars.reset(token)
+
+    return wrapper
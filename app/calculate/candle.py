@@ -0,0 +1,119 @@
+from functools import cached_property
+
+import numpy as np
+
+# 严格锤子线 / 吊颈线：影线长度占整根K线波动范围的比例阈值
+STRICT_SHADOW_RATIO = 2 / 3
+
+
+def lower_shadows(open_, low, close):
+    """
+    所有K线的下影线长度：阳线为 开盘价 - 最低价，阴线为 收盘价 - 最低价。
+    """
+    return np.minimum(open_, close) - low
+
+
+def upper_shadows(open_, high, close):
+    """
+    所有K线的上影线长度：阳线为 最高价 - 收盘价，阴线为 最高价 - 开盘价。
+    """
+    return high - np.maximum(open_, close)
+
+
+def _shadow_ratio_mask(shadow, price_range):
+    """
+    影线占波动范围的比例大于阈值的掩码，波动范围为 0 的K线不满足。
+    """
+    valid = price_range > 0
+    ratio = np.divide(shadow, price_range, out=np.zeros_like(shadow, dtype=np.float64), where=valid)
+    return valid & (ratio > STRICT_SHADOW_RATIO)
+
+
+def amplitude_percentages(high, low, close):
+    """
+    所有K线的振幅占前一根K线收盘价的百分比，第一根K线没有前收盘价，结果为 NaN。
+    """
+    prev_close = np.concatenate(([np.nan], close[:-1]))
+    return (high - low) / prev_close * 100
+
+
+def later_low_minimums(low):
+    """
+    反向累计最小值：每根K线之后（不含自身）所有K线的最低价，最后一根为 inf。
+    """
+    suffix_min = np.minimum.accumulate(low[::-1])[::-1]
+    return np.append(suffix_min[1:], np.inf)
+
+
+class CandleArrays:
+    """
+    整个K线序列的单根K线形态数组。
+
+    各数组按需计算一次，之后对任意K线位置的查询都是 O(1)。
+    注意 hammer_effective / later_low_min 依赖该K线之后的数据，
+    回测时应基于截止到当前K线的数据构建，避免使用未来数据。
+    """
+
+    def __init__(self, open_, high, low, close):
+        self.open = np.asarray(open_, dtype=np.float64)
+        self.high = np.asarray(high, dtype=np.float64)
+        self.low = np.asarray(low, dtype=np.float64)
+        self.close = np.asarray(close, dtype=np.float64)
+
+    @classmethod
+    def from_df(cls, df):
+        """
+        从包含 open、high、low、close 列的 DataFrame 构建。
+        """
+        return cls(df['open'].to_numpy(), df['high'].to_numpy(), df['low'].to_numpy(), df['close'].to_numpy())
+
+    def __len__(self):
+        return len(self.close)
+
+    @cached_property
+    def lower_shadow(self):
+        return lower_shadows(self.open, self.low, self.close)
+
+    @cached_property
+    def upper_shadow(self):
+        return upper_shadows(self.open, self.high, self.close)
+
+    @cached_property
+    def hammer_strict(self):
+        """
+        严格锤子线掩码：下影线占波动范围的比例超过阈值。
+        """
+        return _shadow_ratio_mask(self.lower_shadow, self.high - self.low)
+
+    @cached_property
+    def hangingman_strict(self):
+        """
+        严格吊颈线掩码：上影线占波动范围的比例超过阈值（即流星线形态）。
+        """
+        return _shadow_ratio_mask(self.upper_shadow, self.high - self.low)
+
+    @cached_property
+    def amplitude(self):
+        return amplitude_percentages(self.high, self.low, self.close)
+
+    @cached_property
+    def later_low_min(self):
+        return later_low_minimums(self.low)
+
+    @cached_property
+    def hammer_effective(self):
+        """
+        锤子线有效掩码：之后没有任何K线的最低价低于该K线的最低价。
+        """
+        return ~(self.later_low_min < self.low)
+
+    def lowest_hammer(self, recent):
+        """
+        最近 recent 根K线中最低价最低的严格锤子线位置，最低价相同时取较新的一根，没有则返回 None。
+        """
+        start = max(len(self) - recent, 0)
+        positions = start + np.flatnonzero(self.hammer_strict[start:])
+        if len(positions) == 0:
+            return None
+        lows = self.low[positions][::-1]
+        return int(positions[len(positions) - 1 - int(np.argmin(lows))])
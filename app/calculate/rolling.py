@@ -0,0 +1,145 @@
+import numpy as np
+import pandas as pd
+
+
+class RollingStats:
+    """
+    多窗口滚动统计内核。
+
+    对一条连续的 float64 数组只做一次累积和（cumsum）遍历，得到一阶、二阶前缀和，
+    之后任意窗口的均值 / 标准差都可以用前缀和差分在 O(n) 内得到，
+    多个窗口（5、10、20、50、120、200 ...）共享同一次遍历。
+
+    数值稳定性：
+      - 先减去序列均值再求前缀和（shifted data），避免价格量级较大时
+        “平方和 - 和的平方” 的灾难性抵消；
+      - 方差结果截断为非负，消除浮点误差带来的极小负数。
+
+    与 pandas rolling(window) 的语义一致：窗口内存在 NaN 或数据不足 window 根时结果为 NaN。
+    """
+
+    def __init__(self, values):
+        x = np.ascontiguousarray(values, dtype=np.float64)
+        valid = np.isfinite(x)
+        self.size = x.shape[0]
+        self.shift = float(x[valid].mean()) if valid.any() else 0.0
+
+        shifted = np.where(valid, x - self.shift, 0.0)
+        # 前缀和首位补 0，窗口 [i-w+1, i] 的和为 prefix[i+1] - prefix[i+1-w]
+        self._sum = np.zeros(self.size + 1)
+        self._sq_sum = np.zeros(self.size + 1)
+        self._count = np.zeros(self.size + 1, dtype=np.int64)
+        np.cumsum(shifted, out=self._sum[1:])
+        np.cumsum(shifted * shifted, out=self._sq_sum[1:])
+        np.cumsum(valid, out=self._count[1:])
+
+    def _window_sums(self, window):
+        window = int(window)
+        if window <= 0:
+            raise ValueError(f'window must be positive, got {window}')
+        s = np.full(self.size, np.nan)
+        sq = np.full(self.size, np.nan)
+        count = np.zeros(self.size, dtype=np.int64)
+        if window > self.size:
+            return s, sq, count
+
+        s[window - 1:] = self._sum[window:] - self._sum[:-window]
+        sq[window - 1:] = self._sq_sum[window:] - self._sq_sum[:-window]
+        count[window - 1:] = self._count[window:] - self._count[:-window]
+        # 窗口内有缺失值时与 pandas 一致返回 NaN
+        incomplete = count < window
+        s[incomplete] = np.nan
+        sq[incomplete] = np.nan
+        return s, sq, count
+
+    def mean(self, window):
+        """
+        计算窗口均值。
+
+        参数:
+            window (int): 窗口大小
+
+        返回:
+            np.ndarray: 与输入等长的均值数组，前 window-1 个元素为 NaN
+        """
+        s, _, _ = self._window_sums(window)
+        return s / window + self.shift
+
+    def std(self, window, ddof=1):
+        """
+        计算窗口标准差（默认样本标准差，与 pandas rolling().std() 一致）。
+
+        参数:
+            window (int): 窗口大小
+            ddof (int): 自由度修正，默认 1
+
+        返回:
+            np.ndarray: 与输入等长的标准差数组
+        """
+        if window - ddof <= 0:
+            return np.full(self.size, np.nan)
+        s, sq, _ = self._window_sums(window)
+        var = (sq - s * s / window) / (window - ddof)
+        return np.sqrt(np.maximum(var, 0.0))
+
+    def sum(self, window):
+        """
+        计算窗口求和。
+        """
+        return self.mean(window) * window
+
+
+def rolling_mean_std(values, windows, std_windows=(), ddof=1):
+    """
+    一次前缀和遍历同时计算多个窗口的均值和标准差。
+
+    参数:
+        values: 一维数组或 Series
+        windows (Iterable[int]): 需要计算均值的窗口
+        std_windows (Iterable[int]): 需要计算标准差的窗口
+        ddof (int): 标准差的自由度修正
+
+    返回:
+        tuple[dict[int, np.ndarray], dict[int, np.ndarray]]: (窗口 -> 均值, 窗口 -> 标准差)
+    """
+    stats = RollingStats(values)
+    means = {window: stats.mean(window) for window in windows}
+    stds = {window: stats.std(window, ddof) for window in std_windows}
+    return means, stds
+
+
+def rolling_mean(series: pd.Series, window) -> pd.Series:
+    """
+    单窗口滚动均值，返回与输入同索引的 Series，可替代 series.rolling(window).mean()。
+    """
+    return pd.Series(RollingStats(series.to_numpy()).mean(window), index=series.index, name=series.name)
+
+
+def rolling_std(series: pd.Series, window, ddof=1) -> pd.Series:
+    """
+    单窗口滚动标准差，返回与输入同索引的 Series，可替代 series.rolling(window).std()。
+    """
+    return pd.Series(RollingStats(series.to_numpy()).std(window, ddof), index=series.index, name=series.name)
+
+
+def add_moving_averages(df, windows, column='close', prefix='SMA', n_digits=3):
+    """
+    将多个窗口的简单移动平均线一次性写入 DataFrame，列名为 f'{prefix}{window}'。
+
+    参数:
+        df (pd.DataFrame): K线数据
+        windows (Iterable[int]): 均线周期
+        column (str): 计算均线的列
+        prefix (str): 列名前缀
+        n_digits (int | None): 保留小数位，None 表示不做四舍五入
+
+    返回:
+        pd.DataFrame: 传入的 df（原地写入）
+    """
+    stats = RollingStats(df[column].to_numpy())
+    for window in windows:
+        ma = stats.mean(window)
+        if n_digits is not None:
+            ma = np.round(ma, n_digits)
+        df[f'{prefix}{window}'] = ma
+    return df
@@ -1,8 +1,12 @@
 import statistics
 
 import numpy as np
+import pandas as pd
 import pandas_ta as ta
 
+from app.calculate.bars import get_bars
+from app.calculate.rolling import RollingStats
+from app.calculate.swing import get_swing_index
 from app.core.logger import logger
 from app.stock.constant import Direction, Trend
 
@@ -48,6 +52,7 @@ def group_and_refine(points, df, price_type, merge_window=4, recent=3):
         else:
             groups.append([points[i]])
 
+    bars = get_bars(df)
     refined = []
     for g in groups:
         last_idx = None
@@ -59,10 +64,10 @@ def group_and_refine(points, df, price_type, merge_window=4, recent=3):
                 last_idx = idx
             else:
                 if price_type == 'low':
-                    if df.loc[idx]['low'] < df.loc[last_idx]['low']:
+                    if bars.loc(idx)['low'] < bars.loc(last_idx)['low']:
                         last_idx = idx
                 if price_type == 'high':
-                    if df.loc[idx]['high'] > df.loc[last_idx]['high']:
+                    if bars.loc(idx)['high'] > bars.loc(last_idx)['high']:
                         last_idx = idx
         if last_idx is not None:
             refined.append(last_idx)
@@ -97,6 +102,7 @@ def detect_turning_point_indexes(series, df=None, merge_window=4):
         down_points = []
 
     all_points = sorted(set(up_points + down_points))
+    bars = get_bars(df) if df is not None else None
 
     # 初始化最终输出列表及状态变量
     all_point_idxes = []
@@ -125,7 +131,7 @@ def detect_turning_point_indexes(series, df=None, merge_window=4):
                 else:
                     replace_prev = False
                     if df is not None:
-                        if df.loc[point]['low'] < df.loc[prev_point]['low']:
+                        if bars.loc(point)['low'] < bars.loc(prev_point)['low']:
                             replace_prev = True
                     else:
                         if series.loc[point] < series.loc[prev_point]:
@@ -146,7 +152,7 @@ def detect_turning_point_indexes(series, df=None, merge_window=4):
                 else:
                     replace_prev = False
                     if df is not None:
-                        if df.loc[point]['high'] > df.loc[prev_point]['high']:
+                        if bars.loc(point)['high'] > bars.loc(prev_point)['high']:
                             replace_prev = True
                     else:
                         if series.loc[point] > series.loc[prev_point]:
@@ -228,8 +234,9 @@ def calculate_support_resistance(stock, df, window=20, num_std=2):
     df['R3'] = df['R2'] + (df['high'] - df['low'])
 
     # ========== 计算 Bollinger Bands ==========
-    df['MA'] = df['close'].rolling(window).mean()
-    df['STD'] = df['close'].rolling(window).std()
+    close_stats = RollingStats(df['close'].to_numpy())
+    df['MA'] = close_stats.mean(window)
+    df['STD'] = close_stats.std(window)
     df['Upper'] = df['MA'] + num_std * df['STD']
     df['Lower'] = df['MA'] - num_std * df['STD']
 
@@ -257,15 +264,10 @@ def calculate_trending_direction(stock, df):
     direction: 'UP' 表示当前价格方向向上, 'DOWN' 表示向下
     """
 
-    # 从 df['turning'] 获取拐点索引
-    turning_idxes = df.index[df['turning'] != 0]
-    turning_up_idxes = df.index[df['turning'] == 1]
-    turning_down_idxes = df.index[df['turning'] == -1]
-
-    # 获取拐点对应的价格
-    turning_points = df.loc[turning_idxes][['close', 'low', 'high', 'open', 'turning']]
-    turning_up_points = df.loc[turning_up_idxes][['close', 'low', 'high', 'open', 'turning']]
-    turning_down_points = df.loc[turning_down_idxes][['close', 'low', 'high', 'open', 'turning']]
+    # 从波段结构索引获取拐点位置
+    swings = get_swing_index(df)
+    turning_up_positions = swings.low_positions
+    turning_down_positions = swings.high_positions
 
     # 当前价格与均线
     latest_ma_price = df['EMA5'].iloc[-1]
@@ -281,10 +283,10 @@ def calculate_trending_direction(stock, df):
 
     # === 趋势判定: 根据拐点高低点结构 ===
     trending = Trend.UNKNOWN
-    if len(turning_up_points) > 1 and len(turning_down_points) > 1:
+    if len(turning_up_positions) > 1 and len(turning_down_positions) > 1:
         # up = 低点（lows），down = 高点（highs）
-        last_up, prev_up = turning_up_points.iloc[-1], turning_up_points.iloc[-2]  # 低点
-        last_down, prev_down = turning_down_points.iloc[-1], turning_down_points.iloc[-2]  # 高点
+        last_up, prev_up = df.iloc[turning_up_positions[-1]], df.iloc[turning_up_positions[-2]]  # 低点
+        last_down, prev_down = df.iloc[turning_down_positions[-1]], df.iloc[turning_down_positions[-2]]  # 高点
 
         # 上升趋势：高点抬高 + 低点抬高
         if last_down['high'] > prev_down['high'] and last_up['low'] > prev_up['low']:
@@ -305,10 +307,10 @@ def calculate_trending_direction(stock, df):
     n = 9
     latest_turning = [
         {
-            "time": row.name.strftime("%Y-%m-%d %H:%M:%S"),
-            "type": 1 if row["turning"] == 1 else -1,
+            "time": df.index[pos].strftime("%Y-%m-%d %H:%M:%S"),
+            "type": 1 if swings.turning[pos] == 1 else -1,
         }
-        for _, row in turning_points.tail(min(n, len(turning_points))).iterrows()
+        for pos in swings.recent_swings(n)
     ]
     stock["turning"] = latest_turning
 
@@ -568,8 +570,7 @@ def select_score_point(stock, df, points, current_price, ma_name, is_support=Tru
 
     # 按 ma 离当前价格的距离升序排序
     recent_points = points
-    recent_points['score'] = recent_points.index.map(
-        lambda idx: score_turning_point(df, idx, current_price, ma_name)['score'])
+    recent_points['score'] = score_turning_points(df, recent_points.index, current_price, ma_name)['score'].to_numpy()
     point = recent_points.sort_values('score', ascending=False).iloc[0]
     return cal_price_from_kline(stock, df, point, current_price, ma_name, is_support)
 
@@ -599,13 +600,72 @@ def score_turning_point(
     返回:
     - dict: 包含转势点得分和其他相关信息的字典。
     """
+    scored = score_turning_points(df, [point_index], current_price, field, window, slope_window,
+                                  price_tolerance, weights)
+    row = scored.iloc[0]
+    if not row['valid']:
+        return {"score": 0}
+    return {
+        "score": row['score'],
+        "point": point_index,
+        "dist_score": round(row['dist_score'], 4),
+        "slope_score": round(row['slope_score'], 4),
+        "touch_score": round(row['touch_score'], 4),
+        "volume_score": round(row['volume_score'], 4),
+        "price_at_turn": round(row['price_at_turn'], 2),
+        "raw_dist": round(row['raw_dist'], 4)
+    }
+
+
+def score_turning_points(
+    df,
+    point_indexes,
+    current_price,
+    field,
+    window=None,
+    slope_window=None,
+    price_tolerance=0.005,
+    weights=None
+):
+    """
+    批量计算多个转势点的得分，结果与逐个调用 score_turning_point 一致。
+
+    整个 DataFrame 的统计量（收盘价/均线极值、成交量中位数、对数成交量及其前缀和）只计算一次，
+    所有候选点向量化打分；触及次数通过对收盘价排序后 searchsorted 得到价格容忍区间的上下界，
+    区间内的成交量之和由排序后成交量的前缀和差分得到，不再对每个点全表扫描。
+
+    参数:
+    - df: DataFrame, 包含价格和成交量等数据的 DataFrame。
+    - point_indexes: 转势点的索引列表。
+    - current_price: float, 当前价格。
+    - field: str, 均线列名。
+    - window, slope_window, price_tolerance, weights: 同 score_turning_point。
+
+    返回:
+    - pd.DataFrame: 以 point_indexes 为索引，包含 score（保留4位小数）、valid（是否可打分）、
+      dist_score、slope_score、touch_score、volume_score、price_at_turn、raw_dist（未四舍五入）。
+      不可打分的点 score 为 0。
+    """
     # 初始化权重，如果未提供则使用默认值
     weights = weights or {"dist": 0.5, "slope": 0.1, "touch": 0.1, "volume": 0.3}
     # 计算总权重
     total_weight = sum(weights.values())
-    # 检查point_index是否在DataFrame的索引中
-    if point_index not in df.index:
-        return {"score": 0}
+
+    point_indexes = pd.Index(point_indexes)
+    count = len(point_indexes)
+    result = pd.DataFrame({
+        'score': np.zeros(count),
+        'valid': np.zeros(count, dtype=bool),
+        'dist_score': np.full(count, np.nan),
+        'slope_score': np.full(count, np.nan),
+        'touch_score': np.full(count, np.nan),
+        'volume_score': np.full(count, np.nan),
+        'price_at_turn': np.full(count, np.nan),
+        'raw_dist': np.full(count, np.nan),
+    }, index=point_indexes)
+    if count == 0:
+        return result
+
     try:
         # 获取数据长度
         data_len = len(df)
@@ -613,44 +673,48 @@ def score_turning_point(
         window = window or max(data_len // 20, 5)
         # 计算或设置斜率窗口大小
         slope_window = slope_window or max(data_len // 50, 3)
-        # 获取转势点的索引位置
-        idx = df.index.get_loc(point_index)
-        # 检查索引位置是否在有效范围内
-        if idx < window or idx + window >= data_len:
-            return {"score": 0}
-        # 获取移动平均价系列
-        ma_series = df[f'{field}']
-        # 获取转势点的价格
-        price_at_turn = ma_series.iloc[idx]
-        # 计算最大距离
-        max_dist = max(abs(df['close'].max() - df['close'].min()), 1e-3)
-        # 计算转势点与当前价格的原始距离
-        raw_dist = abs(price_at_turn - current_price)
-        # 计算距离得分
-        dist_score = 1 - min(raw_dist / max_dist, 1)
-        # 计算左右斜率
-        left_slope = ma_series.iloc[idx] - ma_series.iloc[idx - slope_window]
-        right_slope = ma_series.iloc[idx + slope_window] - ma_series.iloc[idx]
-        # 计算最大斜率
-        max_slope = max(abs(ma_series.max() - ma_series.min()), 1e-6)
-        # 计算斜率得分
-        slope_score = min(abs(left_slope - right_slope) / max_slope, 1.0)
-        # 计算价格容忍范围
+
+        # 转势点的索引位置，不在 df 中的为 -1
+        positions = df.index.get_indexer(point_indexes)
+        valid = (positions >= window) & (positions + window < data_len) & (positions + slope_window < data_len)
+        pos = positions[valid]
+
+        ma = df[f'{field}'].to_numpy(dtype=np.float64)
+        close = df['close'].to_numpy(dtype=np.float64)
+        volume = df['volume'].to_numpy(dtype=np.float64)
+
+        # 距离得分
+        price_at_turn = ma[pos]
+        max_dist = max(abs(np.nanmax(close) - np.nanmin(close)), 1e-3)
+        raw_dist = np.abs(price_at_turn - current_price)
+        dist_score = 1 - np.minimum(raw_dist / max_dist, 1)
+
+        # 斜率得分
+        left_slope = ma[pos] - ma[pos - slope_window]
+        right_slope = ma[pos + slope_window] - ma[pos]
+        max_slope = max(abs(np.nanmax(ma) - np.nanmin(ma)), 1e-6)
+        slope_score = np.minimum(np.abs(left_slope - right_slope) / max_slope, 1.0)
+
+        # 触及得分：收盘价排序后二分查找容忍区间 [price - tol, price + tol]
+        order = np.argsort(close, kind='stable')
+        finite = np.count_nonzero(~np.isnan(close))
+        sorted_close = close[order][:finite]
+        volume_prefix = np.concatenate(([0.0], np.cumsum(volume[order][:finite])))
         tolerance_range = price_at_turn * price_tolerance
-        # 筛选在价格容忍范围内的数据
-        touch_df = df[
-            (df['close'] >= price_at_turn - tolerance_range) & (df['close'] <= price_at_turn + tolerance_range)]
-        # 计算触及次数和触及均量
-        touch_count = touch_df.shape[0]
-        touch_volume_avg = touch_df['volume'].mean() if not touch_df.empty else 0
-        # 计算触及得分
-        touch_score = min(touch_count / data_len * (touch_volume_avg / max(df['volume'].median(), 1)), 1.0)
-        # 计算成交量的对数
-        volume_log = np.log1p(df['volume'])
-        # 计算局部成交量对数均值
-        local_volume_log = volume_log.iloc[idx - window: idx + window + 1].mean()
-        # 计算成交量得分
-        volume_score = min(local_volume_log / max(volume_log.median(), 1e-6), 1.0)
+        lower = np.searchsorted(sorted_close, price_at_turn - tolerance_range, side='left')
+        upper = np.searchsorted(sorted_close, price_at_turn + tolerance_range, side='right')
+        touch_count = np.maximum(upper - lower, 0)
+        touch_volume = volume_prefix[np.maximum(upper, lower)] - volume_prefix[lower]
+        touch_volume_avg = np.divide(touch_volume, touch_count, out=np.zeros(len(pos)), where=touch_count > 0)
+        touch_score = np.minimum(
+            touch_count / data_len * (touch_volume_avg / max(np.nanmedian(volume), 1)), 1.0)
+
+        # 成交量得分：对数成交量前缀和求局部均值
+        volume_log = np.log1p(volume)
+        volume_log_prefix = np.concatenate(([0.0], np.cumsum(volume_log)))
+        local_volume_log = (volume_log_prefix[pos + window + 1] - volume_log_prefix[pos - window]) / (2 * window + 1)
+        volume_score = np.minimum(local_volume_log / max(np.nanmedian(volume_log), 1e-6), 1.0)
+
         # 计算加权和
         weighted_sum = (
             weights["dist"] * dist_score +
@@ -658,23 +722,21 @@ def score_turning_point(
             weights["touch"] * touch_score +
             weights["volume"] * volume_score
         )
-        # 计算最终得分
-        score = round(weighted_sum / total_weight, 4)
-        # 返回结果字典
-        return {
-            "score": score,
-            "point": point_index,
-            "dist_score": round(dist_score, 4),
-            "slope_score": round(slope_score, 4),
-            "touch_score": round(touch_score, 4),
-            "volume_score": round(volume_score, 4),
-            "price_at_turn": round(price_at_turn, 2),
-            "raw_dist": round(raw_dist, 4)
-        }
+        scores = weighted_sum / total_weight
     except Exception as e:
-        # 异常处理，打印错误信息并返回0分
-        logger.info(f"[score_turning_point] Error at {point_index}: {e}", exc_info=True)
-        return {"score": 0}
+        # 异常处理，打印错误信息并全部返回0分
+        logger.info(f"[score_turning_points] Error: {e}", exc_info=True)
+        return result
+
+    result.loc[valid, 'score'] = [round(score, 4) for score in scores]
+    result.loc[valid, 'valid'] = True
+    result.loc[valid, 'dist_score'] = dist_score
+    result.loc[valid, 'slope_score'] = slope_score
+    result.loc[valid, 'touch_score'] = touch_score
+    result.loc[valid, 'volume_score'] = volume_score
+    result.loc[valid, 'price_at_turn'] = price_at_turn
+    result.loc[valid, 'raw_dist'] = raw_dist
+    return result
 
 
 def calculate_vwap_support_resistance(stock, df, window=14, multiplier=2):
@@ -701,11 +763,13 @@ def calculate_vwap_support_resistance(stock, df, window=14, multiplier=2):
 
     # 2. 滑动VWAP
     df['TP_Volume'] = df['Typical_Price'] * df['volume']
-    df['VWAP'] = df['TP_Volume'].rolling(window=window).sum() / df['volume'].rolling(window=window).sum()
+    # 窗口内 sum(TP*V) / sum(V) 等价于两者窗口均值之比
+    df['VWAP'] = RollingStats(df['TP_Volume'].to_numpy()).mean(window) / RollingStats(
+        df['volume'].to_numpy()).mean(window)
 
     # 3. 偏差及标准差
     df['Deviation'] = df['Typical_Price'] - df['VWAP']
-    df['Deviation_Std'] = df['Deviation'].rolling(window=window).std()
+    df['Deviation_Std'] = RollingStats(df['Deviation'].to_numpy()).std(window)
 
     # 4. 计算支撑阻力
     df['Support'] = df['VWAP'] - multiplier * df['Deviation_Std']
@@ -737,10 +801,10 @@ def get_recent_price(stock, df, recent, price_type):
 def _get_recent_price(recent_df, price_type):
     if price_type == 'high':
         max_idx = recent_df['high'].idxmax()
-        return max_idx, float(recent_df.loc[max_idx]['high'])
+        return max_idx, float(recent_df['high'].max())
     elif price_type == 'low':
         min_idx = recent_df['low'].idxmin()
-        return min_idx, float(recent_df.loc[min_idx]['low'])
+        return min_idx, float(recent_df['low'].min())
     return None
 
 
@@ -786,16 +850,19 @@ def get_recent_price_base_idx(df, index, price_type, recent=2):
     start_idx = max(0, index - recent)
     end_idx = min(len(df), index + recent + 1)
 
+    bars = get_bars(df)
     idx = start_idx
     if price_type == 'low':
+        low = bars.column('low')
         for i in range(start_idx + 1, end_idx):
-            if df.iloc[i]['low'] < df.iloc[idx]['low']:
+            if low[i] < low[idx]:
                 idx = i
     elif price_type == 'high':
+        high = bars.column('high')
         for i in range(start_idx + 1, end_idx):
-            if df.iloc[i]['high'] > df.iloc[idx]['high']:
+            if high[i] > high[idx]:
                 idx = i
-    price = df.iloc[idx]['close']
+    price = bars[idx]['close']
     return idx, price
 
 
@@ -849,128 +916,3 @@ def get_distance(df, point, other_point):
     if isinstance(idx_other_point, slice):
         idx_other_point = idx_other_point.start
     return abs(idx_point - idx_other_point)
-
-
-def get_lower_shadow(point):
-    """
-    计算K线图中某个交易点的下影线长度
-
-    参数:
-        point (dict): 包含交易数据的字典，必须包含 'close' 、'open'、'low' 三个键
-                     'close': 收盘价
-                     'open': 开盘价
-                     'low': 最低价
-
-    返回值:
-        float: 下影线的长度
-    """
-    # 根据K线类型（阳线或阴线）计算下影线长度
-    if point['close'] >= point['open']:
-        # 阳线：下影线 = 开盘价 - 最低价
-        return point['open'] - point['low']
-    else:
-        # 阴线：下影线 = 收盘价 - 最低价
-        return point['close'] - point['low']
-
-
-def get_upper_shadow(point):
-    """
-    计算K线图中某个交易点的上影线长度
-
-    参数:
-        point (dict): 包含交易数据的字典，必须包含 'close' 、'open'、'high' 三个键
-                     'close': 收盘价
-                     'open': 开盘价
-                     'high': 最高价
-
-    返回值:
-        float: 上影线的长度
-    """
-    # 根据K线类型（阳线或阴线）计算上影线长度
-    if point['close'] >= point['open']:
-        # 阳线：上影线 = 高价 - 收盘价
-        return point['high'] - point['close']
-    else:
-        # 阴线：上影线 = 高价 - 开盘价
-        return point['high'] - point['open']
-
-
-def get_price_range(point):
-    return point['high'] - point['low']
-
-
-def is_hammer_strict(point):
-    """
-    判断给定K线点是否为严格锤子线形态
-
-    参数:
-        point: K线数据点，包含开盘价、最高价、最低价、收盘价等信息
-
-    返回值:
-        bool: 如果是严格锤子线形态返回True，否则返回False
-    """
-    # 计算下影线长度
-    lower_shadow = get_lower_shadow(point)
-    # 计算K线整体波动范围
-    length = get_price_range(point)
-
-    if length == 0:
-        return False
-
-    # 判断下影线长度占整体波动范围的比例是否大于等于2/3
-    return (lower_shadow / length) > (2 / 3)
-
-
-def is_hangingman_strict(point):
-    """
-    判断给定K线点是否为严格的吊颈线形态
-
-    吊颈线是K线图中的一种反转形态，通常出现在上涨趋势的末端，预示着可能的下跌反转。
-    严格的吊颈线要求上影线长度占整个价格波动范围的比例超过0.618（黄金分割比例）。
-
-    参数:
-        point: K线数据点，包含开盘价、最高价、最低价、收盘价等信息
-
-    返回值:
-        bool: 如果是严格的吊颈线形态返回True，否则返回False
-    """
-    # 计算该K线的上影线长度
-    up_shadow = get_upper_shadow(point)
-
-    # 计算该K线的价格波动范围（最高价与最低价的差值）
-    length = get_price_range(point)
-
-    # 判断上影线长度占价格波动范围的比例是否超过0.618黄金分割比例
-    return (up_shadow / length) > (2 / 3)
-
-
-def get_amplitude(point, df):
-    """
-    计算指定数据点的振幅占前一个交易日收盘价的百分比
-
-    参数:
-        point: 包含当前交易日数据的Series对象，需包含 'high' 和 'low' 字段
-        df: 包含历史数据的DataFrame对象，用于获取前一个交易日的收盘价
-
-    返回值:
-        float: 振幅占前一个交易日收盘价的百分比
-    """
-    # 计算当前交易日的振幅（最高价与最低价的差值）
-    amplitude = point['high'] - point['low']
-
-    # 获取前一个交易日的数据点
-    prev_point = df.iloc[df.index.get_loc(point.name) - 1]
-
-    # 计算振幅占前一个交易日收盘价的百分比
-    amplitude_percentage = (amplitude / prev_point['close']) * 100
-    return amplitude_percentage
-
-
-def hammer_is_effective(point, df):
-    loc = df.index.get_loc(point.name)
-    # 从loc开始，如果最低价存在低于loc位置的最低价，返回false
-    for i in range(loc, len(df)):
-        if df.iloc[i]['low'] < point['low']:
-            return False
-
-    return True
@@ -0,0 +1,247 @@
+import threading
+import weakref
+
+import numpy as np
+
+# 拐点标记：df['turning'] == 1 为向上拐点（波段低点），-1 为向下拐点（波段高点）
+SWING_LOW = 1
+SWING_HIGH = -1
+
+
+class SwingIndex:
+    """
+    波段结构索引。
+
+    对 df['turning'] 只遍历一次，建立：
+      - 前缀数组：每根K线（含）之前最近一个波段高点 / 低点 / 任意拐点的位置，没有则为 -1；
+      - 前缀计数：每根K线（含）之前的拐点数量；
+      - 紧凑数组：所有拐点的位置、类型，以及波段高点的 high、波段低点的 low。
+
+    之后 “第 i 根K线之前最近的波段高点/低点”、“最近 k 个拐点” 等查询都是 O(1)。
+    新K线追加到末尾时可以用 append 增量维护，不需要重建。
+    """
+
+    def __init__(self, turning, high, low):
+        turning = np.asarray(turning, dtype=np.int64)
+        high = np.asarray(high, dtype=np.float64)
+        low = np.asarray(low, dtype=np.float64)
+        self.size = 0
+        self._capacity = 0
+        self._allocate(max(len(turning), 16))
+        self._extend(turning, high, low)
+
+    def _allocate(self, capacity):
+        """
+        按容量分配（或扩容）数组，追加时按倍数扩容，保证均摊 O(1)。
+        """
+        def grow(array, dtype, fill):
+            grown = np.full(capacity, fill, dtype=dtype)
+            if array is not None:
+                grown[:self.size] = array[:self.size]
+            return grown
+
+        old = self._capacity > 0
+        self._turning = grow(self._turning if old else None, np.int64, 0)
+        self._high = grow(self._high if old else None, np.float64, np.nan)
+        self._low = grow(self._low if old else None, np.float64, np.nan)
+        self._last_high = grow(self._last_high if old else None, np.int64, -1)
+        self._last_low = grow(self._last_low if old else None, np.int64, -1)
+        self._last_swing = grow(self._last_swing if old else None, np.int64, -1)
+        self._swing_count = grow(self._swing_count if old else None, np.int64, 0)
+        # 紧凑数组的长度不会超过K线数量
+        self._positions = grow(self._positions if old else None, np.int64, -1)
+        self._capacity = capacity
+
+    def _extend(self, turning, high, low):
+        count = len(turning)
+        if count == 0:
+            return
+        if self.size + count > self._capacity:
+            self._allocate(max(self._capacity * 2, self.size + count))
+
+        start, end = self.size, self.size + count
+        swing_start = self.swing_count
+        self._turning[start:end] = turning
+        self._high[start:end] = high
+        self._low[start:end] = low
+
+        positions = np.arange(start, end)
+        prev_high = self._last_high[start - 1] if start > 0 else -1
+        prev_low = self._last_low[start - 1] if start > 0 else -1
+        prev_swing = self._last_swing[start - 1] if start > 0 else -1
+        self._last_high[start:end] = np.maximum.accumulate(np.where(turning == SWING_HIGH, positions, prev_high))
+        self._last_low[start:end] = np.maximum.accumulate(np.where(turning == SWING_LOW, positions, prev_low))
+        self._last_swing[start:end] = np.maximum.accumulate(np.where(turning != 0, positions, prev_swing))
+
+        new_swings = positions[turning != 0]
+        self._swing_count[start:end] = swing_start + np.cumsum(turning != 0)
+        self._positions[swing_start:swing_start + len(new_swings)] = new_swings
+        self.size = end
+
+    def append(self, turning, high, low):
+        """
+        追加一根新K线，均摊 O(1)。
+
+        参数:
+            turning (int): 新K线的拐点标记
+            high (float): 新K线的最高价
+            low (float): 新K线的最低价
+        """
+        self._extend(np.array([turning], dtype=np.int64), np.array([high]), np.array([low]))
+
+    @property
+    def swing_count(self):
+        return int(self._swing_count[self.size - 1]) if self.size > 0 else 0
+
+    @property
+    def turning(self):
+        return self._turning[:self.size]
+
+    @property
+    def positions(self):
+        """
+        所有拐点的位置（升序）。
+        """
+        return self._positions[:self.swing_count]
+
+    @property
+    def types(self):
+        """
+        所有拐点的类型，与 positions 一一对应。
+        """
+        return self._turning[self.positions]
+
+    @property
+    def high_positions(self):
+        positions = self.positions
+        return positions[self._turning[positions] == SWING_HIGH]
+
+    @property
+    def low_positions(self):
+        positions = self.positions
+        return positions[self._turning[positions] == SWING_LOW]
+
+    @property
+    def high_prices(self):
+        """
+        所有波段高点的最高价，与 high_positions 一一对应。
+        """
+        return self._high[self.high_positions]
+
+    @property
+    def low_prices(self):
+        """
+        所有波段低点的最低价，与 low_positions 一一对应。
+        """
+        return self._low[self.low_positions]
+
+    @property
+    def last_high_positions(self):
+        """
+        前缀数组：每根K线（含）之前最近的波段高点位置，没有则为 -1。
+        """
+        return self._last_high[:self.size]
+
+    @property
+    def last_low_positions(self):
+        """
+        前缀数组：每根K线（含）之前最近的波段低点位置，没有则为 -1。
+        """
+        return self._last_low[:self.size]
+
+    def _at(self, prefix, i):
+        if i is None:
+            i = self.size - 1
+        if i < 0 or self.size == 0:
+            return None
+        pos = prefix[min(i, self.size - 1)]
+        return int(pos) if pos >= 0 else None
+
+    def last_high(self, i=None):
+        """
+        第 i 根K线（含）之前最近的波段高点位置，i 为 None 表示最后一根，没有时返回 None。
+        """
+        return self._at(self._last_high, i)
+
+    def last_low(self, i=None):
+        """
+        第 i 根K线（含）之前最近的波段低点位置，i 为 None 表示最后一根，没有时返回 None。
+        """
+        return self._at(self._last_low, i)
+
+    def last_swing(self, i=None):
+        """
+        第 i 根K线（含）之前最近的拐点位置，i 为 None 表示最后一根，没有时返回 None。
+        """
+        return self._at(self._last_swing, i)
+
+    def high_before(self, i):
+        """
+        严格位于第 i 根K线之前的最近波段高点位置。
+        """
+        return self.last_high(i - 1)
+
+    def low_before(self, i):
+        """
+        严格位于第 i 根K线之前的最近波段低点位置。
+        """
+        return self.last_low(i - 1)
+
+    def recent_swings(self, k, i=None):
+        """
+        第 i 根K线（含）之前最近的 k 个拐点位置（按时间升序），不足 k 个时返回全部。
+        """
+        if i is None:
+            i = self.size - 1
+        if i < 0 or self.size == 0:
+            return self._positions[:0]
+        count = int(self._swing_count[min(i, self.size - 1)])
+        return self._positions[max(count - k, 0):count]
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _evict(key):
+    with _cache_lock:
+        _cache.pop(key, None)
+
+
+def get_swing_index(df):
+    """
+    获取 DataFrame 的波段结构索引，同一个 DataFrame 对象只构建一次。
+
+    缓存以 DataFrame 对象为键（弱引用，对象回收后缓存自动删除），
+    命中时校验已索引部分的 turning 未变化；若 DataFrame 在末尾追加了新K线，则增量追加。
+
+    参数:
+        df (pd.DataFrame): 包含 turning、high、low 列的K线数据
+
+    返回:
+        SwingIndex
+    """
+    key = id(df)
+    turning = df['turning'].to_numpy(dtype=np.int64)
+    with _cache_lock:
+        entry = _cache.get(key)
+    if entry is not None:
+        ref, swings = entry
+        if (ref() is df
+            and swings.size <= len(turning)
+            and np.array_equal(swings.turning, turning[:swings.size])):
+            if swings.size < len(turning):
+                high = df['high'].to_numpy(dtype=np.float64)
+                low = df['low'].to_numpy(dtype=np.float64)
+                with _cache_lock:
+                    swings._extend(turning[swings.size:], high[swings.size:], low[swings.size:])
+            return swings
+
+    swings = SwingIndex(turning, df['high'].to_numpy(), df['low'].to_numpy())
+    try:
+        ref = weakref.ref(df, lambda _ref, _key=key: _evict(_key))
+    except TypeError:
+        return swings
+    with _cache_lock:
+        _cache[key] = (ref, swings)
+    return swings
@@ -1,5 +1,5 @@
 from databases import Database
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 from app.core.config import settings
@@ -12,3 +12,29 @@ Base = declarative_base()
 
 # 异步数据库连接（可以用于异步数据库操作）
 database = Database(settings.sqlalchemy_string)
+
+
+def create_missing_indexes():
+    """
+    create_all 只会为新建的表创建索引，已存在的表在这里补建模型中新增的索引。
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def create_missing_columns():
+    """
+    create_all 不会修改已存在的表，这里为已存在的表补建模型中新增的可空列。
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
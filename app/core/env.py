@@ -31,3 +31,34 @@ TRADING_DATA_URL = os.getenv('TRADING_DATA_URL', 'http://127.0.0.1:8080')
 
 MIN_PROFIT_RATE = float(os.getenv('MIN_PROFIT_RATE', 1.5))
 STRATEGY_RETENTION_DAY = int(os.getenv('STRATEGY_RETENTION_DAY', 5))
+
+# 批量写库时每个事务包含的行数
+DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', 500))
+
+# 交易策略退出检测时拉取行情、计算信号的并发数
+STRATEGY_CHECK_WORKERS = int(os.getenv('STRATEGY_CHECK_WORKERS', 8))
+
+# 进程内缓存的特征数据（DataFrame）数量上限
+FEATURE_FRAME_CACHE_SIZE = int(os.getenv('FEATURE_FRAME_CACHE_SIZE', 256))
+
+# 交易模型参数寻优的进程数
+OPTIMIZER_WORKERS = int(os.getenv('OPTIMIZER_WORKERS', os.cpu_count() or 1))
+# 参数组合参与排序所需的最少交易次数，交易过少的组合评分没有参考意义
+OPTIMIZER_MIN_TRADES = int(os.getenv('OPTIMIZER_MIN_TRADES', 5))
+
+# 后台任务每完成多少个标的写入一次检查点
+JOB_CHECKPOINT_INTERVAL = int(os.getenv('JOB_CHECKPOINT_INTERVAL', 20))
+# 服务关闭时等待任务保存检查点的秒数，需小于容器的 stop_grace_period
+JOB_DRAIN_TIMEOUT = float(os.getenv('JOB_DRAIN_TIMEOUT', 20))
+
+# 批量分析接口共用的线程池大小，以及单个请求默认的并发上限与超时（秒）
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', 16))
+ANALYSIS_CONCURRENCY = int(os.getenv('ANALYSIS_CONCURRENCY', 8))
+ANALYSIS_TIMEOUT = float(os.getenv('ANALYSIS_TIMEOUT', 30))
+
+# 信号倒排索引在 Redis 中保留的天数，更早的交易日查询时由数据库中的位图重建
+SIGNAL_INDEX_DAYS = int(os.getenv('SIGNAL_INDEX_DAYS', 30))
+
+# 收盘流水线中间结果的保存目录（每个阶段一个文件），以及拉取行情的并发数
+PIPELINE_CACHE_DIR = os.getenv('PIPELINE_CACHE_DIR', '.pipeline')
+PIPELINE_WORKERS = int(os.getenv('PIPELINE_WORKERS', 8))
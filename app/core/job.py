@@ -0,0 +1,214 @@
+import json
+import threading
+import time
+from datetime import date
+
+from app.core.env import JOB_CHECKPOINT_INTERVAL, JOB_DRAIN_TIMEOUT
+from app.core.logger import logger
+from app.core.redis import redis_client
+
+# 后台任务状态与检查点：任务类型、参数、已完成的标的与部分结果
+JOB_KEY = 'Trading-Plus:Job:{job_id}'
+JOB_TTL = 60 * 60 * 24 * 7
+
+# 任务类型 -> 任务函数，函数签名为 func(checkpoint, *args)
+_job_types = {}
+# 按交易日执行的任务类型，检查点只在创建当天有效
+_daily_job_types = set()
+# 运行中的任务线程
+_threads = {}
+_lock = threading.Lock()
+# 服务关闭标记，任务在处理完当前标的后保存检查点并退出
+_shutdown = threading.Event()
+
+
+class JobInterrupted(Exception):
+    """
+    服务关闭时任务已保存检查点并中止，重启后从检查点继续。
+    """
+
+
+def register_job(job_type, daily=False):
+    """
+    注册可恢复的任务类型，服务重启后按类型找到任务函数继续执行。
+
+    daily 为 True 的任务（如收盘后的扫描）结果只对当天的行情有效，
+    检查点过了创建当天即作废，不再恢复或复用。
+    """
+
+    def decorator(func):
+        _job_types[job_type] = func
+        if daily:
+            _daily_job_types.add(job_type)
+        return func
+
+    return decorator
+
+
+def shutdown_requested():
+    return _shutdown.is_set()
+
+
+class JobCheckpoint:
+    """
+    任务检查点，保存在 Redis 中。
+
+    每完成 interval 个标的写入一次，任务中止（服务关闭）时立即写入；
+    任务重新执行时跳过已完成的标的，已得到的结果直接复用。
+    """
+
+    def __init__(self, job_id, job_type=None, args=(), interval=JOB_CHECKPOINT_INTERVAL):
+        self.job_id = job_id
+        self.key = JOB_KEY.format(job_id=job_id)
+        self.interval = interval
+        self.pending = 0
+        value = redis_client.get(self.key)
+        state = json.loads(value) if value else {}
+        self.job_type = state.get('type', job_type)
+        self.args = state.get('args', list(args))
+        self.trade_date = state.get('trade_date', date.today().isoformat())
+        self.done = state.get('done', [])
+        self.results = state.get('results', [])
+        self._done = set(self.done)
+
+    def is_stale(self):
+        """
+        按交易日执行的任务，检查点不是当天创建的。
+        """
+        return self.job_type in _daily_job_types and self.trade_date != date.today().isoformat()
+
+    def is_done(self, key):
+        return key in self._done
+
+    def add(self, key, result=None):
+        """
+        记录一个已完成的标的，result 不为 None 时加入结果列表。
+        """
+        self.done.append(key)
+        self._done.add(key)
+        if result is not None:
+            self.results.append(result)
+        self.pending += 1
+        if self.pending >= self.interval:
+            self.save()
+
+    def save(self):
+        state = {
+            'job_id': self.job_id,
+            'type': self.job_type,
+            'args': self.args,
+            'trade_date': self.trade_date,
+            'done': self.done,
+            'results': self.results,
+        }
+        redis_client.setex(self.key, JOB_TTL, json.dumps(state, default=str))
+        self.pending = 0
+
+    def clear(self):
+        redis_client.delete(self.key)
+
+    def run(self, items, key_func, work_func):
+        """
+        依次处理未完成的标的，服务关闭时保存检查点并抛出 JobInterrupted。
+
+        参数:
+            items (iterable): 待处理的标的
+            key_func (callable): 标的 -> 唯一键（如股票代码）
+            work_func (callable): 标的 -> 结果，返回 None 表示没有结果
+
+        返回:
+            list: 全部结果（包含检查点中已有的结果）
+        """
+        for item in items:
+            key = key_func(item)
+            if self.is_done(key):
+                continue
+            if shutdown_requested():
+                self.save()
+                raise JobInterrupted(self.job_id)
+            self.add(key, work_func(item))
+        return self.results
+
+
+def _run_job(job_id, func, checkpoint):
+    try:
+        func(checkpoint, *checkpoint.args)
+        checkpoint.clear()
+    except JobInterrupted:
+        logger.info(f'任务已中止，检查点已保存, job_id = {job_id}, 已完成 {len(checkpoint.done)} 个')
+    except Exception as e:
+        # 执行失败的任务不再恢复，否则每次重启都会重复写入检查点中的结果；再次触发时重新开始
+        checkpoint.clear()
+        logger.info(f'任务执行失败, job_id = {job_id}, 已完成 {len(checkpoint.done)} 个, 检查点已清除: {e}',
+                    exc_info=True)
+    finally:
+        with _lock:
+            _threads.pop(job_id, None)
+
+
+def start_job(job_type, job_id, *args):
+    """
+    在后台线程中执行可恢复的任务，同一个 job_id 同时只运行一个；存在检查点时从检查点继续，
+    按交易日执行的任务的检查点不是当天创建的则丢弃，重新开始。
+
+    参数:
+        job_type (str): register_job 注册的任务类型
+        job_id (str): 任务 ID，相同参数的任务应使用相同的 ID 以便复用检查点
+        args: 任务参数，需要可以 JSON 序列化
+
+    返回:
+        bool: 是否启动了新线程（任务已在运行或服务正在关闭时返回 False）
+    """
+    with _lock:
+        if shutdown_requested() or job_id in _threads:
+            return False
+        checkpoint = JobCheckpoint(job_id, job_type, args)
+        if checkpoint.is_stale():
+            logger.info(f'丢弃 {checkpoint.trade_date} 的检查点, job_id = {job_id}')
+            checkpoint.clear()
+            checkpoint = JobCheckpoint(job_id, job_type, args)
+        checkpoint.save()
+        thread = threading.Thread(target=_run_job, args=(job_id, _job_types[checkpoint.job_type], checkpoint))
+        _threads[job_id] = thread
+        thread.start()
+    if checkpoint.done:
+        logger.info(f'从检查点恢复任务, job_id = {job_id}, 已完成 {len(checkpoint.done)} 个')
+    return True
+
+
+def resume_jobs():
+    """
+    服务启动时恢复上次未完成的任务，按交易日执行的任务只恢复当天的。
+    """
+    for key in redis_client.scan_iter(JOB_KEY.format(job_id='*')):
+        value = redis_client.get(key)
+        if not value:
+            continue
+        state = json.loads(value)
+        if state.get('type') not in _job_types:
+            logger.info(f"未注册的任务类型 {state.get('type')}, 跳过恢复, key = {key}")
+            continue
+        if state['type'] in _daily_job_types and state.get('trade_date') != date.today().isoformat():
+            logger.info(f"任务检查点已过期, 不再恢复, job_id = {state['job_id']}, trade_date = {state.get('trade_date')}")
+            redis_client.delete(key)
+            continue
+        start_job(state['type'], state['job_id'], *state['args'])
+
+
+def shutdown_jobs(timeout=JOB_DRAIN_TIMEOUT):
+    """
+    服务关闭时通知任务停止，并在 timeout 秒内等待正在处理的标的完成、检查点写入。
+
+    返回:
+        bool: 是否所有任务都已退出
+    """
+    _shutdown.set()
+    deadline = time.monotonic() + timeout
+    with _lock:
+        threads = list(_threads.values())
+    for thread in threads:
+        thread.join(max(deadline - time.monotonic(), 0))
+    running = [thread for thread in threads if thread.is_alive()]
+    if running:
+        logger.info(f'{len(running)} 个任务未能在 {timeout} 秒内停止')
+    return len(running) == 0
@@ -0,0 +1,136 @@
+import bisect
+import threading
+import time
+
+# 耗时直方图的默认分桶（秒）
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 已注册的指标，按注册顺序输出
+_metrics = []
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=None):
+    pairs = [f'{name}="{escape_label(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Timer:
+    """
+    with 语句计时，退出时把耗时记入直方图（异常退出同样记录）。
+    """
+
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class Histogram:
+    """
+    进程内的直方图，按标签值分别累计各分桶计数、总和与次数。
+
+    每次 observe 只做一次二分查找和几个整数加法，可以放在分析的热路径上。
+    """
+
+    def __init__(self, name, description, label_names=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        self.series = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(labels)
+            if series is None:
+                # [各分桶计数（最后一个为 +Inf）, 总和, 次数]
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, *labels):
+        return Timer(self, labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self.lock:
+            series = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.series.items()]
+        for labels, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{format_labels(self.label_names, labels, f'le="{bound}"')} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_bucket{format_labels(self.label_names, labels, 'le="+Inf"')} {count}')
+            lines.append(f'{self.name}_sum{format_labels(self.label_names, labels)} {total}')
+            lines.append(f'{self.name}_count{format_labels(self.label_names, labels)} {count}')
+        return lines
+
+
+class Counter:
+    """
+    进程内的计数器，按标签值分别累计。
+    """
+
+    def __init__(self, name, description, label_names=()):
+        self.name = name
+        self.description = description
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.series[labels] = self.series.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self.lock:
+            series = sorted(self.series.items())
+        for labels, value in series:
+            lines.append(f'{self.name}{format_labels(self.label_names, labels)} {value}')
+        return lines
+
+
+def render_metrics():
+    """
+    全部指标的 Prometheus 文本格式。
+    """
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def record_cache(cache, hit):
+    CACHE_REQUESTS.inc(cache, 'hit' if hit else 'miss')
+
+
+ANALYSIS_STAGE_SECONDS = Histogram('trading_analysis_stage_seconds', '股票分析各阶段耗时', ('stage',))
+TRADING_MODEL_SECONDS = Histogram('trading_model_seconds', '交易模型生成策略耗时', ('model',))
+DB_WRITE_SECONDS = Histogram('trading_db_write_seconds', '批量写库耗时', ('table',))
+UPSTREAM_REQUEST_SECONDS = Histogram('trading_upstream_request_seconds', '上游数据源请求耗时（含重试）',
+                                     ('endpoint', 'status'))
+REDIS_COMMAND_SECONDS = Histogram('trading_redis_command_seconds', 'Redis 命令耗时', ('command',))
+HTTP_REQUEST_SECONDS = Histogram('trading_http_request_seconds', 'HTTP 接口耗时', ('method', 'path', 'status'))
+CACHE_REQUESTS = Counter('trading_cache_requests_total', '缓存查询次数，result 为 hit / miss', ('cache', 'result'))
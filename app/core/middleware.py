@@ -1,8 +1,11 @@
 import logging
+import time
 
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.core.metrics import HTTP_REQUEST_SECONDS
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,4 +21,14 @@ class ClientInfoMiddleware(BaseHTTPMiddleware):
             f"requested {method} {requested_path} "
             "endpoint"
         )
-        return await call_next(request)
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # 按路由模板（如 /stock/{code}）统计，未匹配任何路由的请求归为一类，避免标签数量无限增长
+            route = request.scope.get('route')
+            path = getattr(route, 'path', None) or 'unmatched'
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, method, path, status)
@@ -0,0 +1,156 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from app.core.logger import logger
+from app.core.redis import redis_client
+
+# 缓存总数的有效期（秒）
+COUNT_CACHE_TTL = 60 * 5
+
+
+def encode_cursor(updated_at: datetime, _id: int):
+    """
+    将 (updated_at, id) 编码为不透明的游标字符串。
+    """
+    raw = f'{updated_at.isoformat()}|{_id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str):
+    """
+    解析游标字符串，返回 (updated_at, id)。
+
+    游标格式不合法时抛出 ValueError。
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        updated_at, _id = raw.split('|', 1)
+        return datetime.fromisoformat(updated_at), int(_id)
+    except Exception:
+        raise ValueError(f'Invalid cursor: {cursor}')
+
+
+def keyset_page(query, model, cursor=None, page_size=10):
+    """
+    按 (updated_at DESC, id DESC) 做游标（keyset）分页。
+
+    与 OFFSET 分页不同，查询只需从索引定位到游标位置再向后读取 page_size 行，
+    翻到多深的页面耗时都保持不变。需要在 (updated_at, id) 上建立联合索引。
+
+    参数:
+    - query: 已添加过滤条件、尚未排序的查询
+    - model: 查询的 ORM 模型，必须包含 updated_at 与 id 列
+    - cursor (str | None): 上一页返回的 next_cursor，None 表示第一页
+    - page_size (int): 每页记录数
+
+    返回:
+    - tuple[list, str | None]: (当前页记录, 下一页游标)，没有下一页时游标为 None
+    """
+    if cursor:
+        updated_at, _id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.updated_at, model.id) < tuple_(updated_at, _id))
+
+    # 多取一条用于判断是否还有下一页
+    items = query.order_by(model.updated_at.desc(), model.id.desc()).limit(page_size + 1).all()
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor(last.updated_at, last.id)
+    return items, next_cursor
+
+
+def get_count_cache_key(table_name, *filters):
+    """
+    总数缓存的键中包含表的版本号，表有写入时版本号递增，旧的缓存自然失效。
+    """
+    version = redis_client.get(f'Trading-Plus:Count:{table_name}:version') or 0
+    filters = ':'.join('' if value is None else str(value) for value in filters)
+    return f'Trading-Plus:Count:{table_name}:{version}:{filters}'
+
+
+def cached_count(query, table_name, *filters):
+    """
+    返回查询的记录总数，结果按表版本号和过滤条件缓存在 Redis 中。
+
+    Redis 不可用时退化为直接 count。
+
+    参数:
+    - query: 已添加过滤条件的查询
+    - table_name (str): 表名，用于缓存键与失效
+    - filters: 过滤条件的取值，组成缓存键
+
+    返回:
+    - int: 记录总数
+    """
+    try:
+        key = get_count_cache_key(table_name, *filters)
+        total = redis_client.get(key)
+        if total is not None:
+            return int(total)
+    except Exception as e:
+        logger.info(f'读取总数缓存失败: {e}')
+        return query.order_by(None).count()
+
+    total = query.order_by(None).count()
+    try:
+        redis_client.setex(key, COUNT_CACHE_TTL, total)
+    except Exception as e:
+        logger.info(f'写入总数缓存失败: {e}')
+    return total
+
+
+def invalidate_count(table_name):
+    """
+    表有写入后调用，递增表的版本号使所有总数缓存失效。
+    """
+    try:
+        redis_client.incr(f'Trading-Plus:Count:{table_name}:version')
+    except Exception as e:
+        logger.info(f'更新总数缓存版本失败: {e}')
+
+
+def paginate(query, model, table_name, filters=(), page=1, page_size=10, cursor=None):
+    """
+    分页查询并组装统一的分页结果。
+
+    传入 cursor 时使用游标分页；未传 cursor 时第一页同样走游标分页，
+    page > 1 时兼容旧的 OFFSET 分页。结果中的 next_cursor 用于请求下一页。
+
+    参数:
+    - query: 已添加过滤条件、尚未排序的查询
+    - model: 查询的 ORM 模型
+    - table_name (str): 表名，用于总数缓存
+    - filters (tuple): 过滤条件取值，用于总数缓存
+    - page (int): 页码，仅在未传 cursor 时生效
+    - page_size (int): 每页记录数
+    - cursor (str | None): 上一页返回的 next_cursor
+
+    返回:
+    - dict: 分页结果
+    """
+    total = cached_count(query, table_name, *filters)
+    if cursor or page <= 1:
+        items, next_cursor = keyset_page(query, model, cursor, page_size)
+        has_next = next_cursor is not None
+        has_prev = cursor is not None
+    else:
+        skip = (page - 1) * page_size
+        items = query.order_by(model.updated_at.desc(), model.id.desc()).offset(skip).limit(page_size + 1).all()
+        has_next = len(items) > page_size
+        items = items[:page_size]
+        next_cursor = encode_cursor(items[-1].updated_at, items[-1].id) if has_next else None
+        has_prev = True
+
+    return {
+        "total": total,
+        "page_num": (total + page_size - 1) // page_size,
+        "page": page,
+        "page_size": page_size,
+        "has_next": has_next,
+        "has_prev": has_prev,
+        "next_cursor": next_cursor,
+        "items": [item.__dict__ for item in items]
+    }
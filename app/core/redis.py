@@ -1,12 +1,37 @@
+import time
+
 import redis
 from fastapi import HTTPException
 
 from app.core.env import REDIS_HOST, REDIS_PORT, REDIS_USER, REDIS_PASSWORD, REDIS_SSL
+from app.core.metrics import REDIS_COMMAND_SECONDS, record_cache
+
+
+class TimedRedis(redis.StrictRedis):
+    """
+    记录每条命令耗时的 Redis 客户端（pipeline 按整体执行，不逐条记录）。
+    """
+
+    def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_SECONDS.observe(time.perf_counter() - start, args[0])
+
 
 # 创建 Redis 连接池
-redis_client = redis.StrictRedis(host=REDIS_HOST, port=REDIS_PORT,
-                                 username=REDIS_USER, password=REDIS_PASSWORD,
-                                 db=0, decode_responses=True, ssl=REDIS_SSL)
+redis_client = TimedRedis(host=REDIS_HOST, port=REDIS_PORT,
+                          username=REDIS_USER, password=REDIS_PASSWORD,
+                          db=0, decode_responses=True, ssl=REDIS_SSL)
+
+
+def key_family(key: str):
+    """
+    缓存键的类别，用作命中率统计的标签，如 Trading-Plus:Stock:000001 -> Stock。
+    """
+    parts = key.split(':')
+    return parts[1] if len(parts) > 1 else parts[0]
 
 
 # 测试 Redis 连接
@@ -22,11 +47,25 @@ def test_redis_connection():
 def get_cache(key: str):
     try:
         value = redis_client.get(key)
+        record_cache(key_family(key), value is not None)
         return value
     except Exception as e:
         raise HTTPException(status_code=500, detail="Error getting data from Redis")
 
 
+# 批量获取缓存，未命中的键对应 None
+def get_cache_many(keys: list):
+    if len(keys) == 0:
+        return []
+    try:
+        values = redis_client.mget(keys)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail="Error getting data from Redis")
+    for key, value in zip(keys, values):
+        record_cache(key_family(key), value is not None)
+    return values
+
+
 # 设置缓存
 def set_cache(key: str, value: str, ttl: int = 3600):  # ttl in seconds
     try:
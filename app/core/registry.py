@@ -1,9 +1,11 @@
 from consul import Consul
 from fastapi import APIRouter
+from starlette.responses import PlainTextResponse
 
 from app.core.env import CONSUL_PORT, CONSUL_HOST, CONSUL_TOKEN, SERVICE_NAME, SERVICE_HOST, \
     SERVICE_PORT
 from app.core.logger import logger
+from app.core.metrics import render_metrics
 
 
 def get_consul_server():
@@ -57,3 +59,12 @@ actuator_router = APIRouter()
 @actuator_router.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@actuator_router.get("/metrics")
+def metrics():
+    """
+    Prometheus 文本格式的指标：分析各阶段、交易模型、写库、上游请求、Redis 命令与接口的耗时直方图，
+    以及各类缓存的命中 / 未命中次数。
+    """
+    return PlainTextResponse(render_metrics(), media_type='text/plain; version=0.0.4; charset=utf-8')
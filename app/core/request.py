@@ -1,19 +1,37 @@
+import time
+from urllib.parse import urlsplit
+
 import requests
 
 from app.core.logger import logger
+from app.core.metrics import UPSTREAM_REQUEST_SECONDS
+
+
+def endpoint_label(url):
+    """
+    请求地址的路径，含数字的路径段（股票、指数代码等）替换为 {code}，用作耗时统计的标签。
+    """
+    segments = urlsplit(url).path.split('/')
+    return '/'.join('{code}' if any(char.isdigit() for char in segment) else segment for segment in segments)
 
 
 def http_get_with_retries(url, max_retries=3, default_return_value=None):
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url)
-            response.raise_for_status()  # 如果响应状态码不是200，抛出异常
-            data = response.json()
-            # 检查返回的数据中状态码是否为0，表示请求成功
-            if data['code'] == 0:
-                # 如果请求成功，返回数据中的data
-                return data['data']
-            logger.info(f'url response: {data}')
-        except requests.RequestException as e:
-            logger.info(f'请求失败，尝试 {attempt + 1}/{max_retries}: {e}')
-    return default_return_value
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        for attempt in range(max_retries):
+            try:
+                response = requests.get(url)
+                response.raise_for_status()  # 如果响应状态码不是200，抛出异常
+                data = response.json()
+                # 检查返回的数据中状态码是否为0，表示请求成功
+                if data['code'] == 0:
+                    # 如果请求成功，返回数据中的data
+                    status = 'ok'
+                    return data['data']
+                logger.info(f'url response: {data}')
+            except requests.RequestException as e:
+                logger.info(f'请求失败，尝试 {attempt + 1}/{max_retries}: {e}')
+        return default_return_value
+    finally:
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint_label(url), status)
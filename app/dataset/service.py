@@ -1,7 +1,20 @@
+import threading
+from collections import OrderedDict
+
 import pandas as pd
 
+from app.calculate.rolling import add_moving_averages
 from app.calculate.service import detect_turning_point_indexes
-from app.stock.service import get_adj_factor
+from app.core.env import FEATURE_FRAME_CACHE_SIZE
+from app.core.metrics import ANALYSIS_STAGE_SECONDS, record_cache
+from app.stock.service import get_adj_factor, get_stock_prices, KType, needs_forward_adjustment
+
+# create_dataframe 预先计算的简单移动平均周期
+SMA_WINDOWS = (5, 10, 20, 50, 120, 200)
+
+# 特征数据（含均线、拐点）的进程内缓存，键为 (代码, K线类型, K线数量, 最后一根K线日期与收盘价)
+_feature_frames = OrderedDict()
+_feature_frames_lock = threading.Lock()
 
 
 def create_dataframe(stock, prices):
@@ -19,6 +32,14 @@ def create_dataframe(stock, prices):
     df : DataFrame
         格式化后，包含股票价格信息的DataFrame对象。
     """
+    df = create_price_frame(stock, prices)
+    return add_features(df)
+
+
+def create_price_frame(stock, prices):
+    """
+    将价格列表转换为按日期升序、已复权的 DataFrame（date 仍为普通列）。
+    """
     # 初始化DataFrame对象
     df = pd.DataFrame(prices)
 
@@ -40,19 +61,22 @@ def create_dataframe(stock, prices):
     # 根据日期对DataFrame进行排序
     df.sort_values('date', inplace=True)
     # 复权价处理
-    df = apply_forward_adjustment_all_prices(stock, df)
+    with ANALYSIS_STAGE_SECONDS.time('adjustment'):
+        return apply_forward_adjustment_all_prices(stock, df)
+
 
+def add_features(df):
+    """
+    在价格 DataFrame 上计算均线与拐点，并将 date 设置为索引。
+    """
     # 计算移动平均线和指数移动平均线，并保留三位小数
     df['EMA5'] = df['close'].ewm(span=5, adjust=False).mean().round(3)
-    df['SMA5'] = df['close'].rolling(window=5).mean().round(3)
-    df['SMA10'] = df['close'].rolling(window=10).mean().round(3)
-    df['SMA20'] = df['close'].rolling(window=20).mean().round(3)
-    df['SMA50'] = df['close'].rolling(window=50).mean().round(3)
-    df['SMA120'] = df['close'].rolling(window=120).mean().round(3)
-    df['SMA200'] = df['close'].rolling(window=200).mean().round(3)
+    # 多个周期的简单移动平均共享一次前缀和遍历
+    add_moving_averages(df, SMA_WINDOWS, column='close', prefix='SMA', n_digits=3)
 
     # 找出均线的拐点位置
-    turning_points_idxes, turning_up_idxes, turning_down_idxes = detect_turning_point_indexes(df['EMA5'], df)
+    with ANALYSIS_STAGE_SECONDS.time('turning_points'):
+        turning_points_idxes, turning_up_idxes, turning_down_idxes = detect_turning_point_indexes(df['EMA5'], df)
     turning_up_idxes = [idx for idx in turning_up_idxes if idx < df.shape[0]]
     turning_down_idxes = [idx for idx in turning_down_idxes if idx < df.shape[0]]
     # 向上拐点turning_up_idxes, df['turning']=1, 向下拐点turning_down_idxes, df['turning']=-1,其他df['turning']=0
@@ -72,15 +96,54 @@ def create_dataframe(stock, prices):
     return df
 
 
+def get_dataframe(stock, k_type=KType.DAY, prices=None):
+    """
+    获取股票指定K线类型的特征数据（create_dataframe 的结果），按K线类型分别缓存在进程内。
+
+    K线没有变化时直接返回缓存的副本，不再重复复权、计算均线和拐点；
+    周K、月K由日K在本地合并得到（见 get_stock_prices）。
+
+    参数:
+    stock (dict): 股票信息
+    k_type (KType): K线类型
+    prices (list, optional): 已获取的K线数据（如批量预取的结果），为 None 时调用 get_stock_prices 获取
+
+    返回:
+    DataFrame | None: 没有K线数据时返回 None
+    """
+    if prices is None:
+        with ANALYSIS_STAGE_SECONDS.time('price_fetch'):
+            prices = get_stock_prices(stock['code'], k_type)
+    if prices is None or len(prices) == 0:
+        return None
+
+    last = prices[-1]
+    key = (stock['code'], k_type, len(prices), last['date'], last['close'])
+    with _feature_frames_lock:
+        df = _feature_frames.get(key)
+        if df is not None:
+            _feature_frames.move_to_end(key)
+    record_cache('feature_frame', df is not None)
+    if df is not None:
+        return df.copy()
+
+    with ANALYSIS_STAGE_SECONDS.time('dataframe'):
+        df = create_dataframe(stock, prices)
+    with _feature_frames_lock:
+        _feature_frames[key] = df
+        # 同一只股票同一K线类型只保留最新的一份
+        for stale in [k for k in _feature_frames if k[:2] == key[:2] and k != key]:
+            del _feature_frames[stale]
+        while len(_feature_frames) > FEATURE_FRAME_CACHE_SIZE:
+            _feature_frames.popitem(last=False)
+    return df.copy()
+
+
 def apply_forward_adjustment_all_prices(stock, df):
     """
     将不复权的开高低收全部转换为前复权价格。
     """
-    exchange = stock['exchange']
-    if exchange not in ['SSE', 'SZSE']:
-        return df
-
-    if stock["stock_type"] == 'Index' or stock["stock_type"] == 'Fund':
+    if not needs_forward_adjustment(stock):
         return df
 
     adj_df = df.copy()
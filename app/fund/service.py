@@ -1,50 +1,23 @@
-import requests
-
 from app.core.env import TRADING_DATA_URL
 from app.core.logger import logger
+from app.core.request import http_get_with_retries
 from app.stock.service import KType
-from app.strategy.service import analyze_stock
+from app.strategy.service import analyze_stock_incremental, ScanStats
 
 
 def get_funds(exchange):
     url = f'{TRADING_DATA_URL}/exchange/{exchange}/funds'
     logger.info(f'从交易所获取基金列表数据，url: {url}')
-    # 尝试最多3次请求
-    for attempt in range(3):
-        try:
-            # 发送GET请求并解析响应内容为JSON格式
-            data = requests.get(url).json()
-            # 检查响应状态码是否为0，表示请求成功
-            if data['code'] == 0:
-                # 提取并返回基金数据
-                return data['data']
-        except requests.RequestException as e:
-            logger.info(f'Request failed: {e}. Retrying... {attempt + 1}')
-    # 如果所有尝试都失败，返回空列表
-    return []
+    # 尝试最多3次请求，与其他上游请求一样记录耗时，所有尝试都失败时返回空列表
+    return http_get_with_retries(url, 3, [])
 
 
-def analyze_funds(exchange):
+def get_fund_candidates(exchange):
     """
-    分析给定交易所，返回具有特定模式的基金列表。
-
-    该函数首先从指定交易所获取所有基金列表，然后逐个分析每只基金。
-    分析时，会特别关注在日K线图中出现的模式。只有那些具有至少一个识别模式的股票才会被记录并返回。
-
-    参数:
-    exchange: str, 指定要分析的交易所名称。
-
-    返回:
-    list, 包含具有特定模式的股票信息列表。
+    获取交易所中需要分析的基金，排除封闭式基金、REITs 以及债券、货币基金。
     """
-    # 获取指定交易所的所有股票资金数据
-    data = get_funds(exchange)
-
-    # 初始化用于存储具有分析模式的股票列表
     funds = []
-
-    # 遍历每只股票进行分析
-    for item in data:
+    for item in get_funds(exchange):
         # 将数据项初始化为股票对象，这里假设股票对象可以直接从数据项转换而来
         stock = item
         code = stock['code']
@@ -55,14 +28,45 @@ def analyze_funds(exchange):
         if '債' in name or '债' in name or '幣' in name or '币' in name:
             continue
         stock['stock_type'] = 'Fund'
+        funds.append(stock)
+    return funds
+
+
+def analyze_fund(stock, stats=None):
+    """
+    分析单只基金的日K线，有买入信号时返回该基金，否则返回 None。
 
-        # 调用函数分析股票，专注于日K线图中的模式
-        try:
-            strategy = analyze_stock(stock, k_type=KType.DAY)
-            if strategy is not None and strategy.signal == 1:
-                funds.append(stock)
-        except Exception as e:
-            logger.info(f'Failed to analyze stock {code}: {e}')
+    行情水位未变化时复用上次的分析结果，stats 记录重新分析与复用的数量。
+    """
+    # 调用函数分析股票，专注于日K线图中的模式
+    try:
+        if analyze_stock_incremental(stock, k_type=KType.DAY, stats=stats) == 1:
+            return stock
+    except Exception as e:
+        logger.info(f'Failed to analyze stock {stock["code"]}: {e}')
+    return None
+
+
+def analyze_funds(exchange):
+    """
+    分析给定交易所，返回具有特定模式的基金列表。
+
+    该函数首先从指定交易所获取所有基金列表，然后逐个分析每只基金。
+    分析时，会特别关注在日K线图中出现的模式。只有那些具有至少一个识别模式的股票才会被记录并返回。
+
+    参数:
+    exchange: str, 指定要分析的交易所名称。
+
+    返回:
+    list, 包含具有特定模式的股票信息列表。
+    """
+    funds = []
+    stats = ScanStats()
+    for stock in get_fund_candidates(exchange):
+        fund = analyze_fund(stock, stats)
+        if fund is not None:
+            funds.append(fund)
+    logger.info(f'分析基金完成, exchange = {exchange}, {stats.to_dict()}')
 
     # 返回具有特定模式的股票列表
     return funds
@@ -5,3 +5,13 @@ from app.holdings.model import Holdings
 
 def get_holdings(code, db: Session):
     return db.query(Holdings).filter_by(stock_code=code).first()
+
+
+def get_holdings_by_codes(codes, db: Session):
+    """
+    一次查询获取多只股票的持仓，返回 股票代码 -> Holdings 的字典。
+    """
+    if not codes:
+        return {}
+    holdings = db.query(Holdings).filter(Holdings.stock_code.in_(codes)).all()
+    return {item.stock_code: item for item in holdings}
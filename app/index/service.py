@@ -2,7 +2,7 @@ from app.core.env import TRADING_DATA_URL
 from app.core.logger import logger
 from app.core.request import http_get_with_retries
 from app.stock.service import KType, get_stock
-from app.strategy.service import analyze_stock
+from app.strategy.service import analyze_stock, analyze_stock_incremental, ScanStats
 
 
 def get_stock_index_list():
@@ -60,6 +60,83 @@ def analyze_index():
     return indexes
 
 
+def analyze_index_stock(item, stats=None):
+    """
+    分析指数中的单只成分股，有买入信号时返回股票信息，否则返回 None。
+
+    行情水位未变化时复用上次的分析结果，stats 记录重新分析与复用的数量。
+
+    参数:
+    item (dict): get_index_stocks 返回的成分股数据，包含 stock_code。
+    stats (ScanStats, optional): 扫描计数。
+    """
+    # 根据代码获取股票信息
+    stock = get_stock(item['stock_code'])
+    if stock is None:
+        return None
+    # 分析股票的日K线图，如果股票中发现有模式，则返回该股票
+    if analyze_stock_incremental(stock, k_type=KType.DAY, stats=stats) == 1:
+        return stock
+    return None
+
+
+def get_indexes_stocks(codes):
+    """
+    多个指数成分股的并集，重叠的成分股只保留一次。
+
+    参数:
+    codes (list[str]): 指数代码。
+
+    返回:
+    tuple: (成分股列表，按首次出现的顺序排列, 股票代码 -> 所属指数代码列表)
+    """
+    items = {}
+    memberships = {}
+    for code in codes:
+        for item in get_index_stocks(code):
+            stock_code = item['stock_code']
+            items.setdefault(stock_code, item)
+            memberships.setdefault(stock_code, []).append(code)
+    return list(items.values()), memberships
+
+
+def group_index_stocks(stocks, memberships, codes):
+    """
+    将成分股并集的分析结果按所属指数分组。
+
+    返回:
+    dict: 指数代码 -> 该指数中有买入信号的股票列表
+    """
+    groups = {code: [] for code in codes}
+    for stock in stocks:
+        for code in memberships.get(stock['code'], ()):
+            groups[code].append(stock)
+    return groups
+
+
+def analyze_indexes_stocks(codes):
+    """
+    分析多个指数包含的股票，重叠的成分股只分析一次，结果再按指数分组。
+
+    参数:
+    codes (list[str]): 指数代码。
+
+    返回:
+    dict: 指数代码 -> 包含特定模式的股票信息列表。
+    """
+    codes = list(dict.fromkeys(codes))
+    items, memberships = get_indexes_stocks(codes)
+    stats = ScanStats()
+    stocks = []
+    for item in items:
+        stock = analyze_index_stock(item, stats)
+        if stock is not None:
+            stocks.append(stock)
+    logger.info(f'分析指数成分股完成, index = {codes}, 成分股 {sum(len(v) for v in memberships.values())} 个, '
+                f'去重后 {len(items)} 只, {stats.to_dict()}')
+    return group_index_stocks(stocks, memberships, codes)
+
+
 def analyze_index_stocks(code):
     """
     分析指数包含的股票，并返回具有特定模式的股票列表。
@@ -70,21 +147,4 @@ def analyze_index_stocks(code):
     返回:
     list: 包含特定模式的股票信息列表。
     """
-    # 获取指数包含的股票数据
-    data = get_index_stocks(code)
-    stocks = []
-    # 遍历指数中的每只股票
-    for item in data:
-        # 构建股票字典，包含股票代码和名称
-        # 根据代码获取股票信息
-        stock_code = item['stock_code']
-        stock = get_stock(stock_code)
-        if stock is None:
-            continue
-        # 分析股票的日K线图
-        strategy = analyze_stock(stock, k_type=KType.DAY)
-        # 如果股票中发现有模式，则将其添加到stocks列表中
-        if strategy is not None and strategy.signal == 1:
-            stocks.append(stock)
-
-    return stocks
+    return analyze_indexes_stocks([code])[code]
@@ -1,11 +1,61 @@
 import pandas as pd
 
 
+class PatternMatch:
+    """
+    单只股票上一次形态匹配的结果。
+
+    形态（Indicator）对象本身不保存匹配状态，匹配到的K线、匹配权重记录在结果对象中，
+    因此同一组形态对象可以在多个线程、多只股票之间共享。
+    """
+
+    __slots__ = ('pattern', 'weight', 'match_indexes')
+
+    def __init__(self, pattern, weight, match_indexes=()):
+        self.pattern = pattern
+        self.weight = weight
+        self.match_indexes = list(match_indexes)
+
+    @property
+    def name(self):
+        return self.pattern.name
+
+    @property
+    def label(self):
+        return self.pattern.label
+
+    @property
+    def signal(self):
+        return self.pattern.signal
+
+    @property
+    def description(self):
+        return getattr(self.pattern, 'description', '')
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'label': self.label,
+            'description': self.description,
+            'match_indexes': [match_index.strftime('%Y-%m-%d %H:%M:%S') for match_index in self.match_indexes]
+        }
+
+
 class Indicator:
 
     def match(self, stock, df, trending, direction):
         return False
 
+    def evaluate(self, stock, df, trending, direction):
+        """
+        匹配形态，匹配成功返回 PatternMatch，否则返回 None。
+
+        默认权重为形态自身的 weight；权重或匹配位置随K线变化的形态（如K线形态）覆盖该方法，且不修改自身状态。
+        """
+        if self.match(stock, df, trending, direction):
+            return PatternMatch(self, self.weight)
+        return None
+
     @staticmethod
     def trend_confirmation(series: pd.Series, trend):
         """
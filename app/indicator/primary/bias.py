@@ -1,5 +1,4 @@
-import pandas_ta as ta
-
+from app.calculate.rolling import rolling_mean
 from app.indicator.base import Indicator
 
 
@@ -35,7 +34,8 @@ class BIAS(Indicator):
         if df is None or len(df) < self.ma:
             return False
 
-        df[f'{self.label}'] = ta.bias(df['close'], self.ma)
+        # BIAS = close / SMA(close, ma) - 1
+        df[f'{self.label}'] = df['close'] / rolling_mean(df['close'], self.ma) - 1
         bias = df[f'{self.label}']
         # 获取最新的偏差率值
         latest_bias = bias.iloc[-1]
@@ -1,7 +1,9 @@
 import pandas_ta as ta
 
-from app.calculate.service import get_distance, is_hammer_strict
-from app.indicator.base import Indicator
+from app.calculate.bars import get_bars
+from app.calculate.candle import CandleArrays
+from app.calculate.service import get_distance
+from app.indicator.base import Indicator, PatternMatch
 
 BULLISH_PATTERNS = [
     # {'name': '3inside', 'description': '三日内线：一个三日反转形态，可以是看涨或看跌。'},
@@ -129,13 +131,26 @@ class Candlestick(Indicator):
 
     def match(self, stock, df, trending, direction):
         """
-        判断给定股票的最近几个交易日中是否出现了特定的K线形态，并记录出现的日期。
+        判断给定股票的最近几个交易日中是否出现了特定的K线形态，并把出现的日期、权重记录在实例上。
 
-        :param stock: 股票字典，将在其中记录形态出现的日期。
+        共享的形态对象（如分析计划中的形态）应使用 evaluate，不修改实例状态。
+        """
+        result = self.evaluate(stock, df, trending, direction)
+        if result is None:
+            return False
+        self.match_indexes.extend(result.match_indexes)
+        self.weight = result.weight
+        return True
+
+    def evaluate(self, stock, df, trending, direction):
+        """
+        判断给定股票的最近几个交易日中是否出现了特定的K线形态，返回出现的日期与权重。
+
+        :param stock: 股票字典。
         :param df: 包含股票历史数据的DataFrame，至少包括['open', 'high', 'low', 'close']列。
         :param trending 趋势
         :param direction 方向
-        :return: 布尔值，表示是否匹配到了指定的K线形态。
+        :return: PatternMatch，未匹配到时返回 None。
         """
         # 用最近20根K线计算形态
         pattern_df = df.tail(60).copy()
@@ -153,14 +168,13 @@ class Candlestick(Indicator):
         else:
             matched = recent_pattern[recent_pattern[self.column] < 0]
 
-        # 提取匹配日期，并写入 stock 中
-        if not matched.empty:
-            self.match_indexes.extend(matched.index.tolist())
-            weight = get_distance(df, df.loc[self.match_indexes[-1]], df.iloc[-1])
-            self.weight = self.recent + 1 - weight
-            return True
-        else:
-            return False
+        # 提取匹配日期与权重（越靠近最新K线权重越高）
+        if matched.empty:
+            return None
+        match_indexes = matched.index.tolist()
+        bars = get_bars(df)
+        distance = get_distance(df, bars.loc(match_indexes[-1]), bars.last)
+        return PatternMatch(self, self.recent + 1 - distance, match_indexes)
 
 
 def get_bullish_candlestick_patterns():
@@ -212,6 +226,16 @@ class HammerCandlestick(Indicator):
         self.match_indexes = []
 
     def match(self, stock, df, trending, direction):
+        """
+        检测锤子线形态，匹配到的K线记录在实例的 match_indexes 上
+        """
+        result = self.evaluate(stock, df, trending, direction)
+        if result is None:
+            return False
+        self.match_indexes.extend(result.match_indexes)
+        return True
+
+    def evaluate(self, stock, df, trending, direction):
         """
         检测锤子线形态
 
@@ -222,27 +246,10 @@ class HammerCandlestick(Indicator):
             direction: 方向信息
 
         Returns:
-            bool: 如果检测到锤子线形态返回True，否则返回False
+            PatternMatch: 检测到锤子线形态时返回匹配结果，否则返回 None
         """
-        # 获取最近recent期的K线数据
-        k_lines = df.tail(self.recent).copy()
-        k_line = None
-        k_index = None
-
-        # 从最近到旧的顺序遍历k_lines, 判断是否是hammer形态
-        # 如果发现多个锤子线，选择最低点的那个
-        for i in range(self.recent - 1, -1, -1):
-            if is_hammer_strict(k_lines.iloc[i]):
-                if k_line is None:
-                    k_line = k_lines.iloc[i]
-                    k_index = k_lines.index[i]
-                else:
-                    if k_line['low'] > k_lines.iloc[i]['low']:
-                        k_line = k_lines.iloc[i]
-                        k_index = k_lines.index[i]
-
-        # 如果找到锤子线形态，记录其索引并返回True
-        if k_line is not None:
-            self.match_indexes.append(k_index)
-            return True
-        return False
+        # 最近recent期内的严格锤子线，如果发现多个锤子线，选择最低点的那个
+        loc = CandleArrays.from_df(df).lowest_hammer(self.recent)
+        if loc is None:
+            return None
+        return PatternMatch(self, self.weight, [df.index[loc]])
@@ -1,5 +1,7 @@
 import pandas_ta as ta
 
+from app.calculate.bars import get_bars
+from app.calculate.rolling import rolling_mean
 from app.indicator.base import Indicator
 
 
@@ -51,11 +53,11 @@ class SMA(Indicator):
             return False
 
         # 获取最新价格数据
-        price = df.iloc[-1]
+        price = get_bars(df).last
 
         # 计算指定周期的简单移动平均线
         if f'{self.label}' not in df.columns:
-            df[f'{self.label}'] = ta.sma(df['close'], self.ma).round(3)
+            df[f'{self.label}'] = rolling_mean(df['close'], self.ma).round(3)
         ma = df[f'{self.label}']
         # 获取最新和前一均线价格，用于比较
         latest_ma_price = ma.iloc[-1]
@@ -36,7 +36,7 @@ class ADL(Indicator):
             return False
 
         # 检查最新成交量
-        latest_volume = float(df.iloc[-1]['volume'])
+        latest_volume = float(df['volume'].iloc[-1])
         if not latest_volume > 0:
             return False
         adl_series = ta.ad(df['high'], df['low'], df['close'], df['volume'])
@@ -1,5 +1,6 @@
 import pandas_ta as ta
 
+from app.calculate.bars import get_bars
 from app.indicator.base import Indicator
 
 
@@ -29,7 +30,7 @@ class ADOSC(Indicator):
         - 如果股票满足特定的交易条件则返回True，否则返回False。
         """
         # 获取最新价格信息
-        price = df.iloc[-1]
+        price = get_bars(df).last
         # 将最新成交量转换为浮点数
         latest_volume = float(price['volume'])
         # 如果最新成交量不大于0，则不进行后续判断
@@ -1,5 +1,6 @@
 import pandas_ta as ta
 
+from app.calculate.bars import get_bars
 from app.core.logger import logger
 from app.indicator.base import Indicator
 
@@ -24,7 +25,7 @@ class MFI(Indicator):
             return False
 
         # 获取最新价格信息
-        price = df.iloc[-1]
+        price = get_bars(df).last
         latest_volume = float(price['volume'])
         if not latest_volume > 0:
             return False
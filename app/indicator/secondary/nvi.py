@@ -1,6 +1,7 @@
 import pandas as pd
 import pandas_ta as ta
 
+from app.calculate.rolling import rolling_mean
 from app.indicator.base import Indicator
 
 
@@ -36,12 +37,11 @@ class NVI(Indicator):
         # 计算 NVI 指标，这里只使用 NVI 序列本身
         # pandas-ta 的 nvi() 函数返回一个包含 NVI 和 NVI_SMA 的 DataFrame
         nvi_series = ta.nvi(close=df['close'], volume=df['volume'])
-        nvi_sma_series = ta.sma(nvi_series, length=10)
-
         if nvi_series is None or nvi_series.empty:
             return False
 
-        if nvi_sma_series is None or nvi_sma_series.empty:
+        nvi_sma_series = rolling_mean(nvi_series, 10)
+        if nvi_sma_series.empty:
             return False
 
         last_nvi = nvi_series.iloc[-1]
@@ -1,5 +1,6 @@
 import pandas_ta as ta
 
+from app.calculate.bars import get_bars
 from app.indicator.base import Indicator
 
 
@@ -29,7 +30,7 @@ class OBV(Indicator):
         - 如果满足买入或卖出信号则返回True，否则返回False。
         """
         # 获取最新价格信息
-        price = df.iloc[-1]
+        price = get_bars(df).last
         # 提取最新成交量并检查是否为正值
         latest_volume = float(price['volume'])
         if not latest_volume > 0:
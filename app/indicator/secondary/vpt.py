@@ -53,7 +53,7 @@ class VPT(Indicator):
             return False
 
         # 检查最新成交量
-        latest_volume = float(df.iloc[-1]['volume'])
+        latest_volume = float(df['volume'].iloc[-1])
         if not latest_volume > 0:
             return False
         vpt_series = _vpt(df)
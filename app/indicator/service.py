@@ -21,7 +21,7 @@ from app.indicator.secondary.pvi import PVI
 from app.indicator.secondary.vpt import VPT
 
 
-def get_candlestick_signal(stock, df, candlestick_weight):
+def get_candlestick_signal(stock, df, candlestick_weight, bullish_patterns=None, bearish_patterns=None):
     """
     根据K线形态匹配结果生成交易信号
 
@@ -29,17 +29,32 @@ def get_candlestick_signal(stock, df, candlestick_weight):
         stock: 股票代码
         df: 包含K线数据的DataFrame
         candlestick_weight: K线形态权重阈值
+        bullish_patterns: 看涨形态列表，默认新建，可传入分析计划中共享的形态
+        bearish_patterns: 看跌形态列表，默认新建，可传入分析计划中共享的形态
 
     返回值:
         tuple: (信号值, 匹配的形态列表)
                信号值：-1表示看跌信号，1表示看涨信号，0表示无信号
-               匹配的形态列表：符合权重阈值的K线形态名称列表
+               匹配的形态列表：符合权重阈值的K线形态匹配结果（PatternMatch）列表
     """
+    if bullish_patterns is None:
+        bullish_patterns = get_bullish_candlestick_patterns()
+    if bearish_patterns is None:
+        bearish_patterns = get_bearish_candlestick_patterns()
     # 检查是否存在看跌K线形态
-    bearish_matched_patterns, bearish_weight = get_match_patterns(get_bearish_candlestick_patterns(), stock, df,
+    bearish_matched_patterns, bearish_weight = get_match_patterns(bearish_patterns, stock, df,
                                                                   trending=None, direction=None)
-    bullish_matched_patterns, bullish_weight = get_match_patterns(get_bullish_candlestick_patterns(), stock, df,
+    bullish_matched_patterns, bullish_weight = get_match_patterns(bullish_patterns, stock, df,
                                                                   trending=None, direction=None)
+    return resolve_candlestick_signal(bullish_matched_patterns, bullish_weight, bearish_matched_patterns,
+                                      bearish_weight, candlestick_weight)
+
+
+def resolve_candlestick_signal(bullish_matched_patterns, bullish_weight, bearish_matched_patterns, bearish_weight,
+                               candlestick_weight):
+    """
+    由看涨、看跌K线形态的匹配结果与权重之和得到K线信号，规则见 get_candlestick_signal。
+    """
     if bearish_weight > bullish_weight >= candlestick_weight:
         return -1, bearish_matched_patterns
 
@@ -64,7 +79,8 @@ def get_indicator_patterns(stock, df, trending, direction, primary_patterns, sec
     return ma_weight, volume_weight, matched_patterns, matched_secondary_patterns
 
 
-def get_indicator_signal(stock, df, trending, direction, ma_weight_limit, volume_weight_limit):
+def get_indicator_signal(stock, df, trending, direction, ma_weight_limit, volume_weight_limit,
+                         up_patterns=None, down_patterns=None):
     """
     获取股票技术指标信号
 
@@ -75,25 +91,36 @@ def get_indicator_signal(stock, df, trending, direction, ma_weight_limit, volume
         direction: 方向参数
         ma_weight_limit: 移动平均权重限制
         volume_weight_limit: 成交量权重限制
+        up_patterns: (主要指标列表, 次要指标列表)，看涨方向，默认新建
+        down_patterns: (主要指标列表, 次要指标列表)，看跌方向，默认新建
 
     返回值:
         tuple: (信号值, 匹配的主要模式列表, 匹配的次要模式列表)
                信号值：-1表示卖出信号，1表示买入信号，0表示无信号
     """
+    if up_patterns is None:
+        up_patterns = (get_up_primary_patterns(), get_up_secondary_patterns())
+    if down_patterns is None:
+        down_patterns = (get_down_primary_patterns(), get_down_secondary_patterns())
+
     down_weight, down_volume_weight, down_matched_patterns, down_matched_secondary_patterns = get_indicator_patterns(
-        stock,
-                                                                                                                df,
-                                                                                                                trending,
-                                                                                                                direction,
-                                                                                                                get_down_primary_patterns(),
-                                                                                                                get_down_secondary_patterns())
-
-    up_weight, up_volume_weight, up_matched_patterns, up_matched_secondary_patterns = get_indicator_patterns(stock, df,
-                                                                                                          trending,
-                                                                                                          direction,
-                                                                                                          get_up_primary_patterns(),
-                                                                                                          get_up_secondary_patterns())
+        stock, df, trending, direction, *down_patterns)
+
+    up_weight, up_volume_weight, up_matched_patterns, up_matched_secondary_patterns = get_indicator_patterns(
+        stock, df, trending, direction, *up_patterns)
 
+    return resolve_indicator_signal(
+        (up_weight, up_volume_weight, up_matched_patterns, up_matched_secondary_patterns),
+        (down_weight, down_volume_weight, down_matched_patterns, down_matched_secondary_patterns),
+        ma_weight_limit, volume_weight_limit)
+
+
+def resolve_indicator_signal(up_result, down_result, ma_weight_limit, volume_weight_limit):
+    """
+    由看涨、看跌两个方向的 get_indicator_patterns 结果得到指标信号，规则见 get_indicator_signal。
+    """
+    up_weight, up_volume_weight, up_matched_patterns, up_matched_secondary_patterns = up_result
+    down_weight, down_volume_weight, down_matched_patterns, down_matched_secondary_patterns = down_result
     if up_weight > down_weight and up_weight >= ma_weight_limit and up_volume_weight >= volume_weight_limit:
         return 1, up_matched_patterns, up_matched_secondary_patterns
     if down_weight > up_weight and down_weight >= ma_weight_limit and down_volume_weight >= volume_weight_limit:
@@ -185,14 +212,18 @@ def get_down_secondary_patterns():
 
 
 def get_match_patterns(patterns, stock, df, trending, direction):
+    """
+    逐个匹配形态，返回匹配结果（PatternMatch）列表与权重之和，不修改形态对象本身。
+    """
     weight = 0
     matched_patterns = []
     try:
         for pattern in patterns:
-            if pattern.match(stock, df, trending, direction):
+            result = pattern.evaluate(stock, df, trending, direction)
+            if result is not None:
                 logger.info(f'{stock['code']} {stock['name']} Match {pattern.label}, signal= {pattern.signal}')
-                weight += pattern.weight
-                matched_patterns.append(pattern)
+                weight += result.weight
+                matched_patterns.append(result)
     except Exception as e:
         logger.info(e, exc_info=True)
     return matched_patterns, weight
@@ -1,13 +1,17 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 
 from app.analysis.router import analysis_router
-from app.core.database import Base, engine
+from app.backtest.routes import router as backtest_router
+from app.core.database import Base, engine, create_missing_indexes, create_missing_columns
 from app.core.env import DATABASE_URL
+from app.core.job import resume_jobs, shutdown_jobs
 from app.core.middleware import ClientInfoMiddleware
 from app.core.redis import test_redis_connection
 from app.core.registry import register_service, deregister_service, actuator_router
+from app.signal.router import signal_router
 from app.strategy.router import strategy_router
 
 
@@ -21,9 +25,13 @@ async def lifespan(_app: FastAPI):
     # 启动时注册到 Consul
     await register_service()
 
-    # 结束时注销服务
+    # 恢复上次关闭时未完成的任务
+    resume_jobs()
+
     yield
 
+    # 结束时先让后台任务处理完当前标的并保存检查点，再注销服务
+    await asyncio.to_thread(shutdown_jobs)
     await deregister_service()
 
 
@@ -34,10 +42,14 @@ app.add_middleware(ClientInfoMiddleware)
 # 创建数据库表（如果没有的话）
 if DATABASE_URL is not None:  # 仅在有数据库 URL 的时候创建表
     Base.metadata.create_all(bind=engine)
+    create_missing_columns()
+    create_missing_indexes()
 
 app.include_router(router=actuator_router, prefix='/actuator', tags=['actuator'])
 app.include_router(router=analysis_router, prefix='/analysis', tags=['analysis'])
 app.include_router(router=strategy_router, prefix='/strategy', tags=['strategy'])
+app.include_router(router=backtest_router, prefix='/backtest', tags=['backtest'])
+app.include_router(router=signal_router, prefix='/signal', tags=['signal'])
 
 
 @app.get("/")
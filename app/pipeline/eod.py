@@ -0,0 +1,187 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+from app.analysis.service import save_analyzed_stocks
+from app.core.database import SessionLocal, Base, engine, create_missing_columns
+from app.core.env import PIPELINE_WORKERS, PIPELINE_CACHE_DIR
+from app.core.logger import logger
+from app.dataset.service import create_price_frame, add_features
+from app.fund.service import get_fund_candidates
+from app.index.service import get_index_stocks
+from app.pipeline.service import Stage, Pipeline
+from app.signal.service import get_signal_plan, detect_signals, save_signals
+from app.stock.service import KType, get_stock, get_stocks, get_stock_prices, get_stocks_prices
+from app.strategy.model import TradingStrategy
+from app.strategy.service import analyze_stock_prices, generate_strategies, check_strategy_reverse_task, \
+    get_analysis_watermark
+
+
+def get_universe(db, indexes=(), exchanges=(), codes=()):
+    """
+    收盘流水线处理的股票：指定的代码、指数成分股、交易所的基金，以及持有中的交易策略（需要做退出检测）。
+
+    返回:
+        tuple: (去重后的股票代码, 已知的股票信息 {代码: 股票信息})
+    """
+    known = {}
+    ordered = list(codes)
+    for index in indexes:
+        ordered.extend(item['stock_code'] for item in get_index_stocks(index))
+    for exchange in exchanges:
+        for stock in get_fund_candidates(exchange):
+            known[stock['code']] = stock
+            ordered.append(stock['code'])
+    ordered.extend(code for (code,) in db.query(TradingStrategy.stock_code).filter_by(signal=1))
+    return list(dict.fromkeys(ordered)), known
+
+
+def fetch_stage(context, items):
+    """
+    拉取股票信息与日K：先一次 MGET 读取缓存，未命中的再并发请求上游。
+    """
+    codes = list(items)
+    known = context['stocks']
+    cached_stocks = get_stocks([code for code in codes if code not in known])
+    cached_prices = get_stocks_prices(codes, KType.DAY)
+
+    def fetch(code):
+        stock = known.get(code) or cached_stocks.get(code) or get_stock(code)
+        if stock is None:
+            return None
+        prices = cached_prices.get(code) or get_stock_prices(code, KType.DAY)
+        if not prices:
+            return None
+        return stock, prices
+
+    with ThreadPoolExecutor(max_workers=PIPELINE_WORKERS) as executor:
+        return dict(zip(codes, executor.map(fetch, codes)))
+
+
+def adjust_stage(context, items):
+    """
+    日K转换为按日期排序的前复权价格。
+    """
+    frames = {}
+    for code, ((stock, prices),) in items.items():
+        try:
+            frames[code] = create_price_frame(stock, prices)
+        except Exception as e:
+            logger.info(f'复权失败, code = {code}: {e}')
+    return frames
+
+
+def features_stage(context, items):
+    """
+    计算均线与拐点，得到与 create_dataframe 相同的特征数据。
+    """
+    return {code: add_features(df.copy()) for code, (df,) in items.items()}
+
+
+def signals_stage(context, items):
+    """
+    计算最后一根K线匹配的全部信号，写入信号位图并重建当天的倒排索引。
+    """
+    signals = {}
+    results = []
+    for code, ((stock, _), df) in items.items():
+        names = detect_signals(dict(stock), df.copy(), get_signal_plan(stock['stock_type']))
+        signals[code] = names
+        results.append({'code': code, 'signals': [[df.index[-1].strftime('%Y-%m-%d'), names]]})
+    if results:
+        save_signals(results, context['db'])
+    return signals
+
+
+def strategies_stage(context, items):
+    """
+    生成交易策略，有买入策略的股票写入分析结果并生成交易策略。
+
+    信号阶段已经计算过全部交易模型的信号，没有任何模型信号的股票不可能得到交易策略，
+    直接跳过分析。
+    """
+    analyzed = {}
+    for code, ((stock, prices), df, names) in items.items():
+        stock = dict(stock)
+        stock['signal'] = 0
+        stock['strategy'] = None
+        stock['watermark'] = get_analysis_watermark(stock, prices)
+        if any(name.startswith('model:') for name in names):
+            try:
+                analyze_stock_prices(stock, df.copy(), plan=get_signal_plan(stock['stock_type']))
+            except Exception as e:
+                logger.info(f'分析失败, code = {code}: {e}', exc_info=True)
+        analyzed[code] = stock
+
+    stocks = [stock for stock in analyzed.values() if stock['strategy'] is not None and stock['signal'] == 1]
+    if stocks:
+        save_analyzed_stocks(stocks, context['db'])
+        generate_strategies(stocks, context['db'])
+    logger.info(f'🚀 策略阶段完成, 分析 {len(analyzed)} 只, 有买入策略 {len(stocks)} 只')
+    return analyzed
+
+
+def exits_stage(context, items):
+    """
+    持有中的交易策略做退出检测，复用已拉取的行情与特征数据。
+    """
+    frames = {code: (stock, prices, df.copy()) for code, ((stock, prices), df, _) in items.items()}
+    results = check_strategy_reverse_task(context['db'], frames) or {}
+    return {code: results.get(code) for code in items}
+
+
+def create_eod_pipeline(cache_dir=PIPELINE_CACHE_DIR):
+    """
+    收盘流水线：拉取行情 → 复权 → 特征 → 信号 → 交易策略 → 退出检测。
+
+    退出检测依赖持仓与策略存续时间，每次都对全部股票执行，其余阶段只处理行情有变化的股票。
+    """
+    return Pipeline([
+        Stage('fetch', fetch_stage),
+        Stage('adjust', adjust_stage, deps=('fetch',)),
+        Stage('features', features_stage, deps=('adjust',)),
+        Stage('signals', signals_stage, deps=('fetch', 'features')),
+        Stage('strategies', strategies_stage, deps=('fetch', 'features', 'signals')),
+        Stage('exits', exits_stage, deps=('fetch', 'features', 'strategies'), cache=False),
+    ], cache_dir)
+
+
+def run_eod(indexes=(), exchanges=(), codes=(), targets=None, force=(), cache_dir=PIPELINE_CACHE_DIR):
+    """
+    执行收盘流水线。
+
+    参数:
+        indexes (list[str]): 指数代码，处理其成分股
+        exchanges (list[str]): 交易所，处理其中的基金
+        codes (list[str]): 额外处理的股票代码
+        targets (list[str], optional): 只执行这些阶段及其上游
+        force (list[str]): 忽略已保存结果、全部重新计算的阶段
+        cache_dir (str): 中间结果保存目录
+
+    返回:
+        list[dict]: 各阶段的执行报告（股票数、重新计算 / 复用数、耗时）
+    """
+    db = SessionLocal()
+    try:
+        universe, known = get_universe(db, indexes, exchanges, codes)
+        logger.info(f'🚀 收盘流水线开始, 共 {len(universe)} 只股票')
+        _, report = create_eod_pipeline(cache_dir).run({'db': db, 'stocks': known}, universe, targets, force)
+    finally:
+        db.close()
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='收盘流水线：拉取行情 → 复权 → 特征 → 信号 → 交易策略 → 退出检测')
+    parser.add_argument('--index', action='append', default=[], help='指数代码，可重复')
+    parser.add_argument('--exchange', action='append', default=[], help='交易所（处理其中的基金），可重复')
+    parser.add_argument('--code', action='append', default=[], help='股票代码，可重复')
+    parser.add_argument('--stage', action='append', default=[], help='只执行该阶段及其上游，可重复')
+    parser.add_argument('--force', action='append', default=[], help='全部重新计算的阶段，可重复')
+    parser.add_argument('--cache-dir', default=PIPELINE_CACHE_DIR)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    create_missing_columns()
+    for entry in run_eod(args.index, args.exchange, args.code, args.stage, args.force, args.cache_dir):
+        print(f"{entry['stage']:<12} items={entry['items']:<6} computed={entry['computed']:<6} "
+              f"reused={entry['reused']:<6} changed={entry['changed']:<6} {entry['seconds']}s")
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import pickle
+import time
+
+from app.core.env import PIPELINE_CACHE_DIR
+from app.core.logger import logger
+
+
+def fingerprint(*parts):
+    """
+    由若干部分拼接得到的 SHA-1 指纹。
+    """
+    return hashlib.sha1('\x1f'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def content_fingerprint(value):
+    """
+    源头阶段结果的默认指纹：序列化后的内容摘要。
+    """
+    return hashlib.sha1(pickle.dumps(value)).hexdigest()
+
+
+class Stage:
+    """
+    流水线中的一个阶段。
+
+    阶段逐只股票产生中间结果：func(context, items) 接收 {代码: (各依赖阶段的结果, ...)}，
+    只包含需要重新计算的股票，返回 {代码: 结果}；结果为 None（或未返回）的股票不进入下游阶段。
+
+    参数:
+        name (str): 阶段名称
+        func (callable): 阶段函数
+        deps (tuple[str]): 依赖的阶段，没有依赖的是源头阶段，每次都执行
+        version (int): 阶段逻辑的版本，修改计算方式后加一使已保存的结果失效
+        fingerprint (callable, optional): 源头阶段由结果计算指纹，默认对序列化内容取摘要
+        cache (bool): 是否保存结果并按指纹跳过未变化的股票；依赖外部状态（如持仓、时间）的阶段应为 False
+    """
+
+    __slots__ = ('name', 'func', 'deps', 'version', 'fingerprint', 'cache')
+
+    def __init__(self, name, func, deps=(), version=1, fingerprint=None, cache=True):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.version = version
+        self.fingerprint = fingerprint or content_fingerprint
+        self.cache = cache
+
+
+class Pipeline:
+    """
+    按依赖关系执行的流水线。
+
+    阶段之间在内存中传递中间结果；每个阶段的结果与指纹保存在 cache_dir 中，
+    股票在某个阶段的指纹由阶段名称、版本与各依赖阶段的指纹得到，源头阶段的指纹由结果内容得到。
+    再次执行时只重新计算指纹变化的股票，其余股票直接复用上次的结果；
+    没有任何股票变化的阶段不调用阶段函数。
+    """
+
+    def __init__(self, stages, cache_dir=PIPELINE_CACHE_DIR):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f'duplicate stage: {stage.name}')
+            self.stages[stage.name] = stage
+        self.order = self.sort()
+        self.cache_dir = cache_dir
+
+    def sort(self):
+        """
+        拓扑排序，依赖不存在或存在环时抛出 ValueError；没有先后关系的阶段保持声明顺序。
+        """
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f'stage {stage.name} depends on unknown stage {dep}')
+        order = []
+        done = set()
+        while len(order) < len(self.stages):
+            ready = [name for name, stage in self.stages.items()
+                     if name not in done and all(dep in done for dep in stage.deps)]
+            if not ready:
+                raise ValueError(f'cyclic dependencies: {sorted(set(self.stages) - done)}')
+            order.extend(ready)
+            done.update(ready)
+        return order
+
+    def resolve(self, targets=None):
+        """
+        执行 targets 需要的阶段（targets 及其全部上游），按执行顺序排列；targets 为空时为全部阶段。
+        """
+        if not targets:
+            return list(self.order)
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f'unknown stage: {name}')
+            if name not in needed:
+                needed.add(name)
+                pending.extend(self.stages[name].deps)
+        return [name for name in self.order if name in needed]
+
+    def path(self, stage):
+        return os.path.join(self.cache_dir, f'{stage.name}.pkl')
+
+    def load(self, stage):
+        """
+        上次保存的 (指纹, 结果)，没有保存过或文件损坏时为空。
+        """
+        try:
+            with open(self.path(stage), 'rb') as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return {}, {}
+        except Exception as e:
+            logger.info(f'读取流水线阶段 {stage.name} 的中间结果失败: {e}')
+            return {}, {}
+
+    def save(self, stage, prints, values):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.path(stage)
+        # 先写临时文件再替换，中途失败不会留下不完整的结果
+        with open(f'{path}.tmp', 'wb') as f:
+            pickle.dump((prints, values), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(f'{path}.tmp', path)
+
+    def run(self, context, codes, targets=None, force=()):
+        """
+        执行流水线。
+
+        参数:
+            context (dict): 传给每个阶段函数的共享参数
+            codes (list[str]): 股票代码，源头阶段的输入
+            targets (list[str], optional): 只执行这些阶段及其上游
+            force (iterable[str]): 忽略已保存结果、全部重新计算的阶段
+
+        返回:
+            tuple: (各阶段结果 {阶段: {代码: 结果}}, 各阶段的执行报告列表)
+        """
+        force = set(force)
+        artifacts = {}
+        prints = {}
+        report = []
+        for name in self.resolve(targets):
+            stage = self.stages[name]
+            start = time.perf_counter()
+            if stage.deps:
+                keys = [code for code in artifacts[stage.deps[0]]
+                        if all(code in artifacts[dep] for dep in stage.deps[1:])]
+            else:
+                keys = list(dict.fromkeys(codes))
+            old_prints, old_values = self.load(stage) if stage.cache and name not in force else ({}, {})
+
+            if stage.deps:
+                new_prints = {code: fingerprint(name, stage.version, *(prints[dep][code] for dep in stage.deps))
+                              for code in keys}
+                if stage.cache:
+                    dirty = [code for code in keys if old_prints.get(code) != new_prints[code] or code not in old_values]
+                else:
+                    dirty = keys
+                computed = stage.func(context, {code: tuple(artifacts[dep][code] for dep in stage.deps)
+                                                for code in dirty}) if dirty else {}
+                dirty_set = set(dirty)
+                values = {code: computed.get(code) if code in dirty_set else old_values[code] for code in keys}
+                changed = len(dirty)
+            else:
+                values = stage.func(context, {code: () for code in keys})
+                values = {code: values.get(code) for code in keys}
+                new_prints = {code: stage.fingerprint(value) for code, value in values.items() if value is not None}
+                dirty = keys
+                changed = sum(1 for code, value in new_prints.items() if old_prints.get(code) != value)
+
+            if stage.cache:
+                self.save(stage, new_prints, values)
+            artifacts[name] = {code: value for code, value in values.items() if value is not None}
+            prints[name] = {code: new_prints[code] for code in artifacts[name]}
+
+            entry = {
+                'stage': name,
+                'items': len(keys),
+                'computed': len(dirty),
+                'reused': len(keys) - len(dirty),
+                'changed': changed,
+                'output': len(artifacts[name]),
+                'seconds': round(time.perf_counter() - start, 3),
+            }
+            report.append(entry)
+            logger.info(f"🚀 流水线阶段 {name} 完成, 共 {entry['items']} 只, 重新计算 {entry['computed']} 只, "
+                        f"复用 {entry['reused']} 只, 耗时 {entry['seconds']}s")
+        return artifacts, report
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, LargeBinary, Index
+
+from app.core.database import Base
+
+
+class SignalPattern(Base):
+    """
+    信号名称与位图中位置的对应关系，只追加不修改，保证历史位图的位置含义不变。
+    """
+    __tablename__ = "signal_pattern"
+
+    bit = Column(Integer, primary_key=True, autoincrement=False)  # 在位图中的位置
+    name = Column(String(255), unique=True, nullable=False)  # 如 primary:MACD:up、candlestick:hammer:up
+    created_at = Column(DateTime, default=datetime.now())  # 记录创建时间
+
+    def __repr__(self):
+        return f"<SignalPattern {self.bit} - {self.name}>"
+
+
+class SignalBitset(Base):
+    """
+    股票在某个交易日匹配的全部信号，按 SignalPattern.bit 编码为小端字节序的位图。
+    """
+    __tablename__ = "signal_bitset"
+    __table_args__ = (
+        # 按交易日取全市场位图（重建倒排索引）以及单只股票的历史位图
+        Index('ix_signal_bitset_trade_date_code', 'trade_date', 'code', unique=True),
+        Index('ix_signal_bitset_code_trade_date', 'code', 'trade_date'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    code = Column(String(10), nullable=False)
+    trade_date = Column(Date, nullable=False)
+    bits = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=datetime.now())  # 记录创建时间
+
+    def __repr__(self):
+        return f"<SignalBitset {self.code} - {self.trade_date}>"
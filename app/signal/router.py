@@ -0,0 +1,103 @@
+from datetime import date
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from starlette.responses import JSONResponse
+
+from app.analysis.service import iter_screen_stocks
+from app.core.database import SessionLocal
+from app.core.dependencies import get_db
+from app.core.job import register_job, start_job
+from app.core.logger import logger
+from app.signal.service import scan_stock_signals, save_signals, screen_signals, get_signal_history, \
+    get_signal_patterns
+
+signal_router = APIRouter()
+
+
+def parse_patterns(patterns):
+    return [name.strip() for name in (patterns or '').split(',') if name.strip()]
+
+
+@signal_router.post('/index')
+async def index_signals(index: str = None, exchange: str = None, days: int = 1):
+    """
+    收盘后计算股票的信号位图并重建倒排索引。
+
+    指定 index 时为指数成分股，否则为交易所的基金；days 大于 1 时同时补算最近 days 个交易日。
+    """
+    if index is None and exchange is None:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param index or exchange is required'}
+        )
+    if days < 1:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param days must be positive'}
+        )
+
+    start_job('signal-index', f'signal-index:{date.today()}:{index or exchange}:{days}', index, exchange, days)
+
+    return {'code': 0, 'msg': 'Job running'}
+
+
+@register_job('signal-index', daily=True)
+def signal_index_task(checkpoint, index, exchange, days):
+    """
+    信号位图任务，按股票写入检查点，全部计算完成后一次写库并重建倒排索引。
+    """
+    results = checkpoint.run(iter_screen_stocks(exchange, index), lambda stock: stock['code'],
+                             lambda stock: scan_stock_signals(stock, days))
+    db = SessionLocal()
+    try:
+        trade_dates = save_signals(results, db)
+    finally:
+        db.close()
+    logger.info(f"🚀 信号位图计算完成, 股票 {len(results)} 只, 交易日 {trade_dates}")
+
+
+@signal_router.get('/screen')
+async def screen(patterns: str = None, trade_date: date = None, mode: str = 'all', db: Session = Depends(get_db)):
+    """
+    按信号组合筛选股票，patterns 为逗号分隔的信号名称，如 primary:MACD:up,candlestick:hammer:up。
+
+    mode 为 all 时返回同时匹配全部信号的股票，为 any 时返回匹配任意一个信号的股票；
+    trade_date 默认为最近一个已计算的交易日。
+    """
+    names = parse_patterns(patterns)
+    if not names:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param patterns is required'}
+        )
+    if mode not in ('all', 'any'):
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param mode must be all or any'}
+        )
+
+    return {'code': 0, 'data': screen_signals(names, db, trade_date, mode), 'msg': 'success'}
+
+
+@signal_router.get('/history')
+async def history(code: str = None, patterns: str = None, start: date = None, end: date = None,
+                  db: Session = Depends(get_db)):
+    """
+    股票各交易日匹配的信号，指定 patterns 时只返回同时匹配这些信号的交易日。
+    """
+    if code is None:
+        return JSONResponse(
+            status_code=400,
+            content={'msg': 'Param code is required'}
+        )
+
+    return {'code': 0, 'data': get_signal_history(code, db, parse_patterns(patterns), start, end), 'msg': 'success'}
+
+
+@signal_router.get('/patterns')
+async def patterns(db: Session = Depends(get_db)):
+    """
+    已登记的全部信号名称。
+    """
+    return {'code': 0, 'data': get_signal_patterns(db), 'msg': 'success'}
@@ -0,0 +1,335 @@
+import threading
+from datetime import datetime
+
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.calculate.bars import share_bars
+from app.calculate.service import calculate_trending_direction
+from app.core.env import DB_BATCH_SIZE, SIGNAL_INDEX_DAYS
+from app.core.logger import logger
+from app.core.metrics import DB_WRITE_SECONDS
+from app.core.redis import redis_client
+from app.dataset.service import get_dataframe
+from app.indicator.service import get_match_patterns, get_indicator_patterns, resolve_candlestick_signal, \
+    resolve_indicator_signal
+from app.signal.model import SignalPattern, SignalBitset
+from app.stock.service import KType
+from app.strategy.plan import get_analysis_plan
+from app.strategy.trading_model import TradingModel
+
+# 倒排索引：某个交易日匹配某个信号的股票集合，以及当天已建立索引的全部股票（同时作为索引是否存在的标记）
+SIGNAL_INDEX_KEY = 'Trading-Plus:Signal:{date}:{bit}'
+SIGNAL_DATE_KEY = 'Trading-Plus:Signal:{date}'
+SIGNAL_INDEX_TTL = 60 * 60 * 24 * SIGNAL_INDEX_DAYS
+
+# 信号方向在信号名称中的写法
+DIRECTIONS = {1: 'up', -1: 'down'}
+
+# 信号名称 <-> 位图中的位置，进程内缓存 signal_pattern 表
+_bits = {}
+_names = {}
+_bits_lock = threading.Lock()
+
+
+def signal_name(kind, label, signal):
+    """
+    信号名称，如 primary:MACD:up、candlestick:hammer:up、model:ZenTradingModel:down。
+    """
+    return f'{kind}:{label}:{DIRECTIONS[signal]}'
+
+
+def encode_bits(bits):
+    """
+    位置列表 -> 小端字节序的位图。
+    """
+    value = 0
+    for bit in bits:
+        value |= 1 << bit
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def decode_bits(data):
+    """
+    位图 -> 位置列表（升序）。
+    """
+    value = int.from_bytes(data, 'little')
+    bits = []
+    while value:
+        low = value & -value
+        bits.append(low.bit_length() - 1)
+        value ^= low
+    return bits
+
+
+def load_patterns(db: Session):
+    rows = db.execute(select(SignalPattern.bit, SignalPattern.name)).all()
+    with _bits_lock:
+        for bit, name in rows:
+            _bits[name] = bit
+            _names[bit] = name
+
+
+def get_pattern_bits(names, db: Session, create=False):
+    """
+    信号名称对应的位置，本进程未缓存的名称从数据库加载。
+
+    参数:
+        names (iterable[str]): 信号名称
+        db (Session): 数据库会话
+        create (bool): 是否为数据库中不存在的名称分配新的位置（追加在最后）
+
+    返回:
+        dict: 名称 -> 位置，不存在且未创建的名称不在结果中
+    """
+    names = list(dict.fromkeys(names))
+    if any(name not in _bits for name in names):
+        load_patterns(db)
+    missing = [name for name in names if name not in _bits]
+    if missing and create:
+        next_bit = max(_names, default=-1) + 1
+        now = datetime.now()
+        try:
+            db.execute(insert(SignalPattern), [{'bit': next_bit + i, 'name': name, 'created_at': now}
+                                               for i, name in enumerate(missing)])
+            db.commit()
+        except IntegrityError:
+            # 其他进程同时分配了位置，重新加载后再分配剩余的名称
+            db.rollback()
+            return get_pattern_bits(names, db, create)
+        load_patterns(db)
+    return {name: _bits[name] for name in names if name in _bits}
+
+
+def get_signal_plan(stock_type):
+    """
+    计算信号使用的分析计划，权重阈值与 analyze_stock 一致，模型信号与扫描时得到的相同。
+    """
+    return get_analysis_plan(stock_type, None, 1, 1, 2)
+
+
+@share_bars
+def detect_signals(stock, df, plan=None):
+    """
+    计算股票在最后一根K线上匹配的全部信号：看涨 / 看跌K线形态、两个方向的主要与次要指标、各交易模型的信号。
+
+    与 analyze_stock_prices 不同，这里记录每个形态自身的匹配结果，而不只是权重胜出方向的形态；
+    交易模型依赖的 candlestick_signal、indicator_signal 等字段按 analyze_stock_prices 的规则计算后写入 stock。
+
+    返回:
+        list[str]: 信号名称
+    """
+    if plan is None:
+        plan = get_signal_plan(stock['stock_type'])
+
+    trending, direction = calculate_trending_direction(stock, df)
+    stock['trending'] = trending
+    stock['direction'] = direction
+    stock['support'], stock['resistance'] = TradingModel.get_support_resistance(stock, df)
+    stock['price'] = float(df['close'].iloc[-1])
+
+    bullish, bullish_weight = get_match_patterns(plan.bullish_candlesticks, stock, df, None, None)
+    bearish, bearish_weight = get_match_patterns(plan.bearish_candlesticks, stock, df, None, None)
+    up_result = get_indicator_patterns(stock, df, trending, direction, *plan.up_patterns)
+    down_result = get_indicator_patterns(stock, df, trending, direction, *plan.down_patterns)
+
+    names = [signal_name('candlestick', match.label, match.signal) for match in bullish + bearish]
+    for result in (up_result, down_result):
+        names.extend(signal_name('primary', match.label, match.signal) for match in result[2])
+        names.extend(signal_name('secondary', match.label, match.signal) for match in result[3])
+
+    candlestick_signal, candlestick_patterns = resolve_candlestick_signal(bullish, bullish_weight, bearish,
+                                                                          bearish_weight, plan.candlestick_weight)
+    stock['candlestick_signal'] = candlestick_signal
+    stock['candlestick_patterns'] = [pattern.to_dict() for pattern in candlestick_patterns]
+    indicator_signal, primary_patterns, secondary_patterns = resolve_indicator_signal(up_result, down_result,
+                                                                                      plan.ma_weight,
+                                                                                      plan.volume_weight)
+    stock['indicator_signal'] = indicator_signal
+    stock['primary_patterns'] = [pattern.label for pattern in primary_patterns]
+    stock['secondary_patterns'] = [pattern.label for pattern in secondary_patterns]
+
+    for model in plan.trading_models:
+        try:
+            signal = model.detect(stock, df, trending, direction)[0]
+        except Exception as e:
+            logger.info(f'{stock["code"]} {model.name} 信号计算失败: {e}')
+            continue
+        if signal in DIRECTIONS:
+            names.append(signal_name('model', model.name, signal))
+    return list(dict.fromkeys(names))
+
+
+def scan_stock_signals(stock, days=1):
+    """
+    计算股票最近 days 根日K各自匹配的信号，每根K线只使用截至当天的数据。
+
+    返回:
+        dict | None: {'code': 代码, 'signals': [[日期, [信号名称]], ...]}，没有K线时返回 None
+    """
+    df = get_dataframe(stock, KType.DAY)
+    if df is None:
+        return None
+    plan = get_signal_plan(stock['stock_type'])
+    signals = []
+    for end in range(max(len(df) - days, 0) + 1, len(df) + 1):
+        day_df = df if end == len(df) else df.iloc[:end]
+        names = detect_signals(dict(stock), day_df, plan)
+        signals.append([day_df.index[-1].strftime('%Y-%m-%d'), names])
+    return {'code': stock['code'], 'signals': signals}
+
+
+def save_signals(results, db: Session, batch_size=DB_BATCH_SIZE):
+    """
+    将 scan_stock_signals 的结果编码为位图写入 signal_bitset（同一股票同一天的旧位图被替换），
+    并重建涉及日期的倒排索引。
+
+    返回:
+        list[str]: 涉及的交易日
+    """
+    names = [name for result in results for _, day_names in result['signals'] for name in day_names]
+    bits = get_pattern_bits(names, db, create=True)
+
+    rows = {}
+    for result in results:
+        for day, day_names in result['signals']:
+            trade_date = datetime.strptime(day, '%Y-%m-%d').date()
+            rows[(trade_date, result['code'])] = encode_bits(bits[name] for name in day_names)
+
+    now = datetime.now()
+    by_date = {}
+    for trade_date, code in rows:
+        by_date.setdefault(trade_date, []).append(code)
+    for trade_date, codes in by_date.items():
+        for i in range(0, len(codes), batch_size):
+            batch = codes[i:i + batch_size]
+            with DB_WRITE_SECONDS.time(SignalBitset.__tablename__):
+                db.execute(delete(SignalBitset).where(SignalBitset.trade_date == trade_date,
+                                                      SignalBitset.code.in_(batch)))
+                db.execute(insert(SignalBitset), [{'code': code, 'trade_date': trade_date,
+                                                   'bits': rows[(trade_date, code)], 'created_at': now}
+                                                  for code in batch])
+                db.commit()
+
+    for trade_date in by_date:
+        rebuild_signal_index(trade_date, db)
+    logger.info(f'信号位图写入完成, 共 {len(rows)} 条, 交易日 {len(by_date)} 个')
+    return [trade_date.strftime('%Y-%m-%d') for trade_date in sorted(by_date)]
+
+
+def rebuild_signal_index(trade_date, db: Session):
+    """
+    由某个交易日的全部位图重建该日的倒排索引，在一个 Redis 事务中替换，查询不会看到一半的索引。
+
+    返回:
+        dict: 位置 -> 股票代码集合
+    """
+    day = trade_date.strftime('%Y-%m-%d')
+    rows = db.execute(select(SignalBitset.code, SignalBitset.bits).where(SignalBitset.trade_date == trade_date)).all()
+    index = {}
+    for code, data in rows:
+        for bit in decode_bits(data):
+            index.setdefault(bit, set()).add(code)
+
+    load_patterns(db)
+    pipe = redis_client.pipeline()
+    stale_keys = [SIGNAL_INDEX_KEY.format(date=day, bit=bit) for bit in list(_names)]
+    pipe.delete(SIGNAL_DATE_KEY.format(date=day), *stale_keys)
+    if rows:
+        pipe.sadd(SIGNAL_DATE_KEY.format(date=day), *[code for code, _ in rows])
+        pipe.expire(SIGNAL_DATE_KEY.format(date=day), SIGNAL_INDEX_TTL)
+    for bit, codes in index.items():
+        key = SIGNAL_INDEX_KEY.format(date=day, bit=bit)
+        pipe.sadd(key, *codes)
+        pipe.expire(key, SIGNAL_INDEX_TTL)
+    pipe.execute()
+    return index
+
+
+def get_latest_trade_date(db: Session):
+    return db.execute(select(func.max(SignalBitset.trade_date))).scalar()
+
+
+def screen_signals(patterns, db: Session, trade_date=None, mode='all'):
+    """
+    按信号组合筛选某个交易日的股票，由 Redis 倒排索引的 SINTER / SUNION 得到结果。
+
+    倒排索引只在 Redis 中保留 SIGNAL_INDEX_DAYS 天，更早的日期在第一次查询时由数据库中的位图重建。
+
+    参数:
+        patterns (list[str]): 信号名称
+        db (Session): 数据库会话
+        trade_date (date, optional): 交易日，默认为最近一个已建立索引的交易日
+        mode (str): all 同时匹配全部信号；any 匹配任意一个信号
+
+    返回:
+        dict: 交易日、股票代码列表，以及从未出现过的信号名称（unknown）
+    """
+    if trade_date is None:
+        trade_date = get_latest_trade_date(db)
+    bits = get_pattern_bits(patterns, db)
+    unknown = [name for name in patterns if name not in bits]
+    result = {'date': trade_date.strftime('%Y-%m-%d') if trade_date else None, 'patterns': patterns, 'mode': mode,
+              'unknown': unknown, 'codes': [], 'count': 0}
+    if trade_date is None or not bits or (mode == 'all' and unknown):
+        return result
+
+    day = trade_date.strftime('%Y-%m-%d')
+    if redis_client.exists(SIGNAL_DATE_KEY.format(date=day)):
+        keys = [SIGNAL_INDEX_KEY.format(date=day, bit=bit) for bit in bits.values()]
+        codes = redis_client.sinter(keys) if mode == 'all' else redis_client.sunion(keys)
+    else:
+        index = rebuild_signal_index(trade_date, db)
+        sets = [index.get(bit, set()) for bit in bits.values()]
+        codes = set.intersection(*sets) if mode == 'all' else set.union(*sets)
+
+    result['codes'] = sorted(codes)
+    result['count'] = len(codes)
+    return result
+
+
+def get_signal_history(code, db: Session, patterns=None, start=None, end=None):
+    """
+    单只股票各交易日匹配的信号，由存储的位图解码；指定 patterns 时只返回同时匹配这些信号的交易日。
+
+    参数:
+        code (str): 股票代码
+        db (Session): 数据库会话
+        patterns (list[str], optional): 信号名称
+        start (date, optional): 开始日期（含）
+        end (date, optional): 结束日期（含）
+
+    返回:
+        list[dict]: [{'date': 交易日, 'patterns': [信号名称]}]，按日期升序
+    """
+    query = select(SignalBitset.trade_date, SignalBitset.bits).where(SignalBitset.code == code)
+    if start is not None:
+        query = query.where(SignalBitset.trade_date >= start)
+    if end is not None:
+        query = query.where(SignalBitset.trade_date <= end)
+    rows = db.execute(query.order_by(SignalBitset.trade_date)).all()
+
+    mask = 0
+    if patterns:
+        bits = get_pattern_bits(patterns, db)
+        if len(bits) < len(set(patterns)):
+            return []
+        mask = int.from_bytes(encode_bits(bits.values()), 'little')
+
+    load_patterns(db)
+    history = []
+    for trade_date, data in rows:
+        if mask and int.from_bytes(data, 'little') & mask != mask:
+            continue
+        history.append({'date': trade_date.strftime('%Y-%m-%d'),
+                        'patterns': [_names[bit] for bit in decode_bits(data) if bit in _names]})
+    return history
+
+
+def get_signal_patterns(db: Session):
+    """
+    已登记的全部信号名称，按位置排列。
+    """
+    load_patterns(db)
+    return [_names[bit] for bit in sorted(_names)]
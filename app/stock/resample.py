@@ -0,0 +1,141 @@
+from datetime import datetime
+
+
+def get_period_key(date, k_type):
+    """
+    日K日期所属的周期：周K为 ISO (年, 周)，月K为 (年, 月)。
+
+    参数:
+        date (str): 日期，格式 YYYYMMDD
+        k_type (KType): 目标K线类型，取值 WEEK / MONTH
+    """
+    if k_type.name == 'WEEK':
+        return datetime.strptime(date, '%Y%m%d').isocalendar()[:2]
+    return date[:4], date[4:6]
+
+
+def is_valid_price(price, stock_type=None):
+    """
+    日K是否参与合并，与 create_price_frame 的过滤条件一致：收盘价大于 0，指数以外还要求成交量大于 0。
+    """
+    if float(price['close']) <= 0:
+        return False
+    return stock_type == 'Index' or float(price['volume'] or 0) > 0
+
+
+def factor_signature(factors):
+    """
+    复权因子历史的摘要：最早一天与最近一天的因子之比，除权除息或因子被修正后随之变化。
+    """
+    if not factors:
+        return None
+    return round(factors[min(factors)] / factors[max(factors)], 8)
+
+
+def _merge_bars(prices, factors=None):
+    """
+    将同一周期内的日K合并为一根K线，日期取周期内最后一个交易日。
+
+    factors 为日期 -> 前复权因子时，先把周期内每根日K换算到最后一个交易日的价格水平（乘以 因子 / 最后一天的因子），
+    再取开高低收；合并后的K线与日K一样按最后一个交易日的因子复权，周期内有除权除息时开高低也不会错位。
+    """
+    last_factor = factors[prices[-1]['date']] if factors else None
+
+    def scaled(price, column):
+        value = float(price[column])
+        return value * factors[price['date']] / last_factor if factors else value
+
+    bar = {
+        'date': prices[-1]['date'],
+        'open': scaled(prices[0], 'open'),
+        'high': max(scaled(price, 'high') for price in prices),
+        'low': min(scaled(price, 'low') for price in prices),
+        'close': float(prices[-1]['close']),
+        'volume': sum(float(price['volume'] or 0) for price in prices),
+    }
+    if 'amount' in prices[-1]:
+        bar['amount'] = sum(float(price.get('amount') or 0) for price in prices)
+    return bar
+
+
+def resample_prices(prices, k_type, stock_type=None, factors=None):
+    """
+    将按日期升序排列的日K合并为周K / 月K。
+
+    停牌等无效的日K（见 is_valid_price）不参与合并；需要复权的股票，没有复权因子的日K同样跳过，
+    与 apply_forward_adjustment_all_prices 丢弃没有因子的日K一致。
+
+    参数:
+        prices (list[dict]): 日K列表，包含 date、open、high、low、close、volume
+        k_type (KType): 目标K线类型
+        stock_type (str, optional): 股票类型，指数不要求成交量大于 0
+        factors (dict, optional): 日期 -> 前复权因子，不需要复权时为 None
+
+    返回:
+        tuple: (K线列表, 最后一根K线对应的第一根日K在 prices 中的位置)
+    """
+    bars = []
+    group = []
+    group_start = 0
+    last_start = 0
+    last_key = None
+    for i, price in enumerate(prices):
+        if not is_valid_price(price, stock_type) or (factors is not None and price['date'] not in factors):
+            continue
+        key = get_period_key(price['date'], k_type)
+        if key != last_key and group:
+            bars.append(_merge_bars(group, factors))
+            group = []
+        if not group:
+            group_start = i
+        group.append(price)
+        last_key = key
+    if group:
+        bars.append(_merge_bars(group, factors))
+        last_start = group_start
+    return bars, last_start
+
+
+def update_resampled_prices(state, prices, k_type, stock_type=None, factors=None):
+    """
+    增量维护周K / 月K。
+
+    state 记录上一次合并的结果以及最后一根K线（当前周期）从哪根日K开始；
+    日K历史没有变化时，只重新合并当前周期及之后新增的日K，其它周期的K线直接复用。
+    日K历史被改写（起始日期变化、数据变短或当前周期起点不一致）或复权因子变化（见 factor_signature）时全量重建。
+
+    参数:
+        state (dict | None): 上一次返回的状态
+        prices (list[dict]): 最新的日K列表（按日期升序）
+        k_type (KType): 目标K线类型
+        stock_type (str, optional): 股票类型
+        factors (dict, optional): 日期 -> 前复权因子，不需要复权时为 None
+
+    返回:
+        dict: 新的状态，bars 为合并后的K线列表
+    """
+    if len(prices) == 0:
+        return {'first': None, 'factor': None, 'tail_start': 0, 'tail_date': None, 'bars': []}
+
+    signature = factor_signature(factors)
+    tail_start = state.get('tail_start', 0) if state else 0
+    reusable = (state is not None
+                and len(state['bars']) > 0
+                and state['first'] == prices[0]['date']
+                and state.get('factor') == signature
+                and tail_start < len(prices)
+                and state['tail_date'] == prices[tail_start]['date'])
+    if reusable:
+        tail_bars, offset = resample_prices(prices[tail_start:], k_type, stock_type, factors)
+        bars = state['bars'][:-1] + tail_bars
+        tail_start += offset
+    else:
+        bars, tail_start = resample_prices(prices, k_type, stock_type, factors)
+
+    return {
+        'first': prices[0]['date'],
+        'factor': signature,
+        'tail_start': tail_start,
+        'tail_date': prices[tail_start]['date'],
+        'bars': bars,
+    }
@@ -1,4 +1,6 @@
 import json
+import time
+from datetime import datetime
 from enum import Enum
 from io import StringIO
 
@@ -6,12 +8,21 @@ import akshare as ak
 import pandas as pd
 
 from app.core.env import TRADING_DATA_URL
-from app.core.redis import get_cache, set_cache
+from app.core.metrics import UPSTREAM_REQUEST_SECONDS
+from app.core.redis import get_cache, set_cache, get_cache_many
 from app.core.request import http_get_with_retries
+from app.stock.resample import update_resampled_prices
 
 
 class KType(Enum):
     DAY = 'D'
+    WEEK = 'W'
+    MONTH = 'M'
+
+
+# 周K / 月K 的合并状态，随日K增量更新，保留时间长于日K缓存
+RESAMPLED_PRICES_KEY = 'Trading-Plus:Stock:{code}:{k_type}:Resampled'
+RESAMPLED_PRICES_TTL = 60 * 60 * 24 * 7
 
 
 def get_stock(code):
@@ -39,6 +50,35 @@ def get_stock(code):
     return stock
 
 
+def get_stocks(codes):
+    """
+    批量读取缓存中的股票信息，一次 MGET 往返。
+
+    参数:
+    codes (list[str]): 股票代码
+
+    返回:
+    dict: 股票代码 -> 股票信息，缓存未命中的为 None，由调用方按需调用 get_stock 拉取
+    """
+    values = get_cache_many([f'Trading-Plus:Stock:{code}' for code in codes])
+    return {code: json.loads(value) if value is not None else None for code, value in zip(codes, values)}
+
+
+def get_stocks_prices(codes, k_type=KType.DAY):
+    """
+    批量读取缓存中的K线数据，一次 MGET 往返。
+
+    参数:
+    codes (list[str]): 股票代码
+    k_type (KType): K线类型
+
+    返回:
+    dict: 股票代码 -> K线列表，缓存未命中的为 None，由调用方按需调用 get_stock_prices 拉取
+    """
+    values = get_cache_many([f'Trading-Plus:Stock:{code}:{k_type}' for code in codes])
+    return {code: json.loads(value) if value is not None else None for code, value in zip(codes, values)}
+
+
 def get_stock_prices(code, k_type=KType.DAY):
     """
     根据股票代码和K线类型获取股票价格数据。
@@ -49,6 +89,8 @@ def get_stock_prices(code, k_type=KType.DAY):
 
     返回:
     list: 如果请求成功，返回包含股票价格数据的列表；如果请求失败或不支持的k_type，则返回空列表。
+
+    周K、月K不单独请求上游，由缓存的日K在本地合并得到，每次只重新合并当前周期。
     """
     # 当请求的是日K线数据时，构造请求URL并发送请求
 
@@ -65,15 +107,75 @@ def get_stock_prices(code, k_type=KType.DAY):
             set_cache(f'Trading-Plus:Stock:{code}:{k_type}', json.dumps(prices), 60 * 5)
 
         return prices
-    # 如果k_type不是DAY，直接返回空列表，表示不支持的k_type
+
+    if k_type in (KType.WEEK, KType.MONTH):
+        return get_resampled_prices(code, k_type)
+    # 不支持的k_type，直接返回空列表
     return []
 
 
+def get_resampled_prices(code, k_type):
+    """
+    由日K合并得到周K / 月K。
+
+    合并状态保存在 Redis 中，新的日K到来时只更新当前周期（以及新开始的周期）的K线。
+    需要前复权的股票先按每天的复权因子把日K换算到周期最后一个交易日的价格水平再合并（见 _merge_bars），
+    之后的 create_price_frame 按最后一个交易日的因子复权即得到正确的前复权周K / 月K。
+
+    参数:
+    code (str): 股票代码
+    k_type (KType): KType.WEEK 或 KType.MONTH
+
+    返回:
+    list: 合并后的K线列表，日K为空时返回空列表
+    """
+    daily = get_stock_prices(code, KType.DAY)
+    if daily is None or len(daily) == 0:
+        return []
+    daily = sorted(daily, key=lambda price: price['date'])
+    stock = get_stock(code)
+    stock_type = stock['stock_type'] if stock is not None else None
+    factors = get_daily_adj_factors(stock, daily) if stock is not None else None
+
+    key = RESAMPLED_PRICES_KEY.format(code=code, k_type=k_type.value)
+    state = get_cache(key)
+    state = json.loads(state) if state is not None else None
+    state = update_resampled_prices(state, daily, k_type, stock_type, factors)
+    set_cache(key, json.dumps(state), RESAMPLED_PRICES_TTL)
+
+    prices = state['bars']
+    set_cache(f'Trading-Plus:Stock:{code}:{k_type}', json.dumps(prices), 60 * 5)
+    return prices
+
+
 def get_stock_price(code):
     url = f'{TRADING_DATA_URL}/stock/price?code={code}'
     return http_get_with_retries(url, 3, None)
 
 
+def needs_forward_adjustment(stock):
+    """
+    是否需要前复权：沪深交易所的股票，指数与基金不复权。
+    """
+    return stock['exchange'] in ('SSE', 'SZSE') and stock['stock_type'] not in ('Index', 'Fund')
+
+
+def get_daily_adj_factors(stock, prices):
+    """
+    日K日期（YYYYMMDD）-> 前复权因子，不需要复权时返回 None。
+
+    参数:
+    stock (dict): 股票信息
+    prices (list[dict]): 按日期升序的日K，取首尾日期作为复权因子的范围
+    """
+    if not needs_forward_adjustment(stock):
+        return None
+    start_date = datetime.strptime(prices[0]['date'], '%Y%m%d').strftime('%Y-%m-%d')
+    end_date = datetime.strptime(prices[-1]['date'], '%Y%m%d').strftime('%Y-%m-%d')
+    factor_df = get_adj_factor(stock, start_date, end_date)
+    return dict(zip(factor_df['date'].dt.strftime('%Y%m%d'), factor_df['adj_factor'].astype(float)))
+
+
 def get_adj_factor(stock, start_date: str, end_date: str):
     exchange = stock['exchange']
     if exchange == 'SSE':
@@ -89,7 +191,13 @@ def ak_stock_zh_a_daily(symbol: str, start_date: str, end_date: str, adjust=""):
     if daily is not None:
         return pd.read_json(StringIO(daily.decode('utf-8')))
 
-    daily = ak.stock_zh_a_daily(symbol=symbol, start_date=start_date, end_date=end_date, adjust=adjust)
+    start = time.perf_counter()
+    status = 'error'
+    try:
+        daily = ak.stock_zh_a_daily(symbol=symbol, start_date=start_date, end_date=end_date, adjust=adjust)
+        status = 'ok'
+    finally:
+        UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - start, 'akshare:stock_zh_a_daily', status)
     if daily is not None:
         set_cache(f'Trading-Plus:Stock:{symbol}:{start_date}:{end_date}:{adjust}', daily.to_json(), 60 * 60)
     return daily
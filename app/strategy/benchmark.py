@@ -0,0 +1,81 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.dataset.service import create_dataframe
+from app.strategy.trading_model_ict import ICTTradingModel
+from app.strategy.trading_model_zen import ZenTradingModel
+
+MODELS = {
+    'ICTTradingModel': ICTTradingModel,
+    'ZenTradingModel': ZenTradingModel,
+}
+
+
+def synthetic_prices(seed, bars):
+    """
+    生成随机游走的日K数据，格式与 get_stock_prices 返回一致。
+    """
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0.0005, 0.02, bars)))
+    open_ = close * (1 + rng.normal(0, 0.01, bars))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, bars)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, bars)))
+    volume = rng.integers(100_000, 10_000_000, bars).astype(float)
+    dates = pd.bdate_range('2020-01-01', periods=bars)
+    return [
+        {'date': d.strftime('%Y%m%d'), 'open': o, 'high': h, 'low': lo, 'close': c, 'volume': v}
+        for d, o, h, lo, c, v in zip(dates, open_, high, low, close, volume)
+    ]
+
+
+def benchmark_scan(model_name, stocks=500, bars=500):
+    """
+    模拟全市场扫描：每只股票新建模型实例并对最新K线判定一次，统计模型判定耗时（不含行情构造）。
+
+    返回:
+        dict: 股票数、总耗时（秒）、单只股票平均耗时（毫秒）
+    """
+    model_class = MODELS[model_name]
+    elapsed = 0.0
+    for seed in range(stocks):
+        stock = {'code': f'BENCH{seed}', 'name': f'BENCH{seed}', 'exchange': 'BENCH', 'stock_type': 'Stock',
+                 'trending': 'UP'}
+        df = create_dataframe(stock, synthetic_prices(seed, bars))
+        start = time.perf_counter()
+        model_class().get_trading_signal(stock, df, stock['trending'], None)
+        elapsed += time.perf_counter() - start
+    return {'stocks': stocks, 'seconds': round(elapsed, 3), 'ms_per_stock': round(elapsed / stocks * 1000, 3)}
+
+
+def benchmark_walk(model_name, bars=500, warmup=60):
+    """
+    模拟回测：同一个模型实例从第 warmup 根K线开始逐根追加判定，统计每根K线的平均耗时。
+
+    返回:
+        dict: 判定次数、总耗时（秒）、单次平均耗时（毫秒）
+    """
+    model = MODELS[model_name]()
+    stock = {'code': 'BENCH', 'name': 'BENCH', 'exchange': 'BENCH', 'stock_type': 'Stock', 'trending': 'UP'}
+    df = create_dataframe(stock, synthetic_prices(0, bars))
+    start = time.perf_counter()
+    for i in range(warmup, len(df) + 1):
+        model.get_trading_signal(stock, df.iloc[:i], stock['trending'], None)
+    elapsed = time.perf_counter() - start
+    steps = len(df) + 1 - warmup
+    return {'steps': steps, 'seconds': round(elapsed, 3), 'ms_per_step': round(elapsed / steps * 1000, 3)}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='交易模型耗时基准（合成K线）')
+    parser.add_argument('--model', default='ZenTradingModel', choices=sorted(MODELS))
+    parser.add_argument('--stocks', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=500)
+    args = parser.parse_args()
+
+    scan = benchmark_scan(args.model, args.stocks, args.bars)
+    print(f"scan  {args.model}: {scan['stocks']} stocks, {scan['seconds']}s, {scan['ms_per_stock']} ms/stock")
+    walk = benchmark_walk(args.model, args.bars)
+    print(f"walk  {args.model}: {walk['steps']} steps, {walk['seconds']}s, {walk['ms_per_step']} ms/step")
@@ -1,12 +1,16 @@
 from datetime import datetime
 
-from sqlalchemy import Numeric, Integer, Column, String, JSON, INTEGER, Text, DateTime
+from sqlalchemy import Numeric, Integer, Column, String, JSON, INTEGER, Text, DateTime, Index
 
 from app.core.database import Base
 
 
 class TradingStrategy(Base):
     __tablename__ = "trading_strategy"
+    __table_args__ = (
+        # 按信号过滤后游标分页 ORDER BY updated_at DESC, id DESC
+        Index('ix_trading_strategy_signal_updated_at_id', 'signal', 'updated_at', 'id'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)  # 主键
     strategy_name = Column(String(255), nullable=False)
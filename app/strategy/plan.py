@@ -0,0 +1,88 @@
+from functools import lru_cache
+
+from app.indicator.primary.candlestick import get_bullish_candlestick_patterns, get_bearish_candlestick_patterns
+from app.indicator.service import get_up_primary_patterns, get_up_secondary_patterns, get_down_primary_patterns, \
+    get_down_secondary_patterns, get_exit_patterns
+from app.strategy.trading_model_hammer import HammerTradingModel
+from app.strategy.trading_model_ict import ICTTradingModel
+from app.strategy.trading_model_index import IndexTradingModel
+from app.strategy.trading_model_indicator import IndicatorTradingModel
+from app.strategy.trading_model_n import NTradingModel
+from app.strategy.trading_model_zen import ZenTradingModel
+
+
+def create_trading_models(stock_type):
+    """
+    按股票类型创建交易模型列表。
+    """
+    if stock_type == 'Index':
+        return [
+            IndexTradingModel(),
+            IndicatorTradingModel()
+        ]
+    return [
+        HammerTradingModel(),
+        NTradingModel(),
+        # AntiTradingModel(),
+        ICTTradingModel(),
+        ZenTradingModel(),
+        # AlBrooksProTradingModel(),
+        IndicatorTradingModel()
+    ]
+
+
+class AnalysisPlan:
+    """
+    预先构建好的分析计划：K线形态、主要/次要指标、退出指标与交易模型。
+
+    计划只在构建时创建一次全部形态与模型对象，之后只读；
+    每只股票的匹配结果由 PatternMatch / 模型 setup 返回，不写回计划中的对象，
+    因此同一个计划可以在扫描时被多个线程共享，子进程中按同样的参数各自构建一次。
+    """
+
+    __slots__ = ('stock_type', 'strategy_name', 'candlestick_weight', 'ma_weight', 'volume_weight', 'model_params',
+                 'bullish_candlesticks', 'bearish_candlesticks', 'up_patterns', 'down_patterns',
+                 'exit_patterns', 'trading_models')
+
+    def __init__(self, stock_type, strategy_name=None, candlestick_weight=1, ma_weight=1, volume_weight=1,
+                 model_params=()):
+        if model_params and strategy_name is None:
+            raise ValueError('model_params requires strategy_name')
+        self.stock_type = stock_type
+        self.strategy_name = strategy_name
+        self.model_params = model_params
+        self.candlestick_weight = candlestick_weight
+        self.ma_weight = ma_weight
+        self.volume_weight = volume_weight
+        self.bullish_candlesticks = tuple(get_bullish_candlestick_patterns())
+        self.bearish_candlesticks = tuple(get_bearish_candlestick_patterns())
+        self.up_patterns = (tuple(get_up_primary_patterns()), tuple(get_up_secondary_patterns()))
+        self.down_patterns = (tuple(get_down_primary_patterns()), tuple(get_down_secondary_patterns()))
+        self.exit_patterns = tuple(get_exit_patterns())
+        trading_models = create_trading_models(stock_type)
+        if strategy_name is not None:
+            trading_models = [model for model in trading_models if model.name == strategy_name]
+        if model_params:
+            # 用指定参数重新创建交易模型（如参数寻优时的 ZenTradingModel(pullback_window=...)）
+            trading_models = [type(model)(**dict(model_params)) for model in trading_models]
+        self.trading_models = tuple(trading_models)
+
+
+@lru_cache(maxsize=64)
+def get_analysis_plan(stock_type, strategy_name=None, candlestick_weight=1, ma_weight=1, volume_weight=1,
+                      model_params=()):
+    """
+    获取分析计划，相同的 (股票类型, 交易模型名称, 权重阈值, 模型参数) 在进程内只构建一次。
+
+    参数:
+        stock_type (str): 股票类型，Index 使用指数交易模型
+        strategy_name (str | None): 只使用指定名称的交易模型，None 表示全部
+        candlestick_weight (int): K线形态信号权重阈值
+        ma_weight (int): 均线指标信号权重阈值
+        volume_weight (int): 成交量指标信号权重阈值
+        model_params (tuple): 交易模型的构造参数，((参数名, 取值), ...)，需同时指定 strategy_name
+
+    返回:
+        AnalysisPlan
+    """
+    return AnalysisPlan(stock_type, strategy_name, candlestick_weight, ma_weight, volume_weight, model_params)
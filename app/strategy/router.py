@@ -7,8 +7,7 @@ from starlette.responses import JSONResponse
 
 from app.core.dependencies import get_db
 from app.core.logger import logger
-from app.strategy.model import TradingStrategy
-from app.strategy.service import run_generate_strategy
+from app.strategy.service import run_generate_strategy, get_page_trading_strategies
 
 strategy_router = APIRouter()
 
@@ -26,42 +25,23 @@ class GetAnalyzedStocksReqBody(BaseModel):
 
 
 @strategy_router.post('/trading')
-async def get_trading_strategy(page: int = 1, page_size: int = 10, req_body: GetAnalyzedStocksReqBody | None = None,
-                              db: Session = Depends(get_db)):
+async def get_trading_strategy(page: int = 1, page_size: int = 10, cursor: str | None = None,
+                               req_body: GetAnalyzedStocksReqBody | None = None,
+                               db: Session = Depends(get_db)):
     try:
         # 从请求体中获取 exchange 和 code 参数
         exchange = req_body.exchange if req_body else None
         code = req_body.code if req_body else None
 
-        # 构建基础查询
-        query = db.query(TradingStrategy).order_by(TradingStrategy.updated_at.desc()).filter_by(signal=1)
-
-        # 按 exchange 和 code 添加过滤条件（如果存在）
-        if exchange:
-            query = query.filter_by(exchange=exchange)
-        if code:
-            query = query.filter_by(code=code)
-
-        # 计算 skip 和 limit
-        skip = (page - 1) * page_size
-        limit = page_size
-
-        # 查询数据并分页
-        items = query.offset(skip).limit(limit).all()
-        total = query.count()  # 获取总记录数
-
-        data = {
-            "total": total,
-            "page_num": (total + page_size - 1) // page_size,
-            "page": page,
-            "page_size": page_size,
-            "has_next": page * page_size < total,
-            "has_prev": page > 1,
-            "items": [strategy.__dict__ for strategy in items]
-        }
+        data = get_page_trading_strategies(db, exchange, code, page, page_size, cursor)
 
         # 返回格式化数据
         return {"code": 0, 'data': data, "msg": "success"}
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"msg": str(e)}
+        )
     except Exception as e:
         logger.info(e, exc_info=True)
         return JSONResponse(
@@ -1,37 +1,50 @@
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
+from app.calculate.bars import share_bars
 from app.calculate.service import calculate_trending_direction
-from app.core.env import STRATEGY_RETENTION_DAY
+from app.core.env import STRATEGY_RETENTION_DAY, DB_BATCH_SIZE, STRATEGY_CHECK_WORKERS
 from app.core.logger import logger
-from app.dataset.service import create_dataframe
-from app.holdings.service import get_holdings
-from app.indicator.service import get_candlestick_signal, get_indicator_signal, get_exit_patterns
-from app.stock.service import KType, get_stock_prices, get_stock
+from app.core.metrics import ANALYSIS_STAGE_SECONDS, TRADING_MODEL_SECONDS, DB_WRITE_SECONDS, record_cache
+from app.core.pagination import paginate, invalidate_count
+from app.core.redis import get_cache, set_cache
+from app.dataset.service import create_dataframe, get_dataframe
+from app.holdings.service import get_holdings_by_codes
+from app.indicator.service import get_candlestick_signal, get_indicator_signal, get_match_patterns, \
+    get_indicator_patterns
+from app.stock.resample import factor_signature
+from app.stock.service import KType, get_stock_prices, get_stock, get_daily_adj_factors
 from app.strategy.model import TradingStrategy
+from app.strategy.plan import get_analysis_plan
 from app.strategy.trading_model import TradingModel
-from app.strategy.trading_model_hammer import HammerTradingModel
-from app.strategy.trading_model_index import IndexTradingModel
-from app.strategy.trading_model_indicator import IndicatorTradingModel
-from app.strategy.trading_model_n import NTradingModel
 
+# 退出检测K线水位，记录上次检测时的最后一根K线
+EXIT_WATERMARK_KEY = 'Trading-Plus:Strategy:Exit:{code}'
+EXIT_WATERMARK_TTL = 60 * 60 * 24 * 7
 
-def add_update_strategy(stock, db: Session):
-    """
-    根据给定的股票信息生成交易策略。
+# 扫描分析结果及其水位，水位不变时扫描直接复用
+ANALYSIS_RESULT_KEY = 'Trading-Plus:Analysis:{code}:{k_type}'
+ANALYSIS_RESULT_TTL = 60 * 60 * 24 * 7
+# analyze_stock_prices 写入股票信息的分析结果字段
+ANALYSIS_RESULT_FIELDS = ('trending', 'direction', 'support', 'resistance', 'price', 'candlestick_signal',
+                          'candlestick_patterns', 'indicator_signal', 'primary_patterns', 'secondary_patterns',
+                          'strategy', 'patterns', 'signal', 'watermark')
 
-    该函数会根据股票的当前信息和市场环境，计算出买入价、止损价等关键指标，并根据这些指标判断是否生成交易策略。
-    如果符合条件，则会更新或插入相应的交易策略到数据库中。
+def build_trading_strategy(stock):
+    """
+    根据股票分析结果构造交易策略对象，未通过风控校验时返回 None。
 
     参数:
-    - stock (dict): 包含股票详细信息的字典，包括股票代码、名称、阻力位、方向、价格、支撑位等。
+    - stock (dict): 包含股票详细信息的字典，stock['strategy'] 为分析得到的策略字典。
 
     返回:
-    无直接返回值，但会根据条件打印相关信息并更新或插入数据库记录。
+    - TradingStrategy | None
     """
-    stock_code = stock['code']
-    stock_name = stock['name']
     strategy = stock['strategy']
 
     if strategy is None:
@@ -39,8 +52,8 @@ def add_update_strategy(stock, db: Session):
 
     strategy = TradingStrategy(
         strategy_name=strategy['strategy_name'],
-        stock_code=stock_code,
-        stock_name=stock_name,
+        stock_code=stock['code'],
+        stock_name=stock['name'],
         exchange=strategy['exchange'],
         entry_patterns=strategy['entry_patterns'],
         entry_price=strategy['entry_price'],
@@ -51,21 +64,114 @@ def add_update_strategy(stock, db: Session):
     )
     if not TradingModel.check_trading_strategy(stock, strategy):
         return None
+    return strategy
 
-    # 查询是否已存在该股票的交易策略
-    existing_strategy = get_strategy_by_stock_code(stock_code, db)
-    if existing_strategy is None:
-        db.add(strategy)
-        db.commit()
-        logger.info(f"✅ 插入新交易策略：{stock_code} - {stock_name}")
-    else:
-        logger.info(f"🚀 交易策略：{stock_code} - {stock_name} 已经存在")
+
+def add_update_strategy(stock, db: Session):
+    """
+    根据给定的股票信息生成交易策略。
+
+    该函数会根据股票的当前信息和市场环境，计算出买入价、止损价等关键指标，并根据这些指标判断是否生成交易策略。
+    如果符合条件，则会更新或插入相应的交易策略到数据库中。
+
+    参数:
+    - stock (dict): 包含股票详细信息的字典，包括股票代码、名称、阻力位、方向、价格、支撑位等。
+
+    返回:
+    无直接返回值，但会根据条件打印相关信息并更新或插入数据库记录。
+    """
+    strategy = build_trading_strategy(stock)
+    if strategy is None:
+        return None
+
+    save_trading_strategies([strategy], db)
     return None
 
+
 def get_strategy_by_stock_code(stock_code, db: Session):
     return db.query(TradingStrategy).filter_by(stock_code=stock_code).first()
 
 
+def get_existing_strategy_codes(stock_codes, db: Session):
+    """
+    一次查询返回已经存在交易策略的股票代码集合。
+    """
+    if not stock_codes:
+        return set()
+    rows = db.query(TradingStrategy.stock_code).filter(TradingStrategy.stock_code.in_(stock_codes)).distinct()
+    return {row[0] for row in rows}
+
+
+def save_trading_strategies(strategies, db: Session, batch_size=DB_BATCH_SIZE):
+    """
+    批量保存交易策略，已存在策略的股票跳过。
+
+    每个批次先用一次 IN 查询找出已存在的股票代码，再用一条多行 INSERT 写入新策略，
+    整个批次在同一个事务中提交；批次写入失败时逐条重试，出错的策略记录日志后跳过。
+
+    参数:
+    - strategies (list[TradingStrategy]): 待保存的交易策略
+    - batch_size (int): 每个事务处理的策略数
+
+    返回:
+    - int: 新插入的策略数量
+    """
+    inserted = 0
+    for start in range(0, len(strategies), batch_size):
+        batch = strategies[start:start + batch_size]
+        existing_codes = get_existing_strategy_codes([strategy.stock_code for strategy in batch], db)
+
+        now = datetime.now()
+        rows = []
+        for strategy in batch:
+            if strategy.stock_code in existing_codes:
+                logger.info(f"🚀 交易策略：{strategy.stock_code} - {strategy.stock_name} 已经存在")
+                continue
+            # 同一批次内同一只股票只保留第一条
+            existing_codes.add(strategy.stock_code)
+            row = strategy.to_dict()
+            row['created_at'] = now
+            row['updated_at'] = now
+            rows.append(row)
+
+        if not rows:
+            continue
+        try:
+            inserted_rows = insert_strategy_rows(rows, db)
+        except Exception as e:
+            # 批次写入失败时逐条重试，跳过出错的策略，其余策略照常保存
+            logger.info(f"批量插入交易策略失败，逐条重试：{e}")
+            inserted_rows = []
+            for row in rows:
+                try:
+                    inserted_rows.extend(insert_strategy_rows([row], db))
+                except Exception as row_error:
+                    logger.info(f"插入交易策略失败：{row['stock_code']} - {row['stock_name']}, {row_error}")
+        if not inserted_rows:
+            continue
+        inserted += len(inserted_rows)
+        invalidate_count(TradingStrategy.__tablename__)
+        logger.info(f"✅ 插入新交易策略：{', '.join(row['stock_code'] for row in inserted_rows)}")
+    return inserted
+
+
+def insert_strategy_rows(rows, db: Session):
+    """
+    在一个事务中插入多条策略，失败时回滚并抛出异常。
+
+    返回:
+    - list[dict]: 已插入的行
+    """
+    try:
+        with DB_WRITE_SECONDS.time(TradingStrategy.__tablename__):
+            db.execute(insert(TradingStrategy), rows)
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return rows
+
+
 def generate_strategies(stocks, db):
     analyzed_stocks = []
     for stock in stocks:
@@ -78,32 +184,62 @@ def generate_strategies(stocks, db):
 
     logger.info("================================================")
     logger.info(f"🚀 开始生成交易策略，共有{len(analyzed_stocks)}只股票")
+    strategies = []
     for stock in analyzed_stocks:
         try:
-            add_update_strategy(stock, db)
+            strategy = build_trading_strategy(stock)
+            if strategy is not None:
+                strategies.append(strategy)
         except Exception as e:
             logger.info(e, exc_info=True)
 
+    try:
+        inserted = save_trading_strategies(strategies, db)
+        logger.info(f"🚀 新增交易策略{inserted}个")
+    except Exception as e:
+        logger.info(e, exc_info=True)
+
     logger.info("🚀 交易策略生成完成!!!")
 
 
-def check_strategy_reverse_task(db: Session):
+def check_strategy_reverse_task(db: Session, frames=None):
     """
     检查并更新交易策略的任务函数。
 
     本函数旨在更新数据库中所有交易策略。
-    它通过分析股票的最新数据来更新策略的买入价、卖出价和止损价，并设置信号为-1，表示卖出交易信号。
+    持仓一次查询全部加载，行情按股票并发拉取并只计算与退出相关的信号，
+    同一只股票的多个策略共享一次计算；K线自上次检查以来没有变化的股票跳过信号计算，
+    只执行基于时间的持仓规则。出现退出信号时设置 signal 为 -1，表示卖出交易信号。
+
+    参数:
+    - frames (dict, optional): 股票代码 -> (股票信息, 日K, 特征数据)，已准备好数据的股票（如收盘流水线）不再重复拉取
+
+    返回:
+    - dict | None: 股票代码 -> (信号, 说明, 形态列表)，没有交易策略时返回 None
     """
 
     # 获取所有交易策略
     strategies = db.query(TradingStrategy).filter_by(signal=1).all()
     logger.info(f"🚀 共有{len(strategies)}个交易策略")
+    if len(strategies) == 0:
+        return None
+
+    codes = list(dict.fromkeys(strategy.stock_code for strategy in strategies))
+    holdings_map = get_holdings_by_codes(codes, db)
+
+    # 并发拉取行情并计算K线退出信号
+    frames = frames or {}
+    with ThreadPoolExecutor(max_workers=STRATEGY_CHECK_WORKERS) as executor:
+        bar_signals = dict(zip(codes, executor.map(lambda code: get_bar_exit_signal(code, *frames.get(code, ())),
+                                                   codes)))
+
     # 遍历每个策略进行更新
+    results = {}
     for strategy in strategies:
         code = strategy.stock_code
         logger.info(f'🚀 检测交易策略, 股票名称: {strategy.stock_name}, 股票代码: {strategy.stock_code}')
-        holdings = get_holdings(code, db)
-        signal, remark, patterns = get_exit_signal(strategy, holdings)
+        signal, remark, patterns = resolve_exit_signal(strategy, holdings_map.get(code), bar_signals[code])
+        results[code] = (signal, remark, patterns)
         if signal == -1:
             strategy.signal = -1
             strategy.exit_patterns = patterns
@@ -112,9 +248,10 @@ def check_strategy_reverse_task(db: Session):
             logger.info(f'🔄 更新交易策略, 股票名称: {strategy.stock_name}, 股票代码: {strategy.stock_code}')
     # 提交数据库会话，保存所有更新
     db.commit()
+    invalidate_count(TradingStrategy.__tablename__)
     # 打印任务完成的日志信息
     logger.info("🚀 check_strategy_reverse_task: 交易策略检查更新完成！")
-    return None
+    return results
 
 
 def get_trading_strategies(db: Session):
@@ -133,33 +270,48 @@ def get_trading_strategies(db: Session):
     return strategies
 
 
+def get_page_trading_strategies(db: Session, exchange=None, code=None, page=1, page_size=10, cursor=None):
+    """
+    分页查询持有中（signal=1）的交易策略，按 (updated_at, id) 倒序。
+    """
+    query = db.query(TradingStrategy).filter_by(signal=1)
+
+    # 按 exchange 和 code 添加过滤条件（如果存在）
+    if exchange:
+        query = query.filter_by(exchange=exchange)
+    if code:
+        query = query.filter_by(stock_code=code)
+    return paginate(query, TradingStrategy, TradingStrategy.__tablename__, (exchange, code), page, page_size, cursor)
+
+
 def run_generate_strategy(_id, db: Session):
     check_strategy_reverse_task(db)
 
 
 def analyze_stock(stock, k_type=KType.DAY, strategy_name=None,
-                  candlestick_weight=1, ma_weight=1, volume_weight=2):
+                  candlestick_weight=1, ma_weight=1, volume_weight=2, prices=None):
     logger.info("=====================================================")
-    prices = get_stock_prices(stock['code'], k_type)
-    if prices is None or len(prices) == 0:
-        logger.info(f'No prices get for  stock {stock['code']}')
-        return None
-
     try:
-        df = create_dataframe(stock, prices)
-        return analyze_stock_prices(stock, df, strategy_name, candlestick_weight, ma_weight, volume_weight)
+        df = get_dataframe(stock, k_type, prices)
+        if df is None:
+            logger.info(f'No prices get for  stock {stock['code']}')
+            return None
+        with ANALYSIS_STAGE_SECONDS.time('analysis'):
+            return analyze_stock_prices(stock, df, strategy_name, candlestick_weight, ma_weight, volume_weight)
     except Exception as e:
         logger.info(e, exc_info=True)
         return None
 
 
+@share_bars
 def analyze_stock_prices(stock, df, strategy_name=None,
-                         candlestick_weight=1, ma_weight=1, volume_weight=1):
+                         candlestick_weight=1, ma_weight=1, volume_weight=1, expected_signal=None, plan=None):
     """
     分析股票价格并生成交易策略信号
     
     该函数综合多种技术指标和形态分析，为特定股票生成交易信号和策略。它会计算趋势方向、
     支撑阻力位，并结合K线形态和指标信号来确定交易策略。
+    分析期间各指标与交易模型通过 get_bars(df) 共用同一个K线访问器（见 share_bars）。
     
     Args:
         stock (dict): 股票信息字典，包含股票代码、名称等基本信息
@@ -168,6 +320,8 @@ def analyze_stock_prices(stock, df, strategy_name=None,
         candlestick_weight (int, optional): K线形态信号权重，默认为1
         ma_weight (int, optional): 均线指标信号权重，默认为1
         volume_weight (int, optional): 成交量指标信号权重，默认为1
+        expected_signal (int, optional): 只关心的信号方向，K线信号与指标信号都不等于该方向时跳过交易模型
+        plan (AnalysisPlan, optional): 指定分析计划（如带模型参数的计划），传入时忽略 strategy_name 与权重参数
         
     Returns:
         TradingStrategy: 生成的交易策略对象，如果未找到合适的策略则返回None
@@ -175,26 +329,34 @@ def analyze_stock_prices(stock, df, strategy_name=None,
     logger.info("=====================================================")
     logger.info(f'Analyzing Stock, code = {stock['code']}, name = {stock['name']}')
 
-    trading_models = get_trading_models(stock)
-
-    if strategy_name is not None:
-        trading_models = [model for model in trading_models if model.name == strategy_name]
+    if plan is None:
+        plan = get_analysis_plan(stock['stock_type'], strategy_name, candlestick_weight, ma_weight, volume_weight)
+    trading_models = plan.trading_models
 
-    trending, direction = calculate_trending_direction(stock, df)
+    with ANALYSIS_STAGE_SECONDS.time('trending'):
+        trending, direction = calculate_trending_direction(stock, df)
     stock['trending'] = trending
     stock['direction'] = direction
 
-    support, resistance = TradingModel.get_support_resistance(stock, df)
+    with ANALYSIS_STAGE_SECONDS.time('support_resistance'):
+        support, resistance = TradingModel.get_support_resistance(stock, df)
     stock['support'] = support
     stock['resistance'] = resistance
-    stock['price'] = float(df.iloc[-1]['close'])
+    stock['price'] = float(df['close'].iloc[-1])
 
-    candlestick_signal, candlestick_patterns = get_candlestick_signal(stock, df, candlestick_weight)
+    with ANALYSIS_STAGE_SECONDS.time('candlestick'):
+        candlestick_signal, candlestick_patterns = get_candlestick_signal(stock, df, plan.candlestick_weight,
+                                                                          plan.bullish_candlesticks,
+                                                                          plan.bearish_candlesticks)
     stock['candlestick_signal'] = candlestick_signal
     stock['candlestick_patterns'] = [pattern.to_dict() for pattern in candlestick_patterns]
 
-    indicator_signal, primary_patterns, secondary_patterns = get_indicator_signal(stock, df, trending, direction,
-                                                                                  ma_weight, volume_weight)
+    with ANALYSIS_STAGE_SECONDS.time('indicator'):
+        indicator_signal, primary_patterns, secondary_patterns = get_indicator_signal(stock, df, trending, direction,
+                                                                                      plan.ma_weight,
+                                                                                      plan.volume_weight,
+                                                                                      plan.up_patterns,
+                                                                                      plan.down_patterns)
     stock['indicator_signal'] = indicator_signal
     stock['primary_patterns'] = [pattern.label for pattern in primary_patterns]
     stock['secondary_patterns'] = [pattern.label for pattern in secondary_patterns]
@@ -202,8 +364,12 @@ def analyze_stock_prices(stock, df, strategy_name=None,
     logger.info(
         f'code = {stock['code']} candlestick_signal = {candlestick_signal}, indicator_signal = {indicator_signal}')
     strategy = None
+    if expected_signal is not None and expected_signal not in (candlestick_signal, indicator_signal):
+        # 交易模型的信号必须与K线信号或指标信号一致，此时不可能得到期望方向的策略
+        trading_models = ()
     for model in trading_models:
-        strategy = model.get_trading_strategy(stock, df)
+        with TRADING_MODEL_SECONDS.time(model.name):
+            strategy = model.get_trading_strategy(stock, df)
         if strategy is None:
             continue
         # 检查策略信号是否与K线信号或指标信号匹配
@@ -227,59 +393,246 @@ def analyze_stock_prices(stock, df, strategy_name=None,
     return strategy
 
 
+class ScanStats:
+    """
+    扫描计数：重新分析的股票数与水位未变化、复用上次结果的股票数。
+    """
+
+    __slots__ = ('analyzed', 'skipped')
+
+    def __init__(self):
+        self.analyzed = 0
+        self.skipped = 0
+
+    @property
+    def skip_ratio(self):
+        total = self.analyzed + self.skipped
+        return self.skipped / total if total else 0.0
+
+    def to_dict(self):
+        return {'analyzed': self.analyzed, 'skipped': self.skipped, 'skip_ratio': round(self.skip_ratio, 4)}
+
+
+def get_analysis_watermark(stock, prices):
+    """
+    分析水位：最后一根K线的日期，加上最后一根K线内容与复权因子的摘要。
+
+    前复权以最新价格为基准，除权除息后变化的是历史K线，
+    因此复权因子取最早一天与最近一天的因子之比（见 factor_signature）。
+    只依赖K线与复权因子，不需要先构建特征数据，水位未变化时可以跳过 get_dataframe。
+    """
+    last = prices[-1]
+    factor = factor_signature(get_daily_adj_factors(stock, prices))
+    digest = hashlib.sha1(f'{json.dumps(last, sort_keys=True, default=str)}:{factor}'.encode()).hexdigest()
+    return f"{last['date']}:{digest[:16]}"
+
+
+def analyze_stock_incremental(stock, k_type=KType.DAY, stats=None):
+    """
+    扫描用的股票分析，参数与 analyze_stock 的默认值一致。
+
+    行情水位（get_analysis_watermark）与上次分析时相同时，直接把上次的分析结果写回 stock，
+    不再构建特征数据、也不再重新分析；否则重新分析，并将结果连同水位保存到 Redis，供之后的扫描（同一天重复触发、多个指数包含同一只股票）复用。
+
+    参数:
+        stock (dict): 股票信息，分析结果与水位（watermark）写入其中
+        k_type (KType): K线类型
+        stats (ScanStats, optional): 扫描计数
+
+    返回:
+        int: 信号，1 表示有买入策略，没有行情或分析失败时为 0
+    """
+    try:
+        prices = get_stock_prices(stock['code'], k_type)
+        if not prices:
+            logger.info(f'No prices get for  stock {stock['code']}')
+            return 0
+        watermark = get_analysis_watermark(stock, prices)
+    except Exception as e:
+        logger.info(e, exc_info=True)
+        return 0
+
+    key = ANALYSIS_RESULT_KEY.format(code=stock['code'], k_type=k_type.value)
+    try:
+        record = get_cache(key)
+    except Exception as e:
+        logger.info(f'读取分析结果失败, code = {stock['code']}, {e}')
+        record = None
+    if record is not None:
+        record = json.loads(record)
+    # 水位一致才算命中，Redis 中有记录但行情已更新的同样记为未命中
+    record_cache('analysis_watermark', record is not None and record['watermark'] == watermark)
+    if record is not None:
+        if record['watermark'] == watermark:
+            stock.update(record['result'])
+            if stats is not None:
+                stats.skipped += 1
+            logger.info(f'行情未更新，复用上次的分析结果, code = {stock['code']}')
+            return stock.get('signal', 0)
+
+    try:
+        df = get_dataframe(stock, k_type, prices)
+        if df is None:
+            logger.info(f'No prices get for  stock {stock['code']}')
+            return 0
+        with ANALYSIS_STAGE_SECONDS.time('analysis'):
+            analyze_stock_prices(stock, df, None, 1, 1, 2)
+    except Exception as e:
+        logger.info(e, exc_info=True)
+        return 0
+    stock['watermark'] = watermark
+    if stats is not None:
+        stats.analyzed += 1
+    result = {field: stock[field] for field in ANALYSIS_RESULT_FIELDS if field in stock}
+    try:
+        set_cache(key, json.dumps({'watermark': watermark, 'result': result}, default=str), ANALYSIS_RESULT_TTL)
+    except Exception as e:
+        logger.info(f'写入分析结果失败, code = {stock['code']}, {e}')
+    return stock['signal']
+
+
 def get_trading_models(stock):
-    if stock['stock_type'] == 'Index':
-        return [
-            IndexTradingModel(),
-            IndicatorTradingModel()
-        ]
-    return [
-        HammerTradingModel(),
-        NTradingModel(),
-        # AntiTradingModel(),
-        # ICTTradingModel(),
-        # ZenTradingModel(),
-        # AlBrooksProTradingModel(),
-        IndicatorTradingModel()
-    ]
+    """
+    股票类型对应的交易模型（分析计划中共享的实例）。
+    """
+    return list(get_analysis_plan(stock['stock_type']).trading_models)
 
 
 def get_exit_signal(strategy, holdings):
-    code = strategy.stock_code
-    stock = get_stock(code)
+    return resolve_exit_signal(strategy, holdings, get_bar_exit_signal(strategy.stock_code))
+
+
+def get_bars_watermark(prices):
+    """
+    K线水位：最后一根K线的日期、收盘价、成交量以及K线数量，任何一项变化都说明行情有更新。
+    """
+    last = prices[-1]
+    return f"{len(prices)}:{last['date']}:{last['close']}:{last['volume']}"
+
+
+def get_exit_watermark(code):
+    try:
+        return get_cache(EXIT_WATERMARK_KEY.format(code=code))
+    except Exception as e:
+        logger.info(f'读取退出检测水位失败, code = {code}, {e}')
+        return None
+
+
+def set_exit_watermark(code, watermark):
+    try:
+        set_cache(EXIT_WATERMARK_KEY.format(code=code), watermark, EXIT_WATERMARK_TTL)
+    except Exception as e:
+        logger.info(f'写入退出检测水位失败, code = {code}, {e}')
+
+
+@share_bars
+def detect_bar_exit(stock, df):
+    """
+    在同一个K线访问器上计算退出信号：先检查退出指标（get_exit_patterns），再只匹配看跌一侧的K线形态与指标
+    （has_bearish_setup），只有看跌一侧达到信号阈值时才完整分析并运行交易模型确认。
+
+    返回:
+    - tuple: (信号, 形态列表)，无退出信号时为 (0, [])
+    """
+    plan = get_analysis_plan(stock['stock_type'])
+    labels = [pattern.label for pattern in plan.exit_patterns if pattern.evaluate(stock, df, None, None) is not None]
+    if len(labels) > 0:
+        return -1, labels
+
+    if not has_bearish_setup(stock, df, plan):
+        return 0, []
+    analyze_stock_prices(stock, df, expected_signal=-1, plan=plan)
+    if stock['signal'] != -1:
+        return 0, []
+    labels.extend([pattern['label'] for pattern in stock['candlestick_patterns']])
+    labels.extend(stock['primary_patterns'])
+    labels.extend(stock['secondary_patterns'])
+    return -1, labels
+
+
+def has_bearish_setup(stock, df, plan):
+    """
+    只匹配看跌一侧的K线形态与指标，判断 analyze_stock_prices 是否可能得到卖出信号。
+
+    K线信号为 -1 需要看跌形态的权重之和达到 candlestick_weight，
+    指标信号为 -1 需要看跌主要 / 次要指标的权重分别达到 ma_weight / volume_weight；
+    两者都不满足时交易模型不可能给出卖出策略，不需要计算支撑阻力位、看涨形态与交易模型。
+    """
+    bearish_matched_patterns, bearish_weight = get_match_patterns(plan.bearish_candlesticks, stock, df, None, None)
+    if bearish_matched_patterns and bearish_weight >= plan.candlestick_weight:
+        return True
+
+    trending, direction = calculate_trending_direction(stock, df)
+    down_weight, down_volume_weight, down_matched_patterns, _ = get_indicator_patterns(
+        stock, df, trending, direction, *plan.down_patterns)
+    return (len(down_matched_patterns) > 0 and down_weight >= plan.ma_weight
+            and down_volume_weight >= plan.volume_weight)
+
+
+def get_bar_exit_signal(code, stock=None, prices=None, df=None):
+    """
+    拉取股票行情并计算仅依赖K线的退出信号，可在线程池中并发执行。
+
+    信号由 detect_bar_exit 计算，K线与上次检查相同时跳过计算。
+
+    参数:
+    - code (str): 股票代码
+    - stock (dict, optional): 已获取的股票信息，为 None 时拉取
+    - prices (list, optional): 已获取的日K，为 None 时拉取
+    - df (DataFrame, optional): 已计算的特征数据，为 None 时由日K创建
+
+    返回:
+    - tuple: (信号, 说明, 形态列表, 行情列表)，无法获取行情时行情列表为 None
+    """
+    if stock is None:
+        stock = get_stock(code)
     # 如果获取失败，则跳过当前策略
     if stock is None:
-        return 0, '无法获取股票信息', []
+        return 0, '无法获取股票信息', [], None
+    stock = dict(stock)
 
-    prices = get_stock_prices(code, KType.DAY)
+    if prices is None:
+        prices = get_stock_prices(code, KType.DAY)
     if prices is None or len(prices) == 0:
-        logger.info(f'No prices get for  stock {stock['code']}')
-        return 0, '无法获取股票价格序列', []
-    df = create_dataframe(stock, prices)
-
-    # 是否有提前退出信号
-    exit_patterns = get_exit_patterns()
-    matched_patterns = []
-    for pattern in exit_patterns:
-        if pattern.match(stock, df, None, None):
-            matched_patterns.append(pattern)
-    if len(matched_patterns) > 0:
-        labels = []
-        for matched_pattern in matched_patterns:
-            labels.append(matched_pattern.label)
-        return -1, '策略有退出信号', labels
-
-    analyze_stock_prices(stock, df)
-
-    candlestick_patterns = stock['candlestick_patterns']
-    primary_patterns = stock['primary_patterns']
-    secondary_patterns = stock['secondary_patterns']
-    if stock['signal'] == -1:
-        labels = []
-        labels.extend([pattern.label for pattern in candlestick_patterns])
-        labels.extend(primary_patterns)
-        labels.extend(secondary_patterns)
-        return -1, '策略有退出信号', labels
+        logger.info(f'No prices get for  stock {code}')
+        return 0, '无法获取股票价格序列', [], None
+
+    watermark = get_bars_watermark(prices)
+    if watermark == get_exit_watermark(code):
+        logger.info(f'K线未更新，跳过退出信号计算, code = {code}')
+        return 0, '继续持有', [], prices
+
+    try:
+        if df is None:
+            df = create_dataframe(stock, prices)
+
+        signal, labels = detect_bar_exit(stock, df)
+    except Exception as e:
+        logger.info(e, exc_info=True)
+        return 0, '退出信号计算失败', [], prices
+
+    if signal == -1:
+        return -1, '策略有退出信号', labels, prices
+
+    set_exit_watermark(code, watermark)
+    return 0, '继续持有', [], prices
+
+
+def resolve_exit_signal(strategy, holdings, bar_signal):
+    """
+    结合K线退出信号与持仓、策略存续时间，得到策略最终的退出信号。
+
+    参数:
+    - strategy (TradingStrategy): 交易策略
+    - holdings (Holdings | None): 持仓
+    - bar_signal (tuple): get_bar_exit_signal 的返回值
+
+    返回:
+    - tuple: (信号, 说明, 形态列表)
+    """
+    signal, remark, patterns, prices = bar_signal
+    if signal == -1 or prices is None:
+        return signal, remark, patterns
 
     # 如果没有持仓信息
     if holdings is None:
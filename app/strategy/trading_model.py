@@ -38,11 +38,24 @@ class TradingModel:
     def get_trading_signal(self, stock, df, trending, direction):
         return 0
 
-    def create_trading_strategy(self, stock, df, signal):
+    def detect(self, stock, df, trending, direction):
+        """
+        判定交易信号，并返回判定过程中产生的中间结果（setup）。
+
+        模型实例不保存任何随股票变化的状态，需要在 create_trading_strategy 中复用的中间结果
+        （如 ICT 的订单块、缠论的触发信息）通过 setup 在本次调用内传递，
+        因此同一个模型实例可以在多个线程间共享。
+
+        返回:
+            tuple: (信号, setup)，默认 setup 为 None
+        """
+        return self.get_trading_signal(stock, df, trending, direction), None
+
+    def create_trading_strategy(self, stock, df, signal, setup=None):
         pass
 
     @staticmethod
-    def check_trading_strategy(stock, strategy, max_loss_ratio=0.03):
+    def check_trading_strategy(stock, strategy, max_loss_ratio=0.03, min_profit_rate=MIN_PROFIT_RATE):
         entry_price = strategy.entry_price
         stop_loss = strategy.stop_loss
         take_profit = strategy.take_profit
@@ -65,7 +78,7 @@ class TradingModel:
                 return False
 
         profit_rate = (take_profit - entry_price) / (entry_price - stop_loss)
-        if profit_rate < MIN_PROFIT_RATE:
+        if profit_rate < min_profit_rate:
             logger.info(f"{stock['code']} {stock['name']} 盈亏比过小 ({profit_rate:.2})，跳过")
             return False
         return True
@@ -81,7 +94,7 @@ class TradingModel:
         返回值:
             交易策略对象，如果无交易信号则返回None
         """
-        trading_signal = self.get_trading_signal(stock, df, stock.get('trending', ''), stock.get('direction', ''))
+        trading_signal, setup = self.detect(stock, df, stock.get('trending', ''), stock.get('direction', ''))
         if trading_signal == 0:
             return None
-        return self.create_trading_strategy(stock, df, trading_signal)
+        return self.create_trading_strategy(stock, df, trading_signal, setup)
@@ -106,7 +106,7 @@ class AlBrooksProTradingModel(TradingModel):
         else:
             return 0
 
-    def create_trading_strategy(self, stock, df, signal):
+    def create_trading_strategy(self, stock, df, signal, setup=None):
         if signal == 0:
             return None
 
@@ -70,7 +70,7 @@ class AntiTradingModel(TradingModel):
 
         return 0
 
-    def create_trading_strategy(self, stock, df, signal):
+    def create_trading_strategy(self, stock, df, signal, setup=None):
         """
         创建交易策略对象，支持多头和空头
         - 止盈止损基于 ATR
@@ -1,5 +1,7 @@
-from app.calculate.service import get_recent_price, get_distance, is_hangingman_strict, get_amplitude, \
-    hammer_is_effective
+from app.calculate.bars import get_bars
+from app.calculate.candle import CandleArrays
+from app.calculate.service import get_recent_price, get_distance
+from app.calculate.swing import get_swing_index
 from app.indicator.primary.candlestick import Candlestick, HammerCandlestick
 from app.strategy.model import TradingStrategy
 from app.strategy.trading_model import TradingModel
@@ -34,6 +36,11 @@ def is_resistance_sma(sma_series, loc, close, high, tolerance=0.0025):
     return trend_down and touch_resistance and resistance_held
 
 
+# 形态对象不保存匹配状态，所有模型实例共享
+HAMMER = HammerCandlestick()
+SHOOTING_STAR = Candlestick({"name": "shootingstar", "description": "流星线", "signal": -1, "weight": 0}, -1)
+
+
 class HammerTradingModel(TradingModel):
     def __init__(self):
         """
@@ -63,16 +70,17 @@ class HammerTradingModel(TradingModel):
         sma120_series = df['SMA120']
         sma200_series = df['SMA200']
 
-        swing_highs = df[df['turning'] == -1]
-        swing_lows = df[df['turning'] == 1]
+        swings = get_swing_index(df)
+        candles = CandleArrays.from_df(df)
+        bars = get_bars(df)
         # ---- Hammer (多头) ----
-        candlestick = HammerCandlestick()
-        if candlestick.match(stock, df, trending, direction):
-            latest_swing_high = swing_highs.iloc[-1] if len(swing_highs) > 0 else None
-            k = df.loc[candlestick.match_indexes[-1]]
+        hammer = HAMMER.evaluate(stock, df, trending, direction)
+        if hammer is not None:
+            latest_swing_high = bars[swings.last_high()] if swings.last_high() is not None else None
+            k = bars.loc(hammer.match_indexes[-1])
             if (latest_swing_high is not None
-                and hammer_is_effective(k, df)
-                and get_amplitude(k, df) > 1
+                and candles.hammer_effective[k.pos]
+                and candles.amplitude[k.pos] > 1
             ):
                 # 获取最后一个匹配的K线标签及其在数据框中的位置
                 # 计算两个位置之间的距离
@@ -81,7 +89,7 @@ class HammerTradingModel(TradingModel):
                 if l >= 3:
                     close_price = k['close']
                     low_price = k['low']
-                    loc = df.index.get_loc(k.name)
+                    loc = k.pos
                     if is_support_sma(sma20_series, loc, close_price, low_price):
                         return 1
                     if is_support_sma(sma50_series, loc, close_price, low_price):
@@ -91,19 +99,19 @@ class HammerTradingModel(TradingModel):
                     if is_support_sma(sma200_series, loc, close_price, low_price):
                         return 1
         # ---- Hangingman (空头) ----
-        candlestick = Candlestick({"name": "shootingstar", "description": "流星线", "signal": -1, "weight": 0}, -1)
-        if candlestick.match(stock, df, trending, direction):
-            k = df.loc[candlestick.match_indexes[-1]]
-            latest_swing_low = swing_lows.iloc[-1] if len(swing_lows) > 0 else None
+        shooting_star = SHOOTING_STAR.evaluate(stock, df, trending, direction)
+        if shooting_star is not None:
+            k = bars.loc(shooting_star.match_indexes[-1])
+            latest_swing_low = bars[swings.last_low()] if swings.last_low() is not None else None
             if (latest_swing_low is not None
-                and is_hangingman_strict(k)
-                and get_amplitude(k, df) > 1
+                and candles.hangingman_strict[k.pos]
+                and candles.amplitude[k.pos] > 1
             ):
                 # 计算两个位置之间的距离
-                l = get_distance(df, df.loc[candlestick.match_indexes[-1]], latest_swing_low)
+                l = get_distance(df, k, latest_swing_low)
                 # 如果距离大于等于3，则进行后续判断
                 if l >= 3:
-                    loc = df.index.get_loc(k.name)
+                    loc = k.pos
                     close_price = k['close']
                     high_price = k['high']
                     if is_resistance_sma(sma20_series, loc, close_price, high_price):
@@ -117,7 +125,7 @@ class HammerTradingModel(TradingModel):
 
         return 0
 
-    def create_trading_strategy(self, stock, df, signal):
+    def create_trading_strategy(self, stock, df, signal, setup=None):
         """
         根据交易信号生成具体的交易策略，包括入场价、止盈价和止损价。
 
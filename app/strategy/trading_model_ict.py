@@ -1,6 +1,7 @@
 import numpy as np
 import pandas_ta as ta
 
+from app.calculate.swing import get_swing_index
 from app.strategy.model import TradingStrategy
 from app.strategy.trading_model import TradingModel
 
@@ -21,14 +22,6 @@ class ICTTradingModel(TradingModel):
         self.ob_min_body_pct = ob_min_body_pct
         self.fvg_atr_mult = fvg_atr_mult
         self.ob_buffer_pct = ob_buffer_pct
-        self.bos_found = False
-        self.bos_idx = None
-        self.bos_dir = None
-        self.prev_swing_pos = None
-        self.ob_type = None
-        self.ob_idx = None
-        self.ob_low = None
-        self.ob_high = None
 
     def find_recent_bos(self, df):
         """
@@ -40,32 +33,41 @@ class ICTTradingModel(TradingModel):
         if n < 10:
             return False, None, None, None
 
-        turning_arr = df['turning'].values
         start = max(3, n - self.lookback_bos)
-        # 从最近往前找
-        for i in range(n - 2, start - 1, -1):
-            close_price = df['close'].iloc[i]
-            open_price = df['open'].iloc[i]
-            prev_close_price = df['close'].iloc[i - 1]
-            # find previous swing high/low before i
-            prev_high_idxes = np.where((turning_arr == -1) & (np.arange(n) < i))[0]
-            prev_low_idxes = np.where((turning_arr == 1) & (np.arange(n) < i))[0]
-            prev_high_pos = prev_high_idxes[-1] if len(prev_high_idxes) > 0 else None
-            prev_low_pos = prev_low_idxes[-1] if len(prev_low_idxes) > 0 else None
-
-            # UP BOS: close > prev swing high and bullish candle
-            if (prev_high_pos is not None
-                and prev_close_price < df['high'].iloc[prev_high_pos] < close_price
-                and close_price > open_price):
-                return True, i, 'UP', prev_high_pos
-
-            # DOWN BOS: close < prev swing low and bearish candle
-            if (prev_low_pos is not None
-                and close_price < df['low'].iloc[prev_low_pos] < prev_close_price
-                and close_price < open_price):
-                return True, i, 'DOWN', prev_low_pos
-
-        return False, None, None, None
+        if start > n - 2:
+            return False, None, None, None
+
+        # 候选 K 线 i ∈ [start, n-2]，向量化计算每根之前最近的 swing high/low
+        swings = get_swing_index(df)
+        close = df['close'].to_numpy(dtype=np.float64)
+        open_ = df['open'].to_numpy(dtype=np.float64)
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        idx = np.arange(start, n - 1)
+        prev_high_pos = swings.last_high_positions[idx - 1]
+        prev_low_pos = swings.last_low_positions[idx - 1]
+        close_price = close[idx]
+        prev_close_price = close[idx - 1]
+        prev_high = high[prev_high_pos]
+        prev_low = low[prev_low_pos]
+
+        # UP BOS: close > prev swing high and bullish candle
+        up = ((prev_high_pos >= 0)
+              & (prev_close_price < prev_high) & (prev_high < close_price)
+              & (close_price > open_[idx]))
+        # DOWN BOS: close < prev swing low and bearish candle
+        down = ((prev_low_pos >= 0)
+                & (close_price < prev_low) & (prev_low < prev_close_price)
+                & (close_price < open_[idx]))
+
+        # 从最近往前找，同一根上 UP 优先
+        hits = np.flatnonzero(up | down)
+        if hits.size == 0:
+            return False, None, None, None
+        k = hits[-1]
+        if up[k]:
+            return True, int(idx[k]), 'UP', int(prev_high_pos[k])
+        return True, int(idx[k]), 'DOWN', int(prev_low_pos[k])
 
     def identify_strict_ob_before_bos(self, df, bos_idx, bos_dir):
         """
@@ -78,31 +80,35 @@ class ICTTradingModel(TradingModel):
 
         scan_start = max(0, bos_idx - self.lookback_ob)
         # search from bos_idx-1 backward to scan_start for the nearest opposite-direction candle
-        for j in range(bos_idx - 1, scan_start - 1, -1):
-            o = df['open'].iloc[j]
-            c = df['close'].iloc[j]
-            high = df['high'].iloc[j]
-            low = df['low'].iloc[j]
-            body = abs(c - o)
-            true_range = max(high - low, 1e-9)
-            if (body / true_range) < self.ob_min_body_pct:
-                continue  # too small body -> noise
-
-            ob_zone_low = low
-            ob_zone_high = high
-            if bos_dir == 'UP' and c < o:
-                # bullish OB (we'll call it BULL_OB because BOS was up and OB is bearish candle)
-                return 'BULL_OB', j, ob_zone_low, ob_zone_high
-
-            if bos_dir == 'DOWN' and c > o:
-                return 'BEAR_OB', j, ob_zone_low, ob_zone_high
-
-        return None, None, None, None
-
-    def find_fvg_after_bos(self, df, bos_idx):
+        o = df['open'].to_numpy(dtype=np.float64)[scan_start:bos_idx]
+        c = df['close'].to_numpy(dtype=np.float64)[scan_start:bos_idx]
+        high = df['high'].to_numpy(dtype=np.float64)[scan_start:bos_idx]
+        low = df['low'].to_numpy(dtype=np.float64)[scan_start:bos_idx]
+        body = np.abs(c - o)
+        true_range = np.maximum(high - low, 1e-9)
+        # too small body -> noise
+        candidate = (body / true_range) >= self.ob_min_body_pct
+        if bos_dir == 'UP':
+            # bullish OB (we'll call it BULL_OB because BOS was up and OB is bearish candle)
+            candidate &= c < o
+            ob_type = 'BULL_OB'
+        elif bos_dir == 'DOWN':
+            candidate &= c > o
+            ob_type = 'BEAR_OB'
+        else:
+            return None, None, None, None
+
+        hits = np.flatnonzero(candidate)
+        if hits.size == 0:
+            return None, None, None, None
+        j = hits[-1]
+        return ob_type, scan_start + int(j), low[j], high[j]
+
+    def find_fvg_after_bos(self, df, bos_idx, atr=None):
         """
         在 BOS 之后的窗口内寻找第一个有效 FVG（left=i, mid=i+1, right=i+2，right vs left）
-        只搜索 bos_idx+1 .. bos_idx+lookahead_fvg（确保 i+2 不越界）
+        搜索 bos_idx+1 .. n-3（确保 i+2 不越界），缺口需大于 fvg_atr_mult * ATR(mid)
+        atr 为预先计算好的 ATR 数组，未传入时计算一次
         返回 (fvg_type('BULL'|'BEAR'), left_idx, right_idx, left_high, left_low, right_high, right_low)
         或 (None, None, None, None, None, None, None)
         """
@@ -113,26 +119,39 @@ class ICTTradingModel(TradingModel):
         start = bos_idx + 1
         # end = min(n - 2, bos_idx + 1 + self.lookahead_fvg)
         end = n - 2
-        for i in range(start, end):
-            left_high = df['high'].iloc[i]
-            left_low = df['low'].iloc[i]
-            right_high = df['high'].iloc[i + 2]
-            right_low = df['low'].iloc[i + 2]
-            atr_here = df['atr'].iloc[i + 1] if 'atr' in df.columns else \
-                ta.atr(df['high'], df['low'], df['close'], length=14).iloc[i + 1]
-
-            # Bullish FVG: right.low > left.high
-            if (right_low > left_high) and ((right_low - left_high) > self.fvg_atr_mult * atr_here):
-                # ensure not swallowed by subsequent bars between i and i+2 (right_low still > left_high)
-                if right_low > left_high:
-                    return 'BULL', i, i + 2, left_high, left_low, right_high, right_low
-
-            # Bearish FVG: right.high < left.low
-            if (right_high < left_low) and ((left_low - right_high) > self.fvg_atr_mult * atr_here):
-                if right_high < left_low:
-                    return 'BEAR', i, i + 2, left_high, left_low, right_high, right_low
-
-        return None, None, None, None, None, None, None
+        if start >= end:
+            return None, None, None, None, None, None, None
+        if atr is None:
+            atr = self.calculate_atr(df)
+
+        high = df['high'].to_numpy(dtype=np.float64)
+        low = df['low'].to_numpy(dtype=np.float64)
+        left_high, left_low = high[start:end], low[start:end]
+        right_high, right_low = high[start + 2:end + 2], low[start + 2:end + 2]
+        min_gap = self.fvg_atr_mult * atr[start + 1:end + 1]
+
+        # Bullish FVG: right.low > left.high
+        bull = (right_low > left_high) & ((right_low - left_high) > min_gap)
+        # Bearish FVG: right.high < left.low
+        bear = (right_high < left_low) & ((left_low - right_high) > min_gap)
+
+        hits = np.flatnonzero(bull | bear)
+        if hits.size == 0:
+            return None, None, None, None, None, None, None
+        k = hits[0]
+        i = start + int(k)
+        fvg_type = 'BULL' if bull[k] else 'BEAR'
+        return fvg_type, i, i + 2, left_high[k], left_low[k], right_high[k], right_low[k]
+
+    @staticmethod
+    def calculate_atr(df, length=14):
+        """
+        计算 ATR 数组（不写回 df），K线不足时返回全 NaN。
+        """
+        atr = ta.atr(df['high'], df['low'], df['close'], length=length)
+        if atr is None:
+            return np.full(len(df), np.nan)
+        return atr.to_numpy(dtype=np.float64)
 
     @staticmethod
     def check_entry_touch_and_confirm(df, ob_info, fvg_info, last_idx, prefer='OB'):
@@ -210,16 +229,24 @@ class ICTTradingModel(TradingModel):
         - 有效 FVG (需大于 ATR*0.2)
         - MSS + 回测确认
         """
+        return self.detect(stock, df, trending, direction)[0]
 
+    def detect(self, stock, df, trending, direction):
+        """
+        判定 ICT 信号，setup 为识别出的 BOS 与订单块（OB），供 create_trading_strategy 计算止损。
+
+        返回:
+            tuple: (信号, setup)，未识别出订单块时 setup 为 None
+        """
         if len(df) < 200:  # 需要足够数据来计算EMA/ATR
-            return 0
+            return 0, None
 
         # 1️⃣ 趋势过滤
         trend_up = True if stock['trending'] == 'UP' else False
         trend_down = True if stock['trending'] == 'DOWN' else False
 
-        # 2️⃣ ATR 波动率，用于FVG过滤
-        df['atr'] = ta.atr(df['high'], df['low'], df['close'], length=14)
+        # 2️⃣ ATR 波动率，用于FVG过滤（只计算一次，不写回 df）
+        atr = self.calculate_atr(df)
 
         # 3️⃣ MSS（市场结构转变）检测，改用 turning
         # 最近一次突破
@@ -227,30 +254,31 @@ class ICTTradingModel(TradingModel):
         # print(f"BOS found: {bos_found}, idx: {bos_idx}, dir: {bos_dir}, prev_swing_pos: {prev_swing_pos}")
         # print(f'bos index date: {df.iloc[bos_idx].name.strftime('%Y-%m-%d')}')
         if not bos_found:
-            return 0
-
-        self.bos_found = bos_found
-        self.bos_idx = bos_idx
-        self.bos_dir = bos_dir
-        self.prev_swing_pos = prev_swing_pos
+            return 0, None
 
         ob_type, ob_idx, ob_low, ob_high = self.identify_strict_ob_before_bos(df, bos_idx, bos_dir)
         # print(f"OB found: {ob_type}, idx: {ob_idx}, low: {ob_low}, high: {ob_high}")
         # print(f'ob index date: {df.iloc[ob_idx].name.strftime("%Y-%m-%d")}')
         if ob_type is None:
-            return 0
-
-        self.ob_type, self.ob_idx, self.ob_low, self.ob_high = ob_type, ob_idx, ob_low, ob_high
-
-        swallowed = False
-        for k in range(ob_idx + 1, len(df)):
-            if (df['low'].iloc[k] < ob_low) and (df['high'].iloc[k] > ob_high):
-                swallowed = True
-                break
-        if swallowed:
-            return 0
-
-        fvg_info = self.find_fvg_after_bos(df, bos_idx)
+            return 0, None
+
+        setup = {
+            'bos_idx': bos_idx,
+            'bos_dir': bos_dir,
+            'prev_swing_pos': prev_swing_pos,
+            'ob_type': ob_type,
+            'ob_idx': ob_idx,
+            'ob_low': ob_low,
+            'ob_high': ob_high,
+        }
+
+        # OB 之后是否有 K 线完全吞没 OB 区间
+        after_low = df['low'].to_numpy(dtype=np.float64)[ob_idx + 1:]
+        after_high = df['high'].to_numpy(dtype=np.float64)[ob_idx + 1:]
+        if np.any((after_low < ob_low) & (after_high > ob_high)):
+            return 0, setup
+
+        fvg_info = self.find_fvg_after_bos(df, bos_idx, atr)
         # print(f"FVG found: {fvg_info}")
         entry_signal = self.check_entry_touch_and_confirm(
             df,
@@ -262,26 +290,31 @@ class ICTTradingModel(TradingModel):
         # 5️⃣ 交易逻辑：必须符合趋势 + FVG + MSS
         # 📈 多头信号
         if entry_signal == 1 and trend_up:
-            return 1
+            return 1, setup
         # 📉 空头信号
         if entry_signal == -1 and trend_down:
-            return 0
-        return entry_signal
+            return 0, setup
+        return entry_signal, setup
 
-    def create_trading_strategy(self, stock, df, signal):
+    def create_trading_strategy(self, stock, df, signal, setup=None):
         """
         策略优化：
         - 入场价 = 当前收盘价
         - 止损 = 最近 swing high/low (来自 turning)
         - 止盈 = RR = 2:1
         """
-        # re-identify BOS & OB to get positions/values (could cache to avoid double compute)
-        ob_type, ob_idx, ob_low, ob_high = self.ob_type, self.ob_idx, self.ob_low, self.ob_high
+        if setup is None:
+            # 未传入 setup 时重新识别 BOS 与 OB
+            _, setup = self.detect(stock, df, stock.get('trending', ''), stock.get('direction', ''))
+        if setup is None:
+            return None
+        ob_low, ob_high = setup['ob_low'], setup['ob_high']
 
         last_close = float(df['close'].iloc[-1])
         n_digits = 3 if stock.get('stock_type') == 'Fund' else 2
-        swing_highs = df[df['turning'] == -1]
-        swing_lows = df[df['turning'] == 1]
+        swings = get_swing_index(df)
+        last_high_pos = swings.last_high()
+        last_low_pos = swings.last_low()
         if signal == 1:
             if ob_low is None:
                 return None
@@ -290,7 +323,7 @@ class ICTTradingModel(TradingModel):
             risk = entry_price - stop_loss
             if risk <= 0:
                 return None
-            target_high = swing_highs['high'].iloc[-1] if len(swing_highs) >= 1 else None
+            target_high = df['high'].iloc[last_high_pos] if last_high_pos is not None else None
             take_profit = float(target_high) if (target_high and target_high > entry_price) else entry_price + 2 * risk
 
         elif signal == -1:
@@ -301,7 +334,7 @@ class ICTTradingModel(TradingModel):
             risk = stop_loss - entry_price
             if risk <= 0:
                 return None
-            target_low = swing_lows['low'].iloc[-1] if len(swing_lows) >= 1 else None
+            target_low = df['low'].iloc[last_low_pos] if last_low_pos is not None else None
             take_profit = float(target_low) if (target_low and target_low < entry_price) else entry_price - 2 * risk
 
         else:
@@ -11,9 +11,14 @@ from app.strategy.trading_model import TradingModel
 class IndexTradingModel(TradingModel):
     def __init__(self):
         super().__init__('IndexTradingModel')
-        self.patterns = []
 
     def get_trading_signal(self, stock, df, trending, direction):
+        return self.detect(stock, df, trending, direction)[0]
+
+    def detect(self, stock, df, trending, direction):
+        """
+        判定超买超卖信号，setup 为触发信号的指标名称列表。
+        """
         index_fund = stock
         index_fund_df = df
         index_no_volume = False
@@ -40,7 +45,7 @@ class IndexTradingModel(TradingModel):
             prices = get_stock_prices(index_fund['code'], KType.DAY)
             if prices is None or len(prices) == 0:
                 logger.info(f'No prices get for  stock {index_fund['code']}')
-                return 0
+                return 0, []
 
             index_fund_df = create_dataframe(index_fund, prices)
 
@@ -56,27 +61,27 @@ class IndexTradingModel(TradingModel):
         last_wr = wr_df.iloc[-1]
 
         # 超卖
-        self.patterns = []
+        patterns = []
         if last_k < 20 and last_d < 20:
-            self.patterns.append('KDJ')
+            patterns.append('KDJ')
         if last_rsi < 30:
-            self.patterns.append('RSI')
+            patterns.append('RSI')
         if last_wr < -80:
-            self.patterns.append('WR')
-        if len(self.patterns) > 0:
-            return 1
+            patterns.append('WR')
+        if len(patterns) > 0:
+            return 1, patterns
 
         # 超买
-        self.patterns = []
+        patterns = []
         if last_k > 80 and last_d > 80:
-            self.patterns.append('KDJ')
+            patterns.append('KDJ')
         if last_rsi > 70:
-            self.patterns.append('RSI')
+            patterns.append('RSI')
         if last_wr > -20:
-            self.patterns.append('WR')
-        if len(self.patterns) > 0:
-            return -1
-        return 0
+            patterns.append('WR')
+        if len(patterns) > 0:
+            return -1, patterns
+        return 0, []
 
     def get_trading_strategy(self, stock, df):
         """
@@ -91,17 +96,17 @@ class IndexTradingModel(TradingModel):
         """
         if stock['stock_type'] != 'Index':
             return None
-        trading_signal = self.get_trading_signal(stock, df, stock.get('trending', ''), stock.get('direction', ''))
-        return self.create_trading_strategy(stock, df, trading_signal)
+        trading_signal, patterns = self.detect(stock, df, stock.get('trending', ''), stock.get('direction', ''))
+        return self.create_trading_strategy(stock, df, trading_signal, patterns)
 
-    def create_trading_strategy(self, stock: dict, df: pd.DataFrame, signal: int):
+    def create_trading_strategy(self, stock: dict, df: pd.DataFrame, signal: int, setup=None):
         stock_code = stock.get('code')
         stock_name = stock.get('name')
         price = stock.get('price')
         support = stock.get('support')
         resistance = stock.get('resistance')
         exchange = stock.get('exchange')
-        patterns = self.patterns
+        patterns = setup or []
 
         if signal == 1:
             entry_price = price
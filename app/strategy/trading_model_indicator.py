@@ -21,7 +21,7 @@ class IndicatorTradingModel(TradingModel):
             return -1
         return 0
 
-    def create_trading_strategy(self, stock, df, signal):
+    def create_trading_strategy(self, stock, df, signal, setup=None):
         patterns = []
         if signal == 1:  # 多头
             entry_price = stock['support'] * 0.998
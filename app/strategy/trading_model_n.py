@@ -1,6 +1,8 @@
 import pandas_ta as ta
 
+from app.calculate.bars import get_bars
 from app.calculate.service import get_distance, get_total_volume_around
+from app.calculate.swing import get_swing_index
 from app.indicator.primary.rsi import RSI
 from app.indicator.primary.wr import WR
 from app.indicator.secondary.obv import OBV
@@ -29,13 +31,15 @@ class NTradingModel(TradingModel):
         super().__init__('NTradingModel')
 
     def get_trading_signal(self, stock, df, trending, direction):
-        turning_points = df[df['turning'] != 0]
-        if len(turning_points) < 4:
+        swings = get_swing_index(df)
+        if swings.swing_count < 4:
             return 0
-        point_1 = turning_points.iloc[-1]
-        point_2 = turning_points.iloc[-2]
-        point_3 = turning_points.iloc[-3]
-        point = df.iloc[-1]
+        recent = swings.recent_swings(3)
+        bars = get_bars(df)
+        point_1 = bars[recent[-1]]
+        point_2 = bars[recent[-2]]
+        point_3 = bars[recent[-3]]
+        point = bars.last
         close = point['close']
         if get_distance(df, point, point_1) > 3:
             return 0
@@ -72,12 +76,12 @@ class NTradingModel(TradingModel):
 
         return signal
 
-    def create_trading_strategy(self, stock, df, signal):
+    def create_trading_strategy(self, stock, df, signal, setup=None):
         last_close = df['close'].iloc[-1]
         n_digits = 3 if stock['stock_type'] == 'Fund' else 2
-        turning_points = df[df['turning'] != 0]
-        point_1 = turning_points.iloc[-1]
-        point_2 = turning_points.iloc[-2]
+        recent = get_swing_index(df).recent_swings(2)
+        point_1 = df.iloc[recent[-1]]
+        point_2 = df.iloc[recent[-2]]
 
         # 计算 ATR (真实波动率)
         atr_series = ta.atr(df['high'], df['low'], df['close'], length=14)  # 假设 ATR 计算函数返回的是一个包含 ATR 值的 Series
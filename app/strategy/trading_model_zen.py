@@ -1,10 +1,14 @@
+import threading
+
 import numpy as np
 import pandas as pd
 import pandas_ta as ta
 
+from app.calculate.swing import get_swing_index
 from app.core.logger import logger
 from app.strategy.model import TradingStrategy
 from app.strategy.trading_model import TradingModel
+from app.strategy.zen_structure import ZenStructure, record_to_dict
 
 
 class ZenTradingModel(TradingModel):
@@ -13,7 +17,7 @@ class ZenTradingModel(TradingModel):
     主要流程：
       fractals (turning) -> pens -> lines -> zhongshu -> 信号判定
     注意：
-      - 需要 df 的 index 为时间索引或任意唯一标签索引（代码用 df.index.get_loc 做位置映射）
+      - 笔、线段、中枢使用结构化数组存储（zen_structure），以整数位置表示起止K线
       - 推荐调用端事先计算好 df['EMA5'] 以及 df['volume'] 等（若没有，模型会尝试计算部分指标）
     """
 
@@ -32,149 +36,34 @@ class ZenTradingModel(TradingModel):
         self.ema_long = ema_long
         self.pullback_window = pullback_window
         self.backlash_volume_lookback = backlash_volume_lookback
+        # 每个线程各自缓存上一次的结构，模型实例可在线程间共享
+        self._local = threading.local()
 
-    # ---------------- 笔 ----------------
-    def build_pens(self, df: pd.DataFrame, fractals: pd.Series) -> list:
-        """
-        从分型构造笔（工程化规则）：
-          - 选取相邻异向分型对（底->顶 为上升笔，顶->底 为下降笔）
-          - 两分型之间至少 min_bars_between_fractals
-          - 笔的 high/low 取两端分型 high/low
-          - 输出的 pen 包含 start/end label 与 start_loc/end_loc（整数位置）
-        """
-        pens = []
-        nonzero = fractals[fractals != 0]
-        idxes = nonzero.index.tolist()
-        vals = nonzero.values.tolist()
-        if len(idxes) < 2:
-            return pens
-
-        for i in range(len(idxes) - 1):
-            t1, t2 = vals[i], vals[i + 1]
-            if t1 * t2 >= 0:
-                continue
-            pos1, pos2 = idxes[i], idxes[i + 1]
-            loc1 = df.index.get_loc(pos1)
-            loc2 = df.index.get_loc(pos2)
-            if abs(loc2 - loc1) < self.min_bars_between_fractals:
-                continue
-            high = float(max(df['high'].iloc[loc1], df['high'].iloc[loc2]))
-            low = float(min(df['low'].iloc[loc1], df['low'].iloc[loc2]))
-            direction = 1 if (t1 == -1 and t2 == 1) else -1
-            pens.append({
-                'start': pos1,
-                'end': pos2,
-                'start_loc': int(loc1),
-                'end_loc': int(loc2),
-                'high': high,
-                'low': low,
-                'direction': direction
-            })
-
-        # 合并非常短或噪音笔（方向相同且间隔短）
-        merged = []
-        for p in pens:
-            if not merged:
-                merged.append(p)
-                continue
-            prev = merged[-1]
-            gap = p['start_loc'] - prev['end_loc']
-            if p['direction'] == prev['direction'] and gap <= self.min_pen_bars:
-                # 合并为一个笔（扩展 end）
-                prev['end'] = p['end']
-                prev['end_loc'] = p['end_loc']
-                prev['high'] = max(prev['high'], p['high'])
-                prev['low'] = min(prev['low'], p['low'])
-            else:
-                merged.append(p)
-        return merged
-
-    # ---------------- 线段 ----------------
-    def build_lines(self, pens: list) -> list:
-        """
-        将笔合并为线段：
-          - 当笔方向变化时，关闭当前线段并把它 append
-          - 同方向笔则扩展当前线段
-        每条 line 包含 start/end label 与 start_loc/end_loc、high、low、direction
-        """
-        if not pens:
-            return []
-        lines = []
-        cur = {
-            'start': pens[0]['start'],
-            'end': pens[0]['end'],
-            'start_loc': pens[0]['start_loc'],
-            'end_loc': pens[0]['end_loc'],
-            'high': pens[0]['high'],
-            'low': pens[0]['low'],
-            'direction': pens[0]['direction']
-        }
-        for p in pens[1:]:
-            if p['direction'] != cur['direction']:
-                lines.append(cur)
-                cur = {
-                    'start': p['start'],
-                    'end': p['end'],
-                    'start_loc': p['start_loc'],
-                    'end_loc': p['end_loc'],
-                    'high': p['high'],
-                    'low': p['low'],
-                    'direction': p['direction']
-                }
-            else:
-                # 扩展当前线段
-                cur['end'] = p['end']
-                cur['end_loc'] = p['end_loc']
-                cur['high'] = max(cur['high'], p['high'])
-                cur['low'] = min(cur['low'], p['low'])
-        lines.append(cur)
-        return lines
-
-    # ---------------- 中枢（基于 lines） ----------------
-    def find_zone(self, lines: list) -> list:
+    def __getstate__(self):
+        # 线程本地缓存不参与序列化，便于模型随分析计划传给子进程
+        state = self.__dict__.copy()
+        state.pop('_local', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    # ---------------- 笔 / 线段 / 中枢 ----------------
+    def build_structure(self, df: pd.DataFrame) -> ZenStructure:
         """
-        基于线段识别中枢（严格）：
-          - 初始中枢由连续三段 line 的交集构成（top = min(highs), bottom = max(lows)）
-          - 向后扩展：若下一个 line 与当前中枢有交集则扩展 end_line 与 top/bottom
-          - 记录 start_line, end_line, start_loc, end_loc, top, bottom
-        返回：list of dict
+        由分型构造笔、线段、中枢（结构化数组，见 zen_structure）。
+
+        同一个模型实例在同一线程中对逐根追加的K线重复判定时（如回测），分型没有变化就直接复用上一次的结构。
         """
-        zs_list = []
-        n = len(lines)
-        if n < 3:
-            return zs_list
-
-        i = 0
-        while i <= n - 3:
-            top = min(lines[i]['high'], lines[i + 1]['high'], lines[i + 2]['high'])
-            bottom = max(lines[i]['low'], lines[i + 1]['low'], lines[i + 2]['low'])
-            if bottom <= top:
-                z = {
-                    'start_line': i,
-                    'end_line': i + 2,
-                    'top': float(top),
-                    'bottom': float(bottom),
-                    'start_loc': lines[i].get('start_loc'),
-                    'end_loc': lines[i + 2].get('end_loc')
-                }
-                # 向后尝试扩展
-                j = i + 3
-                while j < n:
-                    new_top = min(z['top'], lines[j]['high'])
-                    new_bottom = max(z['bottom'], lines[j]['low'])
-                    if new_bottom <= new_top:
-                        z['top'] = float(new_top)
-                        z['bottom'] = float(new_bottom)
-                        z['end_line'] = j
-                        z['end_loc'] = lines[j].get('end_loc')
-                        j += 1
-                    else:
-                        break
-                zs_list.append(z)
-                i = j  # 跳到扩展后的下一段
-            else:
-                i += 1
-        return zs_list
+        structure = getattr(self._local, 'structure', None)
+        if structure is None:
+            structure = ZenStructure(self.min_bars_between_fractals, self.min_pen_bars)
+            self._local.structure = structure
+        swings = get_swing_index(df)
+        structure.update(swings.positions, swings.types,
+                         df['high'].to_numpy(dtype=np.float64), df['low'].to_numpy(dtype=np.float64))
+        return structure
 
     # ---------------- 背驰检测（量能 + MACD） ----------------
     def detect_backlash(self, df: pd.DataFrame) -> bool:
@@ -247,9 +136,18 @@ class ZenTradingModel(TradingModel):
           - 若无中枢，用笔/线段做备选顺势跟随
         返回时同时会把触发原因以 meta 字段填回（方便回测分析）
         """
-        # 基本健壮性
-        if len(df) < 30:
-            return 0
+        return self.detect(stock, df, trending, direction)[0]
+
+    def detect(self, stock: dict, df: pd.DataFrame, trending=None, direction=None):
+        """
+        判定买卖点，setup 为触发原因及中枢等元信息（meta），供 create_trading_strategy 附加到策略上。
+
+        返回:
+            tuple: (信号, meta)
+        """
+        # 基本健壮性（K线不足 ema_long 根时 EMA 无法计算）
+        if len(df) < max(30, self.ema_long):
+            return 0, None
 
         # 计算 ema（不改变原 df）
         ema_s = ta.ema(df['close'], length=self.ema_short)
@@ -257,87 +155,60 @@ class ZenTradingModel(TradingModel):
         bullish_trend = ema_s.iloc[-1] > ema_l.iloc[-1]
         bearish_trend = ema_s.iloc[-1] < ema_l.iloc[-1]
 
-        # fractals（Series）
-        fractals = df['turning']
-        pens = self.build_pens(df, fractals)
-        lines = self.build_lines(pens)
-        zs = self.find_zone(lines)
+        # fractals -> pens -> lines -> zs
+        structure = self.build_structure(df)
+        pens, lines, zs = structure.pens, structure.lines, structure.zones
 
+        n = len(df)
+        highs = df['high'].to_numpy(dtype=np.float64)
+        lows = df['low'].to_numpy(dtype=np.float64)
         last_close = float(df['close'].iloc[-1])
 
-        # helper: 安全取值
-        def safe_get_last(item_list):
-            return item_list[-1] if item_list else None
-
-        last_z = safe_get_last(zs)
-        last_line = safe_get_last(lines)
-        last_pen = safe_get_last(pens)
+        last_z = zs[-1] if len(zs) > 0 else None
+        last_pen = pens[-1] if len(pens) > 0 else None
 
         # 记录 meta 用于回测审计
         signal_meta = {
             'reason': None,
-            'last_z': last_z,
-            'last_line': last_line,
-            'last_pen': last_pen
+            'last_z': record_to_dict(zs, -1),
+            'last_line': record_to_dict(lines, -1, df.index),
+            'last_pen': record_to_dict(pens, -1, df.index)
         }
 
         # --- 基于中枢的判定（首要） ---
         if last_z is not None:
-            # 使用 loc 映射判断中枢结束位置
-            z_top = last_z['top']
-            z_bottom = last_z['bottom']
-            z_end_loc = last_z.get('end_loc', None)
-            if z_end_loc is None:
-                # 如果没有 end_loc，则尝试用 lines 中的 end_loc fallback
-                if last_line:
-                    z_end_loc = last_line.get('end_loc', len(df) - 1)
-                else:
-                    z_end_loc = len(df) - 1
+            z_top = float(last_z['top'])
+            z_bottom = float(last_z['bottom'])
 
             # 中枢结束后到当前的区间
-            post_start = z_end_loc + 1
-            if post_start < len(df):
-                post_df = df.iloc[post_start:]
-            else:
-                post_df = df.iloc[0:0]
+            post_start = int(last_z['end_loc']) + 1
+            post_highs = highs[post_start:]
+            post_lows = lows[post_start:]
 
             # 检查是否在中枢结束后发生突破（向上或向下）
-            left_up = (not post_df.empty) and (post_df['high'].max() > z_top)
-            left_down = (not post_df.empty) and (post_df['low'].min() < z_bottom)
-
-            # 若向上离开，找到第一次向上突破的 bar 索引（相对 df）
-            breakout_up_idx = None
-            if left_up:
-                cond_after = df[df['high'] > z_top].iloc[post_start:]
-                rel = np.nonzero(cond_after.to_numpy())[0]
-                if rel.size > 0:
-                    breakout_up_idx = int(post_start + rel[0])
-
-            breakout_down_idx = None
-            if left_down:
-                cond_after = df[df['low'] < z_bottom].iloc[post_start:]
-                rel = np.nonzero(cond_after.to_numpy())[0]
-                if rel.size > 0:
-                    breakout_down_idx = int(post_start + rel[0])
+            above = post_highs > z_top
+            below = post_lows < z_bottom
+            left_up = bool(above.any())
+            left_down = bool(below.any())
+
+            # 中枢结束后第一次向上 / 向下突破的 bar 位置
+            breakout_up_idx = post_start + int(above.argmax()) if left_up else None
+            breakout_down_idx = post_start + int(below.argmax()) if left_down else None
 
             # Pullback 检测（突破后若干根内回抽触及中枢上/下沿）
             pullback_hit_up = False
             if breakout_up_idx is not None:
                 start = breakout_up_idx + 1
-                end = min(len(df), start + self.pullback_window)
-                if start < end:
-                    seg = df.iloc[start:end]
-                    if not seg.empty and seg['low'].min() <= z_top:
-                        pullback_hit_up = True
+                end = min(n, start + self.pullback_window)
+                if start < end and lows[start:end].min() <= z_top:
+                    pullback_hit_up = True
 
             pullback_hit_down = False
             if breakout_down_idx is not None:
                 start = breakout_down_idx + 1
-                end = min(len(df), start + self.pullback_window)
-                if start < end:
-                    seg = df.iloc[start:end]
-                    if not seg.empty and seg['high'].max() >= z_bottom:
-                        pullback_hit_down = True
+                end = min(n, start + self.pullback_window)
+                if start < end and highs[start:end].max() >= z_bottom:
+                    pullback_hit_down = True
 
             # 一类买点（多头）：发生离开向上 + 回抽触及上沿 + 多头趋势 + 非背驰
             if left_up and pullback_hit_up and bullish_trend:
@@ -350,26 +221,23 @@ class ZenTradingModel(TradingModel):
                         cond_confirm = df['close'].iloc[-2] < df['close'].iloc[-1]
                     if cond_confirm:
                         signal_meta['reason'] = 'zhongshu_left_up_pullback_confirm'
-                        self._last_signal_meta = signal_meta
-                        return 1
+                        return 1, signal_meta
 
             # 二类（持续离开但未回抽到中枢上沿），视作强势二类买点（可风险更高）
             if left_up and (not pullback_hit_up) and bullish_trend:
                 # 进一步要求突破后价格保持在中枢上方若干根
                 if breakout_up_idx is not None:
-                    hold_len = len(df) - breakout_up_idx
+                    hold_len = n - breakout_up_idx
                     if hold_len >= 2:
                         signal_meta['reason'] = 'zhongshu_left_up_no_pullback'
-                        self._last_signal_meta = signal_meta
-                        return 1
+                        return 1, signal_meta
 
             # 三类（新中枢突破）：新中枢 top 超过前中枢 top 且突破前中枢 top
             if len(zs) >= 2:
                 prev_z = zs[-2]
                 if last_z['top'] > prev_z['top'] and last_close > prev_z['top'] and bullish_trend:
                     signal_meta['reason'] = 'zone_new_top_break_prev'
-                    self._last_signal_meta = signal_meta
-                    return 1
+                    return 1, signal_meta
 
             # 空头对称
             if left_down and pullback_hit_down and bearish_trend:
@@ -381,23 +249,20 @@ class ZenTradingModel(TradingModel):
                         cond_confirm = df['close'].iloc[-2] > df['close'].iloc[-1]
                     if cond_confirm:
                         signal_meta['reason'] = 'zone_left_down_pullback_confirm'
-                        self._last_signal_meta = signal_meta
-                        return -1
+                        return -1, signal_meta
 
             if left_down and (not pullback_hit_down) and bearish_trend:
                 if breakout_down_idx is not None:
-                    hold_len = len(df) - breakout_down_idx
+                    hold_len = n - breakout_down_idx
                     if hold_len >= 2:
                         signal_meta['reason'] = 'zone_left_down_no_pullback'
-                        self._last_signal_meta = signal_meta
-                        return -1
+                        return -1, signal_meta
 
             if len(zs) >= 2:
                 prev_z = zs[-2]
                 if last_z['bottom'] < prev_z['bottom'] and last_close < prev_z['bottom'] and bearish_trend:
                     signal_meta['reason'] = 'zone_new_bottom_break_prev'
-                    self._last_signal_meta = signal_meta
-                    return -1
+                    return -1, signal_meta
 
         # --- 若无中枢，用线段 / 笔 做备选顺势跟随 ---
         if last_pen is not None:
@@ -405,25 +270,20 @@ class ZenTradingModel(TradingModel):
             if last_pen['direction'] == 1 and bullish_trend:
                 pen_low = last_pen['low']
                 # 最近 5 根最低触及笔低并且最近收盘回升
-                if len(df) >= 2 and df['low'].iloc[-5:].min() <= pen_low and df['close'].iloc[-1] > df['close'].iloc[
-                    -2]:
+                if n >= 2 and lows[-5:].min() <= pen_low and df['close'].iloc[-1] > df['close'].iloc[-2]:
                     signal_meta['reason'] = 'pen_support_rebound'
-                    self._last_signal_meta = signal_meta
-                    return 1
+                    return 1, signal_meta
             if last_pen['direction'] == -1 and bearish_trend:
                 pen_high = last_pen['high']
-                if len(df) >= 2 and df['high'].iloc[-5:].max() >= pen_high and df['close'].iloc[-1] < df['close'].iloc[
-                    -2]:
+                if n >= 2 and highs[-5:].max() >= pen_high and df['close'].iloc[-1] < df['close'].iloc[-2]:
                     signal_meta['reason'] = 'pen_resistance_rebound'
-                    self._last_signal_meta = signal_meta
-                    return -1
+                    return -1, signal_meta
 
         # 默认无信号
-        self._last_signal_meta = signal_meta
-        return 0
+        return 0, signal_meta
 
     # ---------------- 交易策略生成（含 meta） ----------------
-    def create_trading_strategy(self, stock: dict, df: pd.DataFrame, signal: int):
+    def create_trading_strategy(self, stock: dict, df: pd.DataFrame, signal: int, setup=None):
         """
         返回 TradingStrategy，包含 entry_price, stop_loss, take_profit 与 meta（触发理由 / zhongshu info）
         """
@@ -442,13 +302,8 @@ class ZenTradingModel(TradingModel):
             stop_loss = round(stock['resistance'] * 1.005, n_digits)
             take_profit = round(stock['support'] * 1.005, n_digits)
 
-        # meta: 把最近一次判定时保留的元信息放入策略里，便于回测审计
-        meta = {}
-        try:
-            meta = getattr(self, '_last_signal_meta', {}) or {}
-        except Exception as ex:
-            logger.info(ex, exc_info=True)
-            meta = {}
+        # meta: 把本次判定时保留的元信息放入策略里，便于回测审计
+        meta = setup or {}
 
         strategy = TradingStrategy(
             strategy_name=self.name,
@@ -0,0 +1,198 @@
+import numpy as np
+
+# 笔 / 线段：起止K线位置、区间高低点、方向（1 上升，-1 下降）
+PEN_DTYPE = np.dtype([
+    ('start_loc', np.int64),
+    ('end_loc', np.int64),
+    ('high', np.float64),
+    ('low', np.float64),
+    ('direction', np.int8),
+])
+LINE_DTYPE = PEN_DTYPE
+
+# 中枢：起止线段序号、起止K线位置、上沿、下沿
+ZONE_DTYPE = np.dtype([
+    ('start_line', np.int64),
+    ('end_line', np.int64),
+    ('start_loc', np.int64),
+    ('end_loc', np.int64),
+    ('top', np.float64),
+    ('bottom', np.float64),
+])
+
+
+def _merge_groups(items, new_group):
+    """
+    将相邻记录按分组合并：起点取组内第一条，终点取最后一条，high 取最大、low 取最小。
+    """
+    starts = np.flatnonzero(new_group)
+    ends = np.append(starts[1:], len(items)) - 1
+    merged = np.empty(len(starts), dtype=items.dtype)
+    merged['start_loc'] = items['start_loc'][starts]
+    merged['end_loc'] = items['end_loc'][ends]
+    merged['high'] = np.maximum.reduceat(items['high'], starts)
+    merged['low'] = np.minimum.reduceat(items['low'], starts)
+    merged['direction'] = items['direction'][starts]
+    return merged
+
+
+def build_pens(positions, types, highs, lows, min_bars_between_fractals=3, min_pen_bars=3):
+    """
+    从分型构造笔（与 ZenTradingModel 原有规则一致）：
+      - 选取相邻异向分型对（底->顶 为上升笔，顶->底 为下降笔）
+      - 两分型之间至少 min_bars_between_fractals 根K线
+      - 笔的 high/low 取两端分型 high/low
+      - 方向相同且间隔不超过 min_pen_bars 的相邻笔合并
+
+    相邻笔是否合并只取决于它和前一根原始笔，因此合并可以按分组一次完成。
+
+    参数:
+        positions (np.ndarray): 分型位置（升序）
+        types (np.ndarray): 分型类型，-1 顶分型，1 底分型
+        highs, lows (np.ndarray): 整个K线序列的最高价、最低价
+
+    返回:
+        np.ndarray: PEN_DTYPE 结构化数组
+    """
+    if len(positions) < 2:
+        return np.empty(0, dtype=PEN_DTYPE)
+
+    loc1, loc2 = positions[:-1], positions[1:]
+    t1, t2 = types[:-1], types[1:]
+    valid = (t1 * t2 < 0) & (np.abs(loc2 - loc1) >= min_bars_between_fractals)
+
+    pens = np.empty(int(valid.sum()), dtype=PEN_DTYPE)
+    if len(pens) == 0:
+        return pens
+    loc1, loc2, t1, t2 = loc1[valid], loc2[valid], t1[valid], t2[valid]
+    pens['start_loc'] = loc1
+    pens['end_loc'] = loc2
+    pens['high'] = np.maximum(highs[loc1], highs[loc2])
+    pens['low'] = np.minimum(lows[loc1], lows[loc2])
+    pens['direction'] = np.where((t1 == -1) & (t2 == 1), 1, -1)
+
+    # 合并非常短或噪音笔（方向相同且间隔短）
+    same_direction = pens['direction'][1:] == pens['direction'][:-1]
+    short_gap = pens['start_loc'][1:] - pens['end_loc'][:-1] <= min_pen_bars
+    new_group = np.concatenate(([True], ~(same_direction & short_gap)))
+    return _merge_groups(pens, new_group)
+
+
+def build_lines(pens):
+    """
+    将笔合并为线段：方向相同的连续笔合并为一条线段，方向变化时开始新线段。
+
+    返回:
+        np.ndarray: LINE_DTYPE 结构化数组
+    """
+    if len(pens) == 0:
+        return np.empty(0, dtype=LINE_DTYPE)
+    new_group = np.concatenate(([True], pens['direction'][1:] != pens['direction'][:-1]))
+    return _merge_groups(pens, new_group)
+
+
+def find_zones(lines):
+    """
+    基于线段识别中枢：
+      - 初始中枢由连续三段线段的交集构成（top = min(highs), bottom = max(lows)）
+      - 向后扩展：若下一段线段与当前中枢有交集则扩展
+      - 扩展结束后从下一段继续寻找
+
+    所有起点的三段交集先向量化算出，只在形成中枢的位置做扩展。
+
+    返回:
+        np.ndarray: ZONE_DTYPE 结构化数组
+    """
+    n = len(lines)
+    if n < 3:
+        return np.empty(0, dtype=ZONE_DTYPE)
+
+    highs = lines['high']
+    lows = lines['low']
+    tops = np.minimum(np.minimum(highs[:-2], highs[1:-1]), highs[2:])
+    bottoms = np.maximum(np.maximum(lows[:-2], lows[1:-1]), lows[2:])
+    candidates = bottoms <= tops
+
+    zones = []
+    i = 0
+    while i <= n - 3:
+        if not candidates[i]:
+            i += 1
+            continue
+        top, bottom = float(tops[i]), float(bottoms[i])
+        j = i + 3
+        while j < n:
+            new_top = min(top, highs[j])
+            new_bottom = max(bottom, lows[j])
+            if new_bottom > new_top:
+                break
+            top, bottom = float(new_top), float(new_bottom)
+            j += 1
+        zones.append((i, j - 1, lines['start_loc'][i], lines['end_loc'][j - 1], top, bottom))
+        i = j
+    return np.array(zones, dtype=ZONE_DTYPE)
+
+
+def record_to_dict(records, i, index=None):
+    """
+    将结构化数组中的一条记录转换为 dict，传入 index 时附带起止K线标签。
+    """
+    if records is None or len(records) == 0:
+        return None
+    record = records[i]
+    item = {name: record[name].item() for name in records.dtype.names}
+    if index is not None:
+        item['start'] = index[item['start_loc']]
+        item['end'] = index[item['end_loc']]
+    return item
+
+
+class ZenStructure:
+    """
+    缠论结构（笔、线段、中枢）的数组表示，支持K线追加时增量更新。
+
+    笔、线段、中枢只由分型序列及分型所在K线的高低点决定：
+    追加的K线没有产生新的分型（或改变已有分型）时，结构保持不变，update 只做 O(分型数) 的比较；
+    分型变化时再用向量化方式重建。
+    """
+
+    def __init__(self, min_bars_between_fractals=3, min_pen_bars=3):
+        self.min_bars_between_fractals = min_bars_between_fractals
+        self.min_pen_bars = min_pen_bars
+        self._positions = None
+        self._types = None
+        self._highs = None
+        self._lows = None
+        self.pens = np.empty(0, dtype=PEN_DTYPE)
+        self.lines = np.empty(0, dtype=LINE_DTYPE)
+        self.zones = np.empty(0, dtype=ZONE_DTYPE)
+
+    def update(self, positions, types, highs, lows):
+        """
+        根据最新的分型与K线高低点更新结构。
+
+        参数:
+            positions (np.ndarray): 分型位置（升序）
+            types (np.ndarray): 分型类型
+            highs, lows (np.ndarray): 整个K线序列的最高价、最低价
+
+        返回:
+            bool: 结构是否被重建
+        """
+        swing_highs = highs[positions]
+        swing_lows = lows[positions]
+        if (self._positions is not None
+            and np.array_equal(self._positions, positions)
+            and np.array_equal(self._types, types)
+            and np.array_equal(self._highs, swing_highs)
+            and np.array_equal(self._lows, swing_lows)):
+            return False
+
+        self._positions = positions.copy()
+        self._types = types.copy()
+        self._highs = swing_highs
+        self._lows = swing_lows
+        self.pens = build_pens(positions, types, highs, lows, self.min_bars_between_fractals, self.min_pen_bars)
+        self.lines = build_lines(self.pens)
+        self.zones = find_zones(self.lines)
+        return True